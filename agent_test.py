@@ -3,13 +3,78 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
 
+import benchmark
 import isolation
+import competition_agent
 import game_agent
+import opening_book
 
 from importlib import reload
 
+import sprt
+import tournament
+from endgame import EndgameSolver
+from mcts_agent import MCTSPlayer
+from move_ordering import MoveOrderer
+from sample_players import GreedyPlayer, RandomPlayer, center_score, improved_score
+from search_stats import SearchStats
+from tablebase import Tablebase, build_tablebase
+from isolation.partition import separated_regions
+from isolation.symmetry import canonical_form, symmetry_tables
+from time_manager import TimeManager
+from transposition import (EXACT, LOWER, UPPER, SharedTranspositionTable,
+                           TranspositionTable)
+
+try:
+    import numpy
+except ImportError:     # the playout kernel is optional
+    numpy = None
+
+
+def replay(player, moves, board_class=isolation.Board, opponent="Player2"):
+    """Return a board on which `player` moves first, after `moves`. """
+    game = board_class(player, opponent)
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def random_moves(rng, plies, width=7, height=7):
+    """Return the moves of up to `plies` random plies from the empty board. """
+    game = isolation.Board("Player1", "Player2", width, height)
+    moves = []
+    for _ in range(plies):
+        legal_moves = sorted(game.get_legal_moves())
+        if not legal_moves:
+            break
+        moves.append(rng.choice(legal_moves))
+        game.apply_move(moves[-1])
+    return moves
+
+
+def active_player_wins(game, memo):
+    """Solve `game` by exhaustive search: return True if its active player
+    wins with perfect play.
+    """
+    key = tuple(game._board_state)
+    if key not in memo:
+        memo[key] = any(not active_player_wins(game.forecast_move(m), memo)
+                        for m in game.get_legal_moves())
+    return memo[key]
+
 
 class IsolationTest(unittest.TestCase):
     """Unit tests for isolation agents"""
@@ -20,6 +85,724 @@ class IsolationTest(unittest.TestCase):
         self.player2 = "Player2"
         self.game = isolation.Board(self.player1, self.player2)
 
+    def test_bitboard_legal_moves(self):
+        """BitBoard generates the same moves as Board in every position. """
+        rng = random.Random(1)
+        for width, height in ((7, 7), (5, 6)):
+            for _ in range(10):
+                board = isolation.Board(self.player1, self.player2, width, height)
+                bitboard = isolation.BitBoard(self.player1, self.player2, width, height)
+                while True:
+                    for player in (self.player1, self.player2):
+                        self.assertEqual(sorted(board.get_legal_moves(player)),
+                                         sorted(bitboard.get_legal_moves(player)))
+                        self.assertEqual(board.get_player_location(player),
+                                         bitboard.get_player_location(player))
+                    self.assertEqual(sorted(board.get_blank_spaces()),
+                                     sorted(bitboard.get_blank_spaces()))
+                    legal_moves = sorted(board.get_legal_moves())
+                    if not legal_moves:
+                        break
+                    move = rng.choice(legal_moves)
+                    board.apply_move(move)
+                    bitboard.apply_move(move)
+                self.assertTrue(bitboard.is_loser(bitboard.active_player))
+
+    def test_optional_modules_not_imported(self):
+        """Importing game_agent loads no module of a search option that is
+        off by default.
+        """
+        code = ("import sys, game_agent; print(' '.join(sorted(set(sys.modules) & "
+                "{'lazy_smp', 'opening_book', 'tablebase', 'transposition'})))")
+        output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+        self.assertEqual(output.split(), [])
+
+    def test_push_pop_round_trip(self):
+        """pop_move() restores the state and the Zobrist key of every board
+        after push_move(), and the key is the one computed from scratch.
+        """
+        rng = random.Random(2)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            game = board_class(self.player1, self.player2)
+            while True:
+                legal_moves = sorted(game.get_legal_moves())
+                if not legal_moves:
+                    break
+                state, key = list(game._board_state), game.zobrist
+                self.assertEqual(key, game.hash())
+                for move in legal_moves:
+                    game.push_move(move)
+                    self.assertEqual(game.zobrist, game.hash())
+                    self.assertEqual(game.get_player_location(game.inactive_player), move)
+                    game.pop_move()
+                    self.assertEqual(list(game._board_state), state)
+                    self.assertEqual(game.zobrist, key)
+                game.apply_move(rng.choice(legal_moves))
+
+    def test_in_place_search(self):
+        """In-place search finds the moves of the search on board copies and
+        leaves the board as it found it.
+        """
+        rng = random.Random(3)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            for seed in range(5):
+                game, opening = board_class(self.player1, self.player2), []
+                for _ in range(4):
+                    opening.append(rng.choice(sorted(game.get_legal_moves())))
+                    game.apply_move(opening[-1])
+                moves = []
+                for in_place in (False, True):
+                    player = game_agent.AlphaBetaPlayer(in_place=in_place)
+                    player.time_left = lambda: float("inf")
+                    game = board_class(player, self.player2)
+                    for move in opening:
+                        game.apply_move(move)
+                    state = list(game._board_state)
+                    random.seed(seed)   # the same move order in both searches
+                    moves.append(player.alphabeta(game, 3))
+                    self.assertEqual(list(game._board_state), state)
+                self.assertEqual(moves[0], moves[1])
+
+    def test_match_book(self):
+        """A root found in the matchBook, in any orientation, returns the
+        move and the root score of the search that cached it.
+        """
+        rng = random.Random(2)
+        perms = symmetry_tables(7, 7)[0]
+        for _ in range(5):
+            moves = random_moves(rng, 6)
+            player = competition_agent.CustomPlayer(endgame=None, time_manager=None)
+            player.time_left = lambda: float("inf")
+            move = player.alphabeta(replay(player, moves), 3)
+            score = player.root_score
+            for perm in perms:
+                image = [(perm[r + c * 7] % 7, perm[r + c * 7] // 7) for r, c in moves]
+                player.root_score = None
+                player.tt.clear()
+                idx = perm[move[0] + move[1] * 7]
+                self.assertEqual(player.alphabeta(replay(player, image), 3), (idx % 7, idx // 7))
+                self.assertEqual(player.root_score, score)
+            self.assertEqual(len(player.matchBook), 1)
+
+    def test_transposition_bounds(self):
+        """A stored score only settles a node if it was searched deep enough
+        and its bound settles the window; the stored move is always returned,
+        to be searched first.
+        """
+        table = TranspositionTable(16)
+        table.store(7, 3, 1.5, LOWER, (2, 3))
+        self.assertEqual(table.probe(7), (3, 1.5, LOWER, (2, 3)))
+        self.assertIsNone(table.probe(8))
+
+        player = game_agent.AlphaBetaPlayer(tt_size=16)
+        game = self.game
+        for move in ((2, 3), (4, 4), (0, 2), (2, 5)):
+            game.apply_move(move)
+        legal_moves = sorted(game.get_legal_moves())
+        move = legal_moves[-1]
+        player.tt_record(game, 3, 2., float("-inf"), 2., move)     # fail high
+        key = player.tt_key(game)[0]
+        self.assertEqual(player.tt.probe(key)[2], LOWER)
+        self.assertEqual(player.tt_lookup(game, 3, 0., 1.), (2., move))
+        self.assertEqual(player.tt_lookup(game, 3, 0., 3.), (None, move))
+        self.assertEqual(player.tt_lookup(game, 4, 0., 1.), (None, move))
+        player.order_moves(game, legal_moves, True, move)
+        self.assertEqual(legal_moves[0], move)
+        player.tt_record(game, 3, 2., 2., float("inf"), move)      # fail low
+        self.assertEqual(player.tt.probe(key)[2], UPPER)
+        self.assertEqual(player.tt_lookup(game, 2, 3., 4.)[0], 2.)
+        self.assertIsNone(player.tt_lookup(game, 2, 1., 4.)[0])
+        player.tt_record(game, 3, 2., 1., 3., move)                # inside the window
+        self.assertEqual(player.tt.probe(key)[2], EXACT)
+        self.assertEqual(player.tt_lookup(game, 3, 5., 6.)[0], 2.)
+
+    def test_canonical_key_invariance(self):
+        """Every rotation and reflection of a position has its canonical key,
+        whether the board maintains its symmetric keys or not.
+        """
+        rng = random.Random(4)
+        for width, height in ((7, 7), (5, 7)):
+            perms = symmetry_tables(width, height)[0]
+            for _ in range(10):
+                game = isolation.Board(self.player1, self.player2, width, height)
+                moves = []
+                for _ in range(rng.randrange(1, 12)):
+                    legal_moves = sorted(game.get_legal_moves())
+                    if not legal_moves:
+                        break
+                    moves.append(rng.choice(legal_moves))
+                    game.apply_move(moves[-1])
+                key = canonical_form(game)[0]
+                for perm in perms:
+                    image = isolation.Board(self.player1, self.player2, width, height)
+                    image.enable_symmetry()
+                    for r, c in moves:
+                        idx = perm[r + c * height]
+                        image.apply_move((idx % height, idx // height))
+                    self.assertEqual(canonical_form(image)[0], key)
+                    image._sym_keys = None
+                    self.assertEqual(canonical_form(image)[0], key)
+
+    def test_symmetry_keys_on_demand(self):
+        """The search maintains the symmetric keys of the board only for a
+        transposition table, which looks up a canonical key at every node.
+        """
+        moves = random_moves(random.Random(5), 4)
+        for tt_size, enabled in ((0, False), (1 << 10, True)):
+            player = game_agent.AlphaBetaPlayer(tt_size=tt_size)
+            player.time_left = lambda: float("inf")
+            game = replay(player, moves)
+            player.alphabeta(game, 2)
+            self.assertEqual(game._sym_keys is not None, enabled)
+
+    def test_mobility_on_demand(self):
+        """The search maintains the mobility counts of the board only for a
+        heuristic declaring that it counts moves, through a stats wrapper too.
+        """
+        moves = random_moves(random.Random(6), 4)
+        for score_fn, enabled in ((center_score, False), (improved_score, True)):
+            for stats in (None, SearchStats()):
+                player = game_agent.AlphaBetaPlayer(score_fn=score_fn, stats=stats)
+                player.time_left = lambda: float("inf")
+                game = replay(player, moves)
+                player.alphabeta(game, 2)
+                self.assertEqual(game._open is not None, enabled)
+
+    def test_move_ordering(self):
+        """The orderer searches the PV move first, then the killer moves of
+        the ply, newest first, then the other moves by history score.
+        """
+        orderer = MoveOrderer()
+        game = self.game
+        game.apply_move((3, 3))
+        game.apply_move((2, 2))
+        orderer.new_search(game)
+        moves = sorted(game.get_legal_moves())
+        child = game.forecast_move(moves[0])
+        orderer.cutoff(child, moves[1], 4, True, 0)  # a killer of the next ply only
+        orderer.cutoff(game, moves[3], 2, True, 1)
+        orderer.cutoff(game, moves[5], 3, True, 0)
+        self.assertEqual(orderer.first_move_cutoff_rate, 2 / 3)
+
+        legal_moves = sorted(moves)
+        orderer.order(game, legal_moves, True)
+        self.assertEqual(legal_moves[:3], [moves[5], moves[3], moves[1]])
+
+        orderer.new_iteration([(game.zobrist, moves[0])])
+        orderer.order(game, legal_moves, True)
+        self.assertEqual(legal_moves[:3], [moves[0], moves[5], moves[3]])
+        self.assertEqual(sorted(legal_moves), moves)
+
+    def test_pvs_and_aspiration(self):
+        """Principal Variation Search and aspiration windows find the root
+        score of plain alpha-beta search.
+        """
+        rng = random.Random(7)
+        for _ in range(5):
+            moves = random_moves(rng, 6)
+            scores = []
+            for pvs, aspiration in ((False, None), (True, None), (True, 1.), (True, 4.)):
+                player = game_agent.AlphaBetaPlayer(tt_size=0, ordering=None, pvs=pvs,
+                                                    aspiration=aspiration)
+                player.time_left = lambda: float("inf")
+                game = replay(player, moves)
+                player.root_score = scores[0] + 3. if scores else None  # a wrong guess
+                player.aspiration_search(game, 3)
+                scores.append(player.root_score)
+            self.assertEqual(len(set(scores)), 1, scores)
+
+    def test_pool_tournament(self):
+        """A round played by a process pool tallies every game of every
+        test agent, with the results of the same round played in this
+        process.
+        """
+        cpu_agent = tournament.Agent(RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(GreedyPlayer(), "Greedy"),
+                       tournament.Agent(RandomPlayer(), "Random 2")]
+        players = {id(agent.player): agent.player for agent in [cpu_agent] + test_agents}
+        tournament._init_worker(players)
+        results = []
+        with multiprocessing.Pool(2, tournament._init_worker, (players,)) as pool:
+            for round_pool in (None, pool):
+                wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+                counts = tournament.play_round(cpu_agent, test_agents, wins, 3,
+                                               random.Random(8), round_pool)
+                self.assertEqual(counts, (0, 0))
+                self.assertEqual(sum(wins.values()), 2 * 3 * len(test_agents))
+                results.append(wins)
+        self.assertEqual(results[0], results[1])
+
+    def test_tournament_stats(self):
+        """The statistics of the games of a round are added once to the
+        records already collected by an agent.
+        """
+        stats = SearchStats("AB")
+        cpu_agent = tournament.Agent(RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(game_agent.AlphaBetaPlayer(timeout=140., stats=stats), "AB")]
+        tournament._init_worker({id(agent.player): agent.player
+                                 for agent in [cpu_agent] + test_agents})
+        earlier = {"source": "earlier round"}
+        stats.records.append(earlier)
+        for round_number in range(2):
+            wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+            tournament.play_round(cpu_agent, test_agents, wins, 1, random.Random(round_number))
+            self.assertEqual(stats.records.count(earlier), 1)
+            starts = [record["move_count"] for record in stats.records[1:]
+                      if record["move_count"] < 4]
+            self.assertEqual(len(starts), 2 * (round_number + 1))   # one first move per game
+
+    def test_seeded_boards(self):
+        """Boards seeded alike shuffle the legal moves alike, copies draw
+        from the generator of their original, and unshuffled boards list
+        the moves in a fixed order.
+        """
+        for board_class in (isolation.Board, isolation.BitBoard):
+            boards = [board_class(self.player1, self.player2, rng=17) for _ in range(2)]
+            for board in boards:
+                board.apply_move((3, 3))
+                board.apply_move((2, 2))
+            for _ in range(6):
+                moves = [board.get_legal_moves() for board in boards]
+                self.assertEqual(moves[0], moves[1])
+                if not moves[0]:
+                    break
+                boards = [board.forecast_move(moves[0][0]) for board in boards]
+            copy = boards[0].copy()
+            self.assertEqual([copy.get_legal_moves(), boards[0].get_legal_moves()],
+                             [boards[1].get_legal_moves(), boards[1].get_legal_moves()])
+            fixed = board_class(self.player1, self.player2, shuffle_moves=False)
+            fixed.apply_move((3, 3))
+            fixed.apply_move((2, 2))
+            self.assertEqual(fixed.get_legal_moves(), fixed.get_legal_moves())
+
+    def test_shared_transposition_table(self):
+        """Entries stored by a forked process are seen by its parent, and
+        an entry torn by a concurrent write is never returned.
+        """
+        table = SharedTranspositionTable(16)
+        context = multiprocessing.get_context("fork")
+        process = context.Process(target=table.store, args=(21, 3, 1.5, LOWER, (2, 3)))
+        process.start()
+        process.join()
+        self.assertEqual(table.probe(21), (3, 1.5, LOWER, (2, 3)))
+        slot = 2 * (21 % table.buckets)
+        for field, value in (("scores", 2.5), ("depths", 4), ("bounds", EXACT), ("moves", 5)):
+            values = getattr(table, field)
+            saved, values[slot] = values[slot], value    # another process overwrote one field only
+            self.assertIsNone(table.probe(21), field)
+            values[slot] = saved
+            self.assertEqual(table.probe(21), (3, 1.5, LOWER, (2, 3)))
+        table.store(21, 200, -2.0, UPPER, None)     # depths saturate before sealing the entry
+        self.assertEqual(table.probe(21), (127, -2.0, UPPER, None))
+
+    def test_lazy_smp(self):
+        """An agent searching with helper processes returns a legal move;
+        the helpers are forked with the agent and stopped by close().
+        """
+        with game_agent.AlphaBetaPlayer(tt_size=1 << 12, workers=2) as player:
+            self.assertIsNotNone(player.helpers)
+            processes = player.helpers.processes
+            game = replay(player, random_moves(random.Random(9), 4))
+            end = time.time() + 0.1
+            move = player.get_move(game, lambda: (end - time.time()) * 1000.)
+            self.assertIn(move, game.get_legal_moves())
+            self.assertGreater(len(player.tt), 0)
+            move = player.get_move(game, isolation.Deadline(100))
+            self.assertIn(move, game.get_legal_moves())
+        self.assertIsNone(player.helpers)
+        self.assertFalse(any(process.is_alive() for process in processes))
+        self.assertRaises(ValueError, game_agent.AlphaBetaPlayer, workers=2)   # nothing to share
+
+    def test_opening_book(self):
+        """A built book has a legal move for every opening position, in
+        every orientation, and the agents play it without searching.
+        """
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        os.close(fd)
+        try:
+            positions = opening_book.opening_positions(2, 5, 5)
+            self.assertEqual(opening_book.build_book(path, 2, 2, 5, 5), len(positions))
+            book = opening_book.OpeningBook(path)
+            perms = symmetry_tables(5, 5)[0]
+            for moves in positions.values():
+                for perm in perms:
+                    image = []
+                    for r, c in moves:
+                        idx = perm[r + c * 5]
+                        image.append((idx % 5, idx // 5))
+                    game = isolation.Board(self.player1, self.player2, 5, 5)
+                    for move in image:
+                        game.apply_move(move)
+                    self.assertIn(book.lookup(game), game.get_legal_moves())
+            self.assertIsNone(book.lookup(self.game))   # a 7x7 board
+
+            player = game_agent.AlphaBetaPlayer(book=path)
+            game = isolation.Board(self.player1, player, 5, 5)
+            game.apply_move((1, 2))
+            self.assertEqual(player.get_move(game, lambda: -1.), book.lookup(game))
+            del book, player
+        finally:
+            os.remove(path)
+
+    def test_endgame_solver(self):
+        """The endgame solver wins every separated position that exhaustive
+        search wins on a small board.
+        """
+        rng = random.Random(5)
+        solver, memo, solved = EndgameSolver(), {}, 0
+        while solved < 30:
+            game = isolation.Board(self.player1, self.player2, 5, 5)
+            while game.get_legal_moves() and separated_regions(game) is None:
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if not game.get_legal_moves():
+                continue
+            move = solver.solve(game, lambda: float("inf"))
+            self.assertIn(move, game.get_legal_moves())
+            if active_player_wins(game, memo):
+                self.assertFalse(active_player_wins(game.forecast_move(move), memo))
+            solved += 1
+
+    def test_search_stops_at_game_end(self):
+        """Iterative deepening stops once every line of the search reaches
+        the end of the game, long before the time runs out.
+        """
+        rng = random.Random(12)
+        for _ in range(5):
+            moves = random_moves(rng, 12, 5, 5)
+            player = game_agent.AlphaBetaPlayer(endgame=None)
+            game = isolation.Board(player, self.player2, 5, 5)
+            for move in moves[:len(moves) // 2 * 2]:     # the player to move
+                game.apply_move(move)
+            end = time.time() + 10.
+            move = player.get_move(game, lambda: (end - time.time()) * 1000.)
+            self.assertGreater(end - time.time(), 5.)
+            if game.get_legal_moves():
+                self.assertIn(move, game.get_legal_moves())
+            self.assertFalse(player.depth_limited and not math.isinf(player.root_score))
+
+    def test_time_manager(self):
+        """The manager skips an iteration predicted to overrun the margin
+        and widens the margin after a late abort, but never narrows it
+        below the configured timeout.
+        """
+        clock = [1000.]
+        timer = TimeManager(10.)
+        timer.new_move(lambda: clock[0])
+        for duration in (10., 30.):
+            self.assertTrue(timer.can_start_iteration())
+            clock[0] -= duration
+            timer.iteration_finished()
+        self.assertAlmostEqual(timer.branching_factor(), 3.)
+        self.assertTrue(timer.can_start_iteration())       # 90 ms of 960 left
+        clock[0] = 95.
+        self.assertFalse(timer.can_start_iteration())      # 90 ms of 85 before the margin
+        clock[0] = 4.                                       # aborted 6 ms past the margin
+        timer.move_finished()
+        self.assertEqual(timer.margin, 12.)
+
+        timer = TimeManager(10.)
+        timer.new_move(lambda: 9.5)                         # a short delay
+        timer.move_finished()
+        self.assertEqual(timer.margin, 10.)                 # never below the timeout
+        self.assertEqual(TimeManager(1.).margin, 5.)        # nor below the floor
+
+    def test_deadline_polling(self):
+        """A Deadline counts down the milliseconds of the turn, and the
+        search checks it at intervals until the threshold is reached.
+        """
+        deadline = isolation.Deadline(50)
+        first = deadline()
+        self.assertTrue(0 < first <= 50)
+        self.assertLess(deadline(), first)
+
+        player = game_agent.AlphaBetaPlayer()
+        player.time_left = isolation.Deadline(1000)
+        player.last_poll = player.time_left() + 1.
+        player.poll_timer()
+        self.assertEqual(player.countdown, player.poll_every)
+        self.assertGreaterEqual(player.poll_every, 1)
+        player.time_left = isolation.Deadline(player.TIMER_THRESHOLD / 2)
+        self.assertRaises(game_agent.SearchTimeout, player.poll_timer)
+
+    def test_search_stats(self):
+        """A collector gets one record per move, accounting for the nodes of
+        every completed iteration and the lookups of the agent's caches.
+        """
+        stats = SearchStats("Custom")
+        player = competition_agent.CustomPlayer(stats=stats, endgame=None, time_manager=None)
+        game = replay(player, random_moves(random.Random(15), 4))
+        for _ in range(2):      # the second search reuses the matchBook
+            end = time.time() + 0.05
+            move = player.get_move(game, lambda: (end - time.time()) * 1000.)
+            self.assertIn(move, game.get_legal_moves())
+        self.assertEqual(len(stats.records), 2)
+        for record in stats.records:
+            self.assertEqual(record["source"], "search")
+            self.assertEqual(record["move_count"], 4)
+            self.assertGreaterEqual(record["nodes"], sum(record["nodes_per_depth"].values()))
+            self.assertGreater(record["score_calls"], 0)
+            self.assertIsNotNone(record["tt_hit_rate"])
+        self.assertGreater(stats.records[1]["matchbook_hit_rate"], 0.)
+        self.assertEqual(stats.summary()["moves"], 2)
+
+        probes = stats.tt_probes        # walking the PV is not a search probe
+        player.principal_variation(game, move, 3)
+        self.assertEqual(stats.tt_probes, probes)
+
+    def test_benchmark_baseline(self):
+        """The benchmark searches the node counts of the recorded baseline,
+        in place or not, and a slower run is reported as a regression.
+        """
+        with open(benchmark.BASELINE) as f:
+            baseline = json.load(f)
+        positions = benchmark.load_corpus()[:4]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for in_place in (True, False):    # the same tree on one board as with copies
+                current = benchmark.run(sorted(benchmark.AGENTS), positions, [3], repeat=1,
+                                        in_place=in_place)
+                for key, result in current["results"].items():
+                    self.assertEqual(result["nodes"], baseline["results"][key]["nodes"], key)
+                    self.assertEqual(result["id_nodes"], baseline["results"][key]["id_nodes"], key)
+            self.assertEqual(benchmark.compare(current, current), [])
+            slower = json.loads(json.dumps(current))
+            for result in slower["results"].values():
+                result["time_ms"] *= 2
+            self.assertEqual(benchmark.compare(slower, current),
+                             [(name, 3) for name in sorted(benchmark.AGENTS)])
+
+    def test_mcts_player(self):
+        """The MCTS agent plays legal moves for a whole game, continuing from
+        the subtree of its previous move.
+        """
+        player = MCTSPlayer(timeout=0., seed=18)
+        opponent = RandomPlayer()
+        random.seed(18)
+        game = isolation.Board(player, opponent, 5, 5)
+        reused = 0
+        while game.get_legal_moves():
+            if game.active_player is player:
+                budget = iter(range(200, -2, -1))   # 200 iterations per move
+                move = player.get_move(game, lambda: next(budget))
+                reused += player.root != 0
+            else:
+                move = opponent.get_move(game, lambda: 1000.)
+            self.assertIn(move, game.get_legal_moves())
+            game.apply_move(move)
+        self.assertGreater(reused, 0)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_playouts(self):
+        """Batched playouts score decided positions exactly and reproduce
+        their estimates from the same seed.
+        """
+        from isolation.playouts import win_rates
+
+        rng = random.Random(19)
+        games, expected = [], []
+        while len(games) < 20:
+            game = isolation.Board(self.player1, self.player2, 5, 5)
+            for move in random_moves(rng, 25, 5, 5):
+                game.apply_move(move)
+                if not game.get_legal_moves(game.inactive_player):
+                    games.append(game.copy())
+                    expected.append(1. if game.get_legal_moves() else 0.)
+        self.assertEqual(list(win_rates(games, 50, rng=1)), expected)
+
+        games = []
+        for _ in range(5):
+            games.append(isolation.Board(self.player1, self.player2, 5, 5))
+            for move in random_moves(rng, 6, 5, 5):
+                games[-1].apply_move(move)
+        rates = win_rates(games, 200, rng=2)
+        self.assertTrue(((rates >= 0) & (rates <= 1)).all())
+        self.assertEqual(list(rates), list(win_rates(games, 200, rng=2)))
+
+    def test_sprt(self):
+        """Elo estimates bracket the observed score, and the SPRT of the
+        pair results accepts the hypothesis a clear-cut result supports.
+        """
+        self.assertAlmostEqual(sprt.elo_to_score(sprt.score_to_elo(0.7)), 0.7)
+        elo, low, high = sprt.elo_interval(30, 10)
+        self.assertTrue(low < elo < high)
+        self.assertEqual(sprt.elo_interval(10, 0)[2], float("inf"))
+
+        test = sprt.SPRT(0., 50.)
+        self.assertEqual(test.llr((0, 0, 0)), 0.)
+        self.assertIsNone(test.status((2, 4, 4)))
+        self.assertIsNone(test.status((0, 0, 22)))
+        self.assertEqual(test.status((0, 0, 23)), "H1")   # straight match wins
+        self.assertEqual(test.status((60, 20, 20)), "H0")
+        self.assertEqual(test.status((10, 20, 70)), "H1")
+        # Split pairs say nothing about which agent is stronger
+        self.assertLess(test.llr((0, 50, 0)), test.llr((0, 0, 50)))
+
+    def test_pair_counts(self):
+        """A round counts the matches each test agent lost, split and won,
+        consistently with its game wins.
+        """
+        cpu_agent = tournament.Agent(RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(GreedyPlayer(), "Greedy"),
+                       tournament.Agent(RandomPlayer(), "Random 2")]
+        tournament._init_worker({id(agent.player): agent.player
+                                 for agent in [cpu_agent] + test_agents})
+        wins = {agent.player: 0 for agent in [cpu_agent] + test_agents}
+        pairs = {agent.player: [0, 0, 0] for agent in test_agents}
+        tournament.play_round(cpu_agent, test_agents, wins, 5, random.Random(20), None, pairs)
+        for agent in test_agents:
+            lost, split, won = pairs[agent.player]
+            self.assertEqual(lost + split + won, 5)
+            self.assertEqual(wins[agent.player], split + 2 * won)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_selfplay_resume(self):
+        """A resumed self-play run extends the dataset with whole games in
+        shards, and refuses to mix settings.
+        """
+        import selfplay
+
+        with tempfile.TemporaryDirectory() as output, \
+                contextlib.redirect_stdout(io.StringIO()):
+            settings = dict(agents=("AB_Improved", "MCTS"), width=5, height=5, time_limit=20,
+                            shard_size=16)
+            self.assertEqual(selfplay.generate(output, 2, **settings)["games"], 2)
+            manifest = selfplay.generate(output, 3, **settings)
+            self.assertEqual(manifest["games"], 3)
+            shards = list(selfplay.iter_shards(output))
+            self.assertEqual(sum(len(shard) for shard in shards), manifest["positions"])
+            for shard, entry in zip(shards, manifest["shards"]):
+                games = numpy.unique(shard["game"])
+                self.assertEqual(list(games), list(range(entry["first_game"],
+                                                         entry["first_game"] + entry["games"])))
+                self.assertTrue(numpy.isin(shard["outcome"], (-1, 1)).all())
+            with self.assertRaises(ValueError):
+                selfplay.generate(output, 4, seed=1, **settings)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_tuner_features(self):
+        """The tuner computes the LinearScore features of both players for a
+        whole batch of positions, as the heuristic does for each one.
+        """
+        import selfplay
+        import tuner
+
+        rng = random.Random(22)
+        rows, expected = [], []
+        score = game_agent.LinearScore({})
+        for index in range(20):
+            game = isolation.Board(self.player1, self.player2, 6, 5)
+            moves = random_moves(rng, rng.randrange(2, 16), 6, 5)
+            for move in moves:
+                game.apply_move(move)
+            locations = []
+            for player in (game.active_player, game.inactive_player):
+                r, c = game.get_player_location(player)
+                locations.append(r + c * game.height)
+            rows.append((index, game.move_count, 6, 5, ~game.get_blank_mask() & (1 << 30) - 1,
+                         locations, 0, 0, 0., 1))
+            expected.append((score.features(game, game.active_player),
+                             score.features(game, game.inactive_player)))
+        mover, waiting = tuner.position_features(numpy.array(rows, dtype=selfplay.POSITION_DTYPE))
+        self.assertEqual(mover.tolist(), [list(e[0]) for e in expected])
+        self.assertEqual(waiting.tolist(), [list(e[1]) for e in expected])
+
+    def test_frontier_batch(self):
+        """A batch-capable heuristic scores every child as it does one by
+        one, and the search finds the same root score with and without the
+        batch, which scores the children in chunks as they are needed; a
+        search that completes no iteration still plays a legal move.
+        """
+        score = game_agent.LinearScore({"own_moves": 1., "opp_moves": -1.5, "common_moves": .25,
+                                        "player_distance": -.125, "own_center": -.25,
+                                        "opp_center": .125, "to_move": .5})
+        rng = random.Random(23)
+        for _ in range(10):
+            moves = random_moves(rng, rng.randrange(2, 30))
+            game = replay(self.player1, moves, opponent=self.player2)
+            legal_moves = game.get_legal_moves()
+            for player in (self.player1, self.player2):
+                self.assertEqual(score.batch(game, legal_moves, player),
+                                 [score(game.forecast_move(m), player) for m in legal_moves])
+
+            scores = []
+            for score_fn in (score, lambda game, player: score(game, player)):
+                player = game_agent.AlphaBetaPlayer(score_fn=score_fn, tt_size=0, ordering=None)
+                player.time_left = lambda: float("inf")
+                random.seed(23)
+                player.alphabeta(replay(player, moves), 3)
+                scores.append(player.root_score)
+            self.assertEqual(scores[0], scores[1])
+
+        calls = []
+        score_fn = lambda game, player: score(game, player)
+        score_fn.batch = lambda game, moves, player: calls.append(moves) or score.batch(game, moves, player)
+        player = game_agent.AlphaBetaPlayer(score_fn=score_fn)
+        player.time_left = lambda: float("inf")
+        game = replay(player, [(3, 3), (0, 0)])     # eight moves from the center
+        legal_moves = game.get_legal_moves()
+        scores = player.frontier_scores(game, legal_moves)
+        self.assertEqual(next(scores), score(game.forecast_move(legal_moves[0]), player))
+        self.assertEqual(calls, [legal_moves[:game_agent.FRONTIER_CHUNK]])  # scored as needed
+
+        player = game_agent.AlphaBetaPlayer(score_fn=score)
+        game = replay(player, random_moves(rng, 4))
+        move = player.get_move(game, lambda: 0.)   # no iteration can complete
+        self.assertIn(move, game.get_legal_moves())
+
+    def test_mobility_counts(self):
+        """The incremental move counts of every board match its legal moves
+        through push_move() and pop_move(), and so do the counts computed
+        on demand.
+        """
+        rng = random.Random(24)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            for _ in range(5):
+                tracked = board_class(self.player1, self.player2, 6, 7)
+                tracked.enable_mobility()
+                plain = board_class(self.player1, self.player2, 6, 7)
+                while True:
+                    for player in (self.player1, self.player2):
+                        count = len(plain.get_legal_moves(player))
+                        self.assertEqual(plain.mobility(player), count)
+                        self.assertEqual(tracked.mobility(player), count)
+                        self.assertEqual(tracked.weighted_mobility(player),
+                                         plain.weighted_mobility(player))
+                    legal_moves = sorted(plain.get_legal_moves())
+                    if not legal_moves:
+                        break
+                    for move in legal_moves:
+                        tracked.push_move(move)
+                        self.assertEqual(tracked.mobility(), len(tracked.get_legal_moves()))
+                        tracked.pop_move()
+                    move = rng.choice(legal_moves)
+                    tracked.apply_move(move)
+                    plain.apply_move(move)
+
+    def test_tablebase(self):
+        """The 4x4 tablebase agrees with exhaustive search on the result of
+        every position and its moves keep every won position won.
+        """
+        fd, path = tempfile.mkstemp(suffix=".bin")
+        os.close(fd)
+        try:
+            build_tablebase(path, 4, 4)
+            table = Tablebase(path)
+            rng, memo = random.Random(6), {}
+            for _ in range(100):
+                game = isolation.Board(self.player1, self.player2, 4, 4)
+                for move in random_moves(rng, rng.randrange(2, 10), 4, 4):
+                    game.apply_move(move)
+                wins = active_player_wins(game, memo)
+                self.assertEqual(table.distance(game) % 2 == 1, wins)
+                move = table.lookup(game)
+                if not game.get_legal_moves():
+                    self.assertIsNone(move)
+                elif wins:
+                    self.assertFalse(active_player_wins(game.forecast_move(move), memo))
+            self.assertIsNone(table.distance(self.game))   # another board size
+            del table
+        finally:
+            os.remove(path)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,346 @@
+"""Benchmark the search of the alpha-beta agents on a fixed corpus of
+positions and compare the results against a stored baseline.
+
+Timing whole games says little about the speed of the search: the games
+differ from run to run because the boards shuffle the legal moves. This
+script instead searches every position of a checked-in corpus (openings,
+middlegames and endgames on several board sizes) with a fresh agent on a
+board seeded with a fixed seed, so that each search visits the same tree on
+every run. For each agent, position and
+search depth it measures:
+
+    - the time and number of nodes of a fixed-depth search (a single
+      iteration at that depth, with empty tables), and the nodes per second;
+    - the time-to-depth, i.e. the time iterative deepening takes to complete
+      each iteration up to that depth.
+
+Usage:
+
+    python benchmark.py                  # compare with benchmark_baseline.json
+    python benchmark.py --save-baseline  # record a new baseline
+    python benchmark.py --in-place       # search in place, compared with the baseline
+    python benchmark.py --write-corpus   # regenerate benchmark_positions.json
+
+Node counts are exact, so a changed count means the search itself changed;
+times are compared with a tolerance, and the script exits with status 1 if
+the total time of an agent at a depth grew beyond it. Timings are only
+comparable on the same machine, so record the baseline where you compare.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from isolation import Board, BitBoard, Deadline
+from competition_agent import CustomPlayer
+from game_agent import AlphaBetaPlayer
+from move_ordering import MoveOrderer
+from sample_players import improved_score
+from search_stats import SearchStats
+
+CORPUS = "benchmark_positions.json"
+BASELINE = "benchmark_baseline.json"
+SEED = 1729          # seed of the board's random number generator for each search
+DEPTHS = (3, 5, 7)   # search depths benchmarked by default
+REPEAT = 5           # each search is timed this many times; the fastest run counts
+TOLERANCE = 0.25     # relative slowdown reported as a regression
+UNLIMITED = 1e9      # milliseconds given to every search
+
+BOARD_SIZES = ((5, 5), (7, 7), (9, 9))
+PHASES = (("opening", 0.1), ("middlegame", 0.35), ("endgame", 0.55))  # fraction of cells filled
+
+# The benchmarked agents, built fresh for every search. The endgame solver
+# and the time manager are disabled: the benchmark measures the search alone
+AGENTS = {
+    "AB_Improved_TT_PVS": lambda: AlphaBetaPlayer(score_fn=improved_score, tt_size=1 << 16,
+                                                  ordering=MoveOrderer, pvs=True),
+    "Competition Player": lambda: CustomPlayer(endgame=None, time_manager=None),
+}
+
+BOARDS = {"board": Board, "bitboard": BitBoard}
+
+
+def generate_corpus(seed=SEED, per_phase=2):
+    """Return a list of benchmark positions, reached by random games played
+    with their own generator seeded with `seed`.
+
+    Each position is a dict holding its name, the board size and the moves
+    reaching it from the empty board; both players have legal moves in every
+    position, and both have moved at least once.
+    """
+    rng = random.Random(seed)
+    positions = []
+    for width, height in BOARD_SIZES:
+        for phase, filled in PHASES:
+            plies = max(2, int(filled * width * height))
+            for number in range(1, per_phase + 1):
+                positions.append({
+                    "name": "{}x{}-{}-{}".format(width, height, phase, number),
+                    "width": width,
+                    "height": height,
+                    "moves": _random_game(rng, width, height, plies),
+                })
+    return positions
+
+
+def _random_game(rng, width, height, plies):
+    """Return the moves of a random game of `plies` plies after which both
+    players can still move, retrying until one is found.
+    """
+    while True:
+        game = Board("p1", "p2", width, height)
+        moves = []
+        for _ in range(plies):
+            legal_moves = sorted(game.get_legal_moves())
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            game.apply_move(move)
+            moves.append(move)
+        else:
+            if game.get_legal_moves(game._player_1) and game.get_legal_moves(game._player_2):
+                return moves
+
+
+def load_corpus(path=CORPUS):
+    """Read the positions written by `write_corpus()`. """
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_corpus(positions, path=CORPUS):
+    """Write the benchmark positions to `path`, one position per line. """
+    with open(path, "w") as f:
+        f.write("[\n" + ",\n".join(json.dumps(position) for position in positions) + "\n]\n")
+
+
+def search(agent_name, position, depth, first_depth, board_class=Board, seed=SEED,
+           in_place=False):
+    """Search a position with a fresh agent, from `first_depth` to `depth`,
+    on a copy of the board for every node or on a single board if `in_place`.
+
+    Returns
+    -------
+    dict
+        The `SearchStats` record of the search.
+    """
+    player = AGENTS[agent_name]()
+    player.in_place = in_place
+    stats = SearchStats(agent_name)
+    stats.attach(player)
+    width, height, moves = position["width"], position["height"], position["moves"]
+    if len(moves) % 2:
+        game = board_class("opponent", player, width, height, rng=seed)
+    else:
+        game = board_class(player, "opponent", width, height, rng=seed)
+    for move in moves:
+        game.apply_move(tuple(move))
+
+    player.time_left = Deadline(UNLIMITED)
+    if player.tt is not None:
+        player.tt.new_search()
+    stats.new_move(player, game)
+    player.record_move(player.iterative_deepening(game, first_depth, depth), "search")
+    return stats.records[-1]
+
+
+def measure(agent_name, position, depth, board_class=Board, repeat=REPEAT, seed=SEED,
+            in_place=False):
+    """Benchmark one agent on one position at one depth.
+
+    Returns
+    -------
+    dict
+        The `nodes`, `time_ms` and `nps` of the fixed-depth search, the
+        deepest iteration completed by iterative deepening (`depth`, which is
+        lower than the requested depth if the game was solved first), its
+        total number of nodes (`id_nodes`) and its `time_to_depth_ms`.
+    """
+    fixed = min((search(agent_name, position, depth, depth, board_class, seed, in_place)
+                 for _ in range(repeat)), key=lambda record: record["time_ms"])
+    deepening = min((search(agent_name, position, depth, 0, board_class, seed, in_place)
+                     for _ in range(repeat)), key=lambda record: record["time_ms"])
+    return {
+        "nodes": fixed["nodes"],
+        "time_ms": fixed["time_ms"],
+        "nps": fixed["nps"],
+        "depth": deepening["depth"],
+        "id_nodes": deepening["nodes"],
+        "time_to_depth_ms": deepening["time_to_depth_ms"],
+    }
+
+
+def run(agent_names, positions, depths, board="board", repeat=REPEAT, seed=SEED,
+        in_place=False):
+    """Benchmark every agent on every position at every depth.
+
+    Returns
+    -------
+    dict
+        The settings of the run and its `results`, keyed by
+        "agent|position|depth".
+    """
+    results = {}
+    for agent_name in agent_names:
+        for depth in depths:
+            print("{} at depth {}".format(agent_name, depth), end="", flush=True)
+            for position in positions:
+                key = "{}|{}|{}".format(agent_name, position["name"], depth)
+                results[key] = measure(agent_name, position, depth, BOARDS[board], repeat, seed,
+                                       in_place)
+                print(".", end="", flush=True)
+            print()
+    return {
+        "seed": seed,
+        "board": board,
+        "in_place": in_place,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """Print the results next to the baseline and return the list of
+    (agent, depth) pairs whose total fixed-depth time grew by more than
+    `tolerance`.
+    """
+    if (current["seed"], current["board"]) != (baseline["seed"], baseline["board"]):
+        print("Warning: the baseline was recorded with seed {} on {}".format(
+            baseline["seed"], baseline["board"]))
+    if current["in_place"] != baseline.get("in_place", False):
+        print("Note: the baseline searched {}".format(
+            "in place" if baseline.get("in_place", False) else "with board copies"))
+
+    print("\n{:<44}{:>10}{:>10}{:>8}{:>10}{:>10}".format(
+        "Search", "Nodes", "Base", "Time", "Base", "Ratio"))
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print("{:<44}{:>10}{:>10}{:>8.1f}{:>10}".format(key, result["nodes"], "-",
+                                                          result["time_ms"], "-"))
+            continue
+        ratio = _ratio(result["time_ms"], base["time_ms"])
+        flags = []
+        if result["nodes"] != base["nodes"]:
+            flags.append("nodes changed")
+        if ratio > 1 + tolerance:
+            flags.append("slower")
+        elif ratio < 1 - tolerance:
+            flags.append("faster")
+        print("{:<44}{:>10}{:>10}{:>8.1f}{:>10.1f}{:>10.2f}  {}".format(
+            key, result["nodes"], base["nodes"], result["time_ms"], base["time_ms"],
+            ratio, ", ".join(flags)))
+
+    # Only the searches present in both runs are totalled
+    shared = {key: result for key, result in current["results"].items()
+              if key in baseline["results"]}
+    totals = _totals(shared)
+    base_totals = _totals({key: baseline["results"][key] for key in shared})
+    regressions = []
+    print("\n{:<22}{:>6}{:>12}{:>8}{:>10}{:>8}{:>14}{:>8}".format(
+        "Agent", "Depth", "Time(ms)", "Ratio", "NPS", "Ratio", "To depth(ms)", "Ratio"))
+    for (agent_name, depth), (time_ms, nodes, to_depth) in sorted(totals.items()):
+        base_ms, base_nodes, base_to_depth = base_totals[agent_name, depth]
+        nps, base_nps = _ratio(1000 * nodes, time_ms), _ratio(1000 * base_nodes, base_ms)
+        ratio = _ratio(time_ms, base_ms)
+        print("{:<22}{:>6}{:>12.1f}{:>8.2f}{:>10.0f}{:>8.2f}{:>14.1f}{:>8.2f}".format(
+            agent_name, depth, time_ms, ratio, nps, _ratio(nps, base_nps),
+            to_depth, _ratio(to_depth, base_to_depth)))
+        if ratio > 1 + tolerance:
+            regressions.append((agent_name, depth))
+    return regressions
+
+
+def summarize(current):
+    """Print the totals of a run without a baseline to compare with. """
+    print("\n{:<22}{:>6}{:>12}{:>12}{:>10}{:>14}".format(
+        "Agent", "Depth", "Time(ms)", "Nodes", "NPS", "To depth(ms)"))
+    for (agent_name, depth), (time_ms, nodes, to_depth) in sorted(_totals(current["results"]).items()):
+        print("{:<22}{:>6}{:>12.1f}{:>12}{:>10.0f}{:>14.1f}".format(
+            agent_name, depth, time_ms, nodes, _ratio(1000 * nodes, time_ms), to_depth))
+
+
+def _totals(results):
+    """Return the total fixed-depth time, nodes and time-to-depth of the
+    results, keyed by (agent, depth).
+    """
+    totals = {}
+    for key, result in results.items():
+        agent_name, _, depth = key.split("|")
+        total = totals.setdefault((agent_name, int(depth)), [0., 0, 0.])
+        total[0] += result["time_ms"]
+        total[1] += result["nodes"]
+        if result["depth"] is not None:  # a solved position completes fewer iterations
+            total[2] += result["time_to_depth_ms"][str(result["depth"])]
+    return totals
+
+
+def _ratio(value, base):
+    """Return value / base, or 1 if base is 0. """
+    return value / base if base else 1.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the search of the alpha-beta agents.")
+    parser.add_argument("--agents", nargs="+", choices=sorted(AGENTS), default=sorted(AGENTS))
+    parser.add_argument("--depths", nargs="+", type=int, default=DEPTHS)
+    parser.add_argument("--board", choices=sorted(BOARDS), default="board",
+                        help="board implementation searched (default: board)")
+    parser.add_argument("--in-place", action="store_true",
+                        help="search on a single board with push_move() and pop_move()")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help="number of timed runs of each search; the fastest counts")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="relative slowdown reported as a regression (default: 0.25)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to the baseline file instead of comparing")
+    parser.add_argument("--output", metavar="PATH", help="also write the results to PATH")
+    parser.add_argument("--write-corpus", action="store_true",
+                        help="regenerate the corpus file and exit")
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        positions = generate_corpus(args.seed)
+        write_corpus(positions, args.corpus)
+        print("Wrote {} positions to {}".format(len(positions), args.corpus))
+        return 0
+
+    start_time = time.time()
+    current = run(args.agents, load_corpus(args.corpus), args.depths,
+                  args.board, args.repeat, args.seed, args.in_place)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+        summarize(current)
+        print("\nBaseline written to {}".format(args.baseline))
+        status = 0
+    else:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            summarize(current)
+            print("\nNo baseline at {}; record one with --save-baseline".format(args.baseline))
+            status = 0
+        else:
+            regressions = compare(current, baseline, args.tolerance)
+            for agent_name, depth in regressions:
+                print("REGRESSION: {} at depth {} is more than {:.0%} slower than the baseline".format(
+                    agent_name, depth, args.tolerance))
+            status = 1 if regressions else 0
+    print("--- %s seconds ---" % (time.time() - start_time))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
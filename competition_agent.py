@@ -4,12 +4,12 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
-import random
-import itertools
-
-class SearchTimeout(Exception):
-    """Subclass base exception for code clarity. """
-    pass
+from endgame import EndgameSolver
+from game_agent import AlphaBetaPlayer
+from isolation.symmetry import to_canonical, from_canonical
+from move_ordering import MoveOrderer
+from time_manager import TimeManager
+from transposition import PLAYER_2_KEY
 
 
 def custom_score(game, player):
@@ -33,10 +33,10 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    legal_moves = game.get_legal_moves()
+    active_moves = game.mobility() # number of legal moves of the active player
     self_is_active = player == game._active_player # flag for whether self is active
 
-    if not legal_moves:
+    if not active_moves:
         if self_is_active:
             return float("-inf")
         else:
@@ -49,16 +49,18 @@ def custom_score(game, player):
     x = float((h - y) ** 2 + (w - x) ** 2) # distance of the player from the opponent
 
     if self_is_active:
-        own_moves = len(legal_moves)
-        opp_moves = len(game.get_legal_moves(opponent))
+        own_moves = active_moves
+        opp_moves = game.mobility(opponent)
     else:
-        own_moves = len(game.get_legal_moves(player))
-        opp_moves = len(legal_moves)
+        own_moves = game.mobility(player)
+        opp_moves = active_moves
 
     return float(own_moves - opp_moves - x) # farther from the opponent, lower the score
 
+custom_score.uses_mobility = True   # see game_agent.IsolationPlayer (score_fn)
+
 
-class CustomPlayer:
+class CustomPlayer(AlphaBetaPlayer):
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
@@ -71,6 +73,10 @@ class CustomPlayer:
         COMPETITION.  IT IS NOT REQUIRED FOR THE ISOLATION PROJECT REVIEW.
     **************************************************************************
 
+    The search is `game_agent.AlphaBetaPlayer`'s; this agent scores the
+    positions with its own `custom_score` and caches the best moves and the
+    scores of the roots it searched in its matchBook.
+
     Parameters
     ----------
     data : string
@@ -81,180 +87,89 @@ class CustomPlayer:
         the PvP competition uses more accurate timers that are not cross-
         platform compatible, so a limit of 1ms (vs 10ms for the other classes)
         is generally sufficient.
-    """
-
-    def __init__(self, data=None, timeout=1.):
-        self.score = custom_score
-        self.time_left = None
-        self.TIMER_THRESHOLD = timeout
-        self.moveBook = {}  # Dictionary for symmetrical moves
-        self.matchBook = {}
-    def get_move(self, game, time_left):
-        """Search for the best move from the available legal moves and return a
-        result before the time limit expires.
-
-        **********************************************************************
-        NOTE: If time_left < 0 when this function returns, the agent will
-              forfeit the game due to timeout. You must return _before_ the
-              timer reaches 0.
-        **********************************************************************
-
-        Parameters
-        ----------
-        game : `isolation.Board`
-            An instance of `isolation.Board` encoding the current state of the
-            game (e.g., player locations and blocked cells).
-
-        time_left : callable
-            A function that returns the number of milliseconds left in the
-            current turn. Returning with any less than 0 ms remaining forfeits
-            the game.
-
-        Returns
-        -------
-        (int, int)
-            Board coordinates corresponding to a legal move; may return
-            (-1, -1) if there are no available legal moves.
-        """
-        self.time_left = time_left
-
-        # Initialize the best move so that this function returns something
-        # in case the search fails due to timeout
-        best_move = (-1, -1)
 
-        try:
-            # The try/except block will automatically catch the exception
-            # raised when the timer is about to expire.
-            for depth in itertools.count():            # Perform iterative deepening
-               best_move = self.alphabeta(game, depth) # Record last best move
-        except SearchTimeout as instance:
-            pass   # Handle any actions required after timeout as needed
+    in_place : bool (optional)
+        If True, search the game tree on a single board with push_move() and
+        pop_move() instead of allocating a copy of the board for every node.
+
+    tt_size : int (optional)
+        Number of entries in the transposition table consulted at every
+        interior node of the search; 0 disables the table.
+
+    ordering : callable (optional)
+        Factory for the move orderer used by the search (see
+        `move_ordering.MoveOrderer` for the interface); None searches the
+        moves in the order they are generated.
+
+    pvs : bool (optional)
+        If True, search with Principal Variation Search (null-window scouts
+        of all moves but the first, re-searched only on fail high).
+
+    aspiration : float (optional)
+        Half-width of the aspiration window centred on the previous
+        iteration's score; None searches every iteration with the full
+        window.
+
+    workers : int (optional)
+        The number of processes searching each move; helper processes run
+        Lazy SMP with a shared transposition table (see `lazy_smp`). They
+        are forked when the player is created and stopped by `close()`.
+
+    book : str or opening_book.OpeningBook (optional)
+        An opening book, or the name of a book file to memory-map, whose
+        moves are played without searching.
+
+    endgame : callable (optional)
+        Factory for the exact solver used once the players are separated
+        (see `endgame.EndgameSolver`); None disables it.
+
+    tablebase : str or tablebase.Tablebase (optional)
+        A table of solved positions, or the name of a table file to
+        memory-map, whose optimal moves are played without searching on
+        boards of its size.
+
+    time_manager : callable (optional)
+        Factory, called with `timeout`, for the time manager that schedules
+        the iterations and calibrates TIMER_THRESHOLD (see
+        `time_manager.TimeManager`); None keeps the fixed `timeout` margin.
+
+    stats : search_stats.SearchStats (optional)
+        A collector recording statistics about every move; None records
+        nothing.
+    """
 
-        # Return the best move from the last completed search iteration
-        return best_move
+    def __init__(self, data=None, timeout=1., in_place=False, tt_size=1 << 16,
+                 ordering=MoveOrderer, pvs=True, aspiration=None, workers=1, book=None,
+                 endgame=EndgameSolver, tablebase=None, time_manager=TimeManager, stats=None):
+        self.matchBook = {}  # set first: the Lazy SMP helpers are forked by the base class
+        super().__init__(score_fn=custom_score, timeout=timeout, in_place=in_place,
+                         tt_size=tt_size, ordering=ordering, pvs=pvs, aspiration=aspiration,
+                         workers=workers, book=book, endgame=endgame, tablebase=tablebase,
+                         time_manager=time_manager, stats=stats)
 
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
-
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout((-1, -1))
-
-        best_move = (-1, -1)
-        legal_moves = game.get_legal_moves()
-        if not legal_moves or depth == 0:       # return (-1, -1) if terminal state
-            return best_move
-
-        n = len(game.get_blank_spaces())
-        if n == game.height * game.width:      # Make the first move to be the center if player 1
-            return (3, 3)
-
-        game_state = game.hash()
-        if game_state in self.matchBook:
-            if depth in self.matchBook[game_state]:
-                return self.matchBook[game_state][depth]
-        else:
-            self.matchBook[game_state] = {}
-
-        score = float('-inf')
-        for m in legal_moves:
-
-            ss = None
-            if n > game.height * game.width - 3: # Until 3 search levels, check for symmetry
-                next_game = game.forecast_move(m)
-                # Zero out the last three board state indices for storing an appropriate hash value
-                next_game._board_state[-1] = next_game._board_state[-2] = next_game._board_state[-3] = 0
-                hval = next_game.hash()
-
-                if hval in self.moveBook:
-                    ss = self.moveBook[hval]
-                else:
-                    ss = self.symmetry_score(next_game) # rotate the board to check for symmetry
-
-            if ss is None: # if symmetry is not found, search the nodes
-                new_score = self.min_value(game.forecast_move(m), depth - 1, alpha, beta)
-                score, best_move = max((score, best_move), (new_score, m))
-                if n > game.height * game.width - 3:
-                    self.moveBook[hval] = new_score
-            else:         # if symmetry is found, use the score from the move_book
-                score, best_move = max((score, best_move), (ss, m))
-            alpha = max(alpha, score)              # Update alpha
-        self.matchBook[game_state][depth] = best_move
-        return best_move
-
-
-    def max_value(self, game, depth, alpha, beta):# Maximizing Player
-        if self.time_left() < self.TIMER_THRESHOLD: # If the timer check fails, return the last recorded best move
-            raise SearchTimeout()
-
-        legal_moves = game.get_legal_moves()
-        if depth == 0  or not legal_moves:          # Terminal state
-            return self.score(game, self)           # Return the score from the perspective of the AlphaBetaPlayer
-
-        # Otherwise, get the best score from recursing further
-        score = float('-inf')
-        for m in legal_moves:
-            score = max(score, self.min_value(game.forecast_move(m), depth - 1, alpha, beta))
-            if score >= beta: return score          # A score greater than beta won't be selected by the parent min-node, so search can stop here
-            alpha = max(alpha, score)               # Update alpha
-        return score
-
-    def min_value(self, game, depth, alpha, beta):
-        if self.time_left() < self.TIMER_THRESHOLD: # If the timer check fails, return the last recorded best move
-            raise SearchTimeout()
-
-        legal_moves = game.get_legal_moves()
-        if depth == 0 or not legal_moves:           # Terminal state
-            return self.score(game, self)           # Return the score from the perspective of the AlphaBetaPlayer
-
-        # Otherwise, get the best score from recursing further
-        score = float('inf')
-        for m in legal_moves:
-            score = min(score, self.max_value(game.forecast_move(m), depth - 1, alpha, beta))
-            if score <= alpha: return score         # A score lesser than alpha will not be selected by the parent max-node, so search can stop here
-            beta = min(beta, score)                 # Update alpha
-        return score
-
-    def symmetry_score(self, game):
-        """
-        Converts Board state into 2x2 matrix, rotates the matrix vertically and
-        horizontally for checking if the value of the search tree is known.
-
-        Parameters
-        ----------
-        game : isolation.Board
-            An forecast instance of the Isolation game `Board` class representing the
-            game state with a certain move applied
-
-        Returns
-        -------
-        (int, int)
-            Score of a symmetrical board state if it already known, else None
+        """Search `game` like `AlphaBetaPlayer.alphabeta`, reusing the best
+        move of an earlier search of the same root (or of one of its
+        rotations and reflections) to the same depth from the matchBook,
+        with its root score.
         """
-        h = game.height; w = game.width
-        matrix = [game._board_state[i:i+h] for i in range(0, h * w, h)]
-        for i in (0, 1):
-            if i == 0:
-                m = [m[::-1] for m in matrix]  # vertical flip
-            else:
-                m = matrix[::-1]               # horizontal flip
-
-            b = self.get_board_state(m, game)
-            game._board_state = b
-            hval = game.hash()
-
-            if hval in self.moveBook:         # if a hash value is found by rotating the board,
-                return self.moveBook[hval]    # return the recorded state
-        return None
-
-    def get_board_state(self, matrix, game):
-        """
-        Converts a 2x2 matrix into a Board state 1D-array, zeroing out the last
-        three values for getting the equivalent hash value.
-        """
-        h = game.height; w = game.width
-        b = [0] * (h * w + 3)
-        for i, u in enumerate(matrix):
-            for j, v in enumerate(u):
-                b[i * h + j] = matrix[i][j]  # Fill up the 1D array
-
-        b[-1] = b[-2] = b[-3] = 0
-        return b
+        # Root moves are cached under the canonical form of the position, in
+        # this player's key space (see AlphaBetaPlayer.alphabeta)
+        self.tt_salt = PLAYER_2_KEY if self == game._player_2 else 0
+        if game._sym_keys is None:
+            game.enable_symmetry()
+        game_state, transform = self.tt_key(game)
+        if self.stats is not None:
+            self.stats.matchbook_probes += 1
+            self.stats.matchbook_hits += depth in self.matchBook.get(game_state, ())
+        cached = self.matchBook.setdefault(game_state, {})
+        if depth in cached:
+            move, self.root_score = cached[depth]
+            self.depth_limited = True   # the cached search may have been cut off
+            return from_canonical(move, transform, game.width, game.height)
+
+        best_move = super().alphabeta(game, depth, alpha, beta)
+        if best_move != (-1, -1) and alpha < self.root_score < beta:
+            cached[depth] = (to_canonical(best_move, transform, game.width, game.height),
+                             self.root_score)  # Only cache results that are exact for any window
+        return best_move
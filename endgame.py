@@ -0,0 +1,123 @@
+"""This file contains the `EndgameSolver` class, which plays perfectly once the
+two players have been separated into disjoint regions of the board.
+
+From then on the game is a race: each player makes the longest knight path
+it can in its own region, and the active player wins if and only if its
+path is strictly longer than its opponent's. The solver finds the longest
+path from a cell by exhaustive search, memoized on the pair (cell, bitmask
+of the cells still reachable from it), which is usually a few milliseconds
+for the regions left in an endgame.
+"""
+from isolation.bitboard import knight_tables
+from isolation.partition import flood_fill, separated_regions
+
+
+class SolverTimeout(Exception):
+    """Raised when the solver runs out of time. """
+    pass
+
+
+class EndgameSolver(object):
+    """Exact longest-path solver for separated positions.
+
+    Parameters
+    ----------
+    max_entries : int (optional)
+        The number of longest path lengths remembered; the memo is cleared
+        when it grows beyond this size.
+    """
+
+    def __init__(self, max_entries=1 << 20):
+        self.max_entries = max_entries
+        self.memo = {}   # (cell index, region bitmask) -> longest path length
+        self.time_left = None
+        self.threshold = 0.
+        self.size = None
+        self.even_cells = 0  # bitmask of the cells (r, c) with r + c even
+
+    def solve(self, game, time_left, threshold=0.):
+        """Return an optimal move for the active player of `game` if the
+        players have been separated.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The game state.
+
+        time_left : callable
+            A function returning the number of milliseconds left.
+
+        threshold : float (optional)
+            The solver gives up when `time_left()` drops below this value.
+
+        Returns
+        -------
+        (int, int) or None
+            A move maximizing the length of the active player's remaining
+            path (hence winning whenever the position is won), or None if the
+            players are not separated, the active player has no legal moves
+            or the solver ran out of time.
+        """
+        regions = separated_regions(game)
+        if regions is None:
+            return None
+        if len(self.memo) > self.max_entries or self.size != (game.width, game.height):
+            self.memo.clear()  # the memo only holds the paths of one board size
+            self.size = (game.width, game.height)
+        self.time_left = time_left
+        self.threshold = threshold
+
+        coords, masks = knight_tables(game.width, game.height)[:2]
+        self.even_cells = sum(1 << idx for idx, (r, c) in enumerate(coords) if (r + c) % 2 == 0)
+        region = regions[0]
+        best_move, best_length = None, -1
+        try:
+            for move in game.get_legal_moves():
+                idx = move[0] + move[1] * game.height
+                rest = region & ~(1 << idx)
+                length = self.longest_path(idx, flood_fill(idx, rest, masks), masks)
+                if length > best_length:
+                    best_move, best_length = move, length
+        except SolverTimeout:
+            return None
+        return best_move
+
+    def longest_path(self, idx, region, masks):
+        """Return the number of moves in the longest knight path from cell idx
+        through the cells of `region`, the bitmask of the blank cells
+        reachable from idx.
+        """
+        key = (idx, region)
+        length = self.memo.get(key)
+        if length is not None:
+            return length
+        if self.time_left() < self.threshold:
+            raise SolverTimeout()
+
+        # Knight moves alternate between even and odd cells, so a path from
+        # idx visits at most one more cell of the other parity than of its own
+        other = region & ~self.even_cells
+        if not self.even_cells >> idx & 1:
+            other = region & self.even_cells
+        other = bin(other).count("1")
+        same = bin(region).count("1") - other
+        bound = min(2 * other, 2 * same + 1)
+        # Try the cells with the fewest onward moves first (Warnsdorff's rule),
+        # which tends to find a path reaching the bound early
+        cells = []
+        moves = masks[idx] & region
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            cell = bit.bit_length() - 1
+            cells.append((bin(masks[cell] & region).count("1"), cell, bit))
+        cells.sort()
+
+        length = 0
+        for _, cell, bit in cells:
+            if length >= bound:
+                break
+            length = max(length, 1 + self.longest_path(
+                cell, flood_fill(cell, region ^ bit, masks), masks))
+        self.memo[key] = length
+        return length
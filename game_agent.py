@@ -2,9 +2,14 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
-import random
+import json
+import math
 import itertools
 
+from isolation import Deadline
+from isolation.bitboard import knight_tables
+from isolation.symmetry import canonical_form, to_canonical, from_canonical
+
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     def __init__(self, value = {-1, -1}): # initializing an instance
@@ -35,10 +40,10 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    legal_moves = game.get_legal_moves()
+    active_moves = game.mobility() # number of legal moves of the active player
     self_is_active = player == game._active_player # flag for whether self is active
 
-    if not legal_moves:
+    if not active_moves:
         if self_is_active:
             return float("-inf")
         else:
@@ -51,14 +56,16 @@ def custom_score(game, player):
     x = float((h - y) ** 2 + (w - x) ** 2) # distance of the player from the opponent
 
     if self_is_active:
-        own_moves = len(legal_moves)
-        opp_moves = len(game.get_legal_moves(opponent))
+        own_moves = active_moves
+        opp_moves = game.mobility(opponent)
     else:
-        own_moves = len(game.get_legal_moves(player))
-        opp_moves = len(legal_moves)
+        own_moves = game.mobility(player)
+        opp_moves = active_moves
 
     return float(own_moves - opp_moves - x) # farther from the opponent, lower the score
 
+custom_score.uses_mobility = True   # see IsolationPlayer (score_fn)
+
 
 def custom_score_2(game, player):
     """Calculate the heuristic value of a game state from the point of view
@@ -82,10 +89,10 @@ def custom_score_2(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    legal_moves = game.get_legal_moves()
+    active_moves = game.mobility() # number of legal moves of the active player
     self_is_active = player == game._active_player # flag for whether self is active
 
-    if not legal_moves:
+    if not active_moves:
         if self_is_active:
             return float("-inf")
         else:
@@ -98,15 +105,18 @@ def custom_score_2(game, player):
     x = float((h - y) ** 2 + (w - x) ** 2) # opponent distance from center
 
     if self_is_active:
-        own_moves = len(legal_moves)
-        opp_moves = len(game.get_legal_moves(opponent))
+        own_moves = active_moves
+        opp_moves = game.mobility(opponent)
     else:
-        own_moves = len(game.get_legal_moves(player))
-        opp_moves = len(legal_moves)
+        own_moves = game.mobility(player)
+        opp_moves = active_moves
 
     return float(own_moves - opp_moves + x) # if opponent is farther from the center,
                                             # the score is higher
 
+custom_score_2.uses_mobility = True
+
+
 def custom_score_3(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -129,10 +139,10 @@ def custom_score_3(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    legal_moves = game.get_legal_moves()
+    active_moves = game.mobility() # number of legal moves of the active player
     self_is_active = player == game._active_player # flag for whether self is active
 
-    if not legal_moves:
+    if not active_moves:
         if self_is_active:
             return float("-inf")
         else:
@@ -141,14 +151,204 @@ def custom_score_3(game, player):
     opponent = game.get_opponent(player)
 
     if self_is_active:
-        own_moves = len(legal_moves)
-        opp_moves = len(game.get_legal_moves(opponent))
+        own_moves = active_moves
+        opp_moves = game.mobility(opponent)
     else:
-        own_moves = len(game.get_legal_moves(player))
-        opp_moves = len(legal_moves)
+        own_moves = game.mobility(player)
+        opp_moves = active_moves
 
     return float(own_moves - 2 * opp_moves) # aggressively outstep the opponent
 
+custom_score_3.uses_mobility = True
+
+
+ROLLOUTS = 1000  # number of random playouts per call of rollout_score
+
+def rollout_score(game, player):
+    """Calculate the heuristic value of a game state from the point of view
+    of the given player as the fraction of ROLLOUTS random playouts from the
+    state that the player wins.
+
+    The playouts run as a single NumPy batch (see `isolation.playouts`), so
+    NumPy is needed to use this heuristic. A call takes several
+    milliseconds, so it is meant for shallow searches or Monte Carlo
+    evaluators, and agents using it need a timeout margin above that.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        An instance of `isolation.Board` encoding the current state of the
+        game (e.g., player locations and blocked cells).
+
+    player : object
+        A player instance in the current game (i.e., an object corresponding to
+        one of the player objects `game.__player_1__` or `game.__player_2__`.)
+
+    Returns
+    -------
+    float
+        The heuristic value of the current game state to the specified player.
+    """
+    from isolation.playouts import win_rates  # NumPy is only needed by this heuristic
+
+    active_moves = game.mobility() # number of legal moves of the active player
+    self_is_active = player == game._active_player # flag for whether self is active
+
+    if not active_moves:
+        if self_is_active:
+            return float("-inf")
+        else:
+            return float("inf")
+
+    rate = float(win_rates([game], ROLLOUTS)[0]) # win rate of the active player
+    return rate if self_is_active else 1. - rate
+
+
+def _rollout_batch(game, moves, player):
+    """Score the successors of `game` reached by each of `moves` like
+    rollout_score, running the playouts of all of them in a single NumPy
+    batch built from the arrays of `game`.
+    """
+    import numpy as np
+    from isolation.playouts import board_arrays, playouts
+
+    h = game.height
+    masks = knight_tables(game.width, h)[1]
+    blank = game.get_blank_mask()
+    blocked, (_, waiting) = board_arrays(game)
+    reach = masks[waiting] if waiting >= 0 else blank   # cells the waiting player may move to
+    self_waits = player == game._inactive_player        # whether player is to move in the successors
+
+    cells = [m[0] + m[1] * h for m in moves]
+    live = [i for i, idx in enumerate(cells) if reach & blank & ~(1 << idx)]
+    scores = [float("-inf") if self_waits else float("inf")] * len(moves)
+    if live:
+        children = np.repeat(blocked[None], len(live), axis=0)
+        children[np.arange(len(live)), [cells[i] for i in live]] = True
+        locations = [(waiting, cells[i]) for i in live]
+        wins = playouts(np.repeat(children, ROLLOUTS, axis=0),
+                        np.repeat(np.array(locations), ROLLOUTS, axis=0), game.width, h)
+        for i, rate in zip(live, wins.reshape(len(live), ROLLOUTS).mean(axis=1).tolist()):
+            scores[i] = rate if self_waits else 1. - rate
+    return scores
+
+_rollout_batch.size = 1                # each child takes several milliseconds to score
+rollout_score.batch = _rollout_batch   # see IsolationPlayer.frontier_scores
+
+
+class LinearScore(object):
+    """Heuristic scoring a game state with a weighted sum of features, e.g.
+    with the weights fitted to self-play games by `tuner.py`:
+
+        score_fn = LinearScore.load("tuned_weights.json")
+        player = AlphaBetaPlayer(score_fn=score_fn)
+
+    The features, all from the point of view of the given player, are:
+
+        own_moves, opp_moves   the number of legal moves of each player
+        common_moves           the number of cells both players can move to
+        player_distance        the squared distance between the players
+        own_center, opp_center the squared distance of each player from the
+                               center of the board
+        to_move                1 if the player is active, -1 otherwise
+
+    The score is the logit of the player's estimated chance of winning, so
+    the scores of the two players must be opposite: common_moves and
+    player_distance, which both players share, are counted negative for
+    the inactive player, like to_move.
+
+    The heuristic also scores all the successors of a game at once with
+    `batch()`, which the alpha-beta search uses at its frontier nodes.
+
+    Parameters
+    ----------
+    weights : dict
+        The weight of each feature; missing features weigh 0.
+    """
+    FEATURES = ("own_moves", "opp_moves", "common_moves", "player_distance",
+                "own_center", "opp_center", "to_move")
+
+    def __init__(self, weights):
+        self.weights = dict(weights)
+        self.coefficients = [self.weights.get(name, 0.) for name in self.FEATURES]
+
+    @classmethod
+    def load(cls, path):
+        """Read the weights from a JSON file written by `tuner.py`. """
+        with open(path) as f:
+            return cls(json.load(f)["weights"])
+
+    def features(self, game, player):
+        """Return the values of FEATURES for `player` in `game`. """
+        opponent = game.get_opponent(player)
+        own = game.get_legal_moves(player)
+        opp = game.get_legal_moves(opponent)
+        own_loc = game.get_player_location(player)
+        opp_loc = game.get_player_location(opponent)
+        distance = own_center = opp_center = 0.
+        r, c = (game.height - 1) / 2., (game.width - 1) / 2.
+        if own_loc is not None:
+            own_center = (own_loc[0] - r) ** 2 + (own_loc[1] - c) ** 2
+        if opp_loc is not None:
+            opp_center = (opp_loc[0] - r) ** 2 + (opp_loc[1] - c) ** 2
+            if own_loc is not None:
+                distance = (own_loc[0] - opp_loc[0]) ** 2 + (own_loc[1] - opp_loc[1]) ** 2
+        sign = 1. if player == game._active_player else -1.
+        return (len(own), len(opp), sign * len(set(own).intersection(opp)), sign * distance,
+                own_center, opp_center, sign)
+
+    def __call__(self, game, player):
+        values = self.features(game, player)
+        if player == game._active_player:
+            if not values[0]:
+                return float("-inf")
+        elif not values[1]:
+            return float("inf")
+        return float(sum(w * v for w, v in zip(self.coefficients, values)))
+
+    def batch(self, game, moves, player):
+        """Return the scores of `player` in the successors of `game` reached
+        by each of `moves`, computed together from the blank cells and knight
+        move masks of `game` rather than from a copy of every successor.
+        """
+        h = game.height
+        mover, waiting = game._active_player, game._inactive_player
+        loc = game.get_player_location(waiting)
+        if loc is None:                     # The waiting player may move to any blank cell
+            return [self(game.forecast_move(m), player) for m in moves]
+        masks = knight_tables(game.width, h)[1]
+        r, c = (h - 1) / 2., (game.width - 1) / 2.
+        blank = game.get_blank_mask()
+        waiting_idx = loc[0] + loc[1] * h
+        waiting_mask = masks[waiting_idx]
+        waiting_center = (loc[0] - r) ** 2 + (loc[1] - c) ** 2
+        # The waiting player is to move in every successor
+        sign = 1. if player == waiting else -1.
+        w_own, w_opp, w_common, w_distance, w_own_center, w_opp_center, w_to_move = self.coefficients
+        if player == mover:
+            w_own, w_opp, w_own_center, w_opp_center = w_opp, w_own, w_opp_center, w_own_center
+
+        scores = []
+        for move in moves:
+            idx = move[0] + move[1] * h
+            free = blank & ~(1 << idx)
+            waiting_moves = waiting_mask & free
+            if not waiting_moves:
+                scores.append(float("-inf") * sign)
+                continue
+            mover_moves = masks[idx] & free
+            common = bin(waiting_moves & mover_moves).count("1")
+            distance = (move[0] - loc[0]) ** 2 + (move[1] - loc[1]) ** 2
+            scores.append(float(w_own * bin(waiting_moves).count("1")
+                                + w_opp * bin(mover_moves).count("1")
+                                + sign * (w_common * common + w_distance * distance + w_to_move)
+                                + w_own_center * waiting_center
+                                + w_opp_center * ((move[0] - r) ** 2 + (move[1] - c) ** 2)))
+        return scores
+
+
+FRONTIER_CHUNK = 4  # children scored per call of a batch heuristic that has no size
+
 
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
@@ -156,6 +356,11 @@ class IsolationPlayer:
 
     ********************  DO NOT MODIFY THIS CLASS  ********************
 
+    Every search extension below is off by default, so that an agent built
+    with only `search_depth`, `score_fn` and `timeout` is the plain agent of
+    the project (e.g. the AB_Improved reference of tournament.py); see
+    `competition_agent.CustomPlayer` for an agent enabling them.
+
     Parameters
     ----------
     search_depth : int (optional)
@@ -165,19 +370,376 @@ class IsolationPlayer:
         current state.)
 
     score_fn : callable (optional)
-        A function to use for heuristic evaluation of game states.
+        A function to use for heuristic evaluation of game states. A function
+        counting legal moves with `game.mobility()` should have a true
+        `uses_mobility` attribute: the alpha-beta search then keeps the
+        counts up to date as it moves (see `isolation.Board.enable_mobility`).
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted. Should be a
         positive value large enough to allow the function to return before the
         timer expires.
+
+    in_place : bool (optional)
+        If True, search the game tree on a single board with push_move() and
+        pop_move() instead of allocating a copy of the board for every node.
+
+    tt_size : int (optional)
+        Number of entries in the transposition table used by the alpha-beta
+        search; 0 disables the table.
+
+    ordering : callable (optional)
+        Factory for the move orderer used by the alpha-beta search (see
+        `move_ordering.MoveOrderer` for the interface); None searches the
+        moves in the order they are generated.
+
+    pvs : bool (optional)
+        If True, the alpha-beta search uses Principal Variation Search: the
+        moves after the first one are searched with a null window and only
+        re-searched when they fail high.
+
+    aspiration : float (optional)
+        Half-width of the aspiration window centred on the previous
+        iteration's score during iterative deepening; None searches every
+        iteration with the full window.
+
+    workers : int (optional)
+        The number of processes searching each move. With more than one,
+        the alpha-beta search runs Lazy SMP: `workers - 1` helper processes
+        (see `lazy_smp.HelperPool`) search the same root and share the
+        transposition table in shared memory, which `tt_size` must enable.
+        The helpers are forked when the player is created, which a daemonic
+        process (e.g. a `multiprocessing.Pool` worker) cannot do, and run
+        until `close()` is called or the player is garbage collected.
+
+    book : str or opening_book.OpeningBook (optional)
+        An opening book (or the name of a book file, memory-mapped when the
+        player is created) whose moves the alpha-beta search plays without
+        searching; see `opening_book.py` to build one.
+
+    endgame : callable (optional)
+        Factory for the solver the alpha-beta search hands over to once the
+        players are separated (see `endgame.EndgameSolver`); None keeps
+        searching heuristically until the end of the game.
+
+    tablebase : str or tablebase.Tablebase (optional)
+        A table of solved positions (or the name of a table file,
+        memory-mapped when the player is created) whose optimal moves the
+        alpha-beta search plays without searching on boards of its size;
+        see `tablebase.py` to build one.
+
+    time_manager : callable (optional)
+        Factory, called with `timeout`, for the time manager of the
+        alpha-beta search (see `time_manager.TimeManager`). It skips
+        iterations that are not expected to finish and recalibrates
+        TIMER_THRESHOLD on every move, never below `timeout`; None keeps
+        the fixed `timeout` margin and deepens until the timer expires.
+
+    stats : search_stats.SearchStats (optional)
+        A collector recording statistics about every move chosen by the
+        alpha-beta search; None records nothing.
     """
-    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.):
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., in_place=False,
+                 tt_size=0, ordering=None, pvs=False, aspiration=None,
+                 workers=1, book=None, endgame=None, tablebase=None,
+                 time_manager=None, stats=None):
+        if workers > 1 and not tt_size:
+            raise ValueError("Lazy SMP helpers share the transposition table; "
+                             "workers > 1 needs tt_size > 0")
         self.search_depth = search_depth
         self.score = score_fn
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.in_place = in_place
         self.moveBook = {}  # Dictionary for symmetrical moves
+        if tt_size:
+            from transposition import TranspositionTable, SharedTranspositionTable
+            table = SharedTranspositionTable if workers > 1 else TranspositionTable
+            self.tt = table(tt_size)
+        else:
+            self.tt = None
+        self.tt_salt = 0
+        self.ordering = ordering() if ordering else None
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.root_score = None
+        self.depth_limited = False  # whether the last search cut off any line at the depth limit
+        self.poll_every = 1         # number of nodes searched between two timer checks
+        self.countdown = 1          # nodes left until the next timer check
+        self.poll_batch = 1         # value of countdown after the last timer check
+        self.last_poll = None       # time left at the last timer check
+        self.nodes = 0              # nodes searched for the current move up to the last timer check
+        self.workers = workers
+        self.helpers = None
+        if isinstance(book, str):
+            from opening_book import OpeningBook
+            book = OpeningBook(book)
+        self.book = book
+        self.endgame = endgame() if endgame else None
+        if isinstance(tablebase, str):
+            from tablebase import Tablebase
+            tablebase = Tablebase(tablebase)
+        self.tablebase = tablebase
+        self.timer = time_manager(timeout) if time_manager else None
+        self.stats = None
+        self.start_helpers()                    # The helpers are forked with a copy of this player
+        if stats is not None:
+            stats.attach(self)
+
+    def start_helpers(self):
+        """Fork the Lazy SMP helper processes of a player searching with more
+        than one worker, unless they are already running.
+
+        Raises
+        ------
+        ValueError
+            If this is a daemonic process, which cannot fork children.
+        """
+        if self.workers > 1 and self.helpers is None:
+            from lazy_smp import HelperPool
+            self.helpers = HelperPool(self, self.workers - 1)
+
+    def close(self):
+        """Stop the helper processes, if any; the player then searches alone. """
+        helpers, self.helpers = getattr(self, "helpers", None), None
+        if helpers is not None:
+            helpers.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["helpers"] = None  # copies fork helpers of their own
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.start_helpers()
+
+    def child_value(self, game, move, value_fn, *args):
+        """Return the value of the successor of `game` reached by `move`, as
+        computed by `value_fn(successor, *args)`.
+
+        In in-place mode the move is pushed onto `game` and popped again
+        afterwards (even if the search times out), otherwise the successor is
+        a forecast copy of the board.
+        """
+        if not self.in_place:
+            return value_fn(game.forecast_move(move), *args)
+        game.push_move(move)
+        try:
+            return value_fn(game, *args)
+        finally:
+            game.pop_move()
+
+    def frontier_scores(self, game, legal_moves):
+        """Return an iterator over the scores of the children of a node one
+        ply above the depth limit, or None if the heuristic cannot score them
+        together.
+
+        A heuristic opts in by having a `batch(game, moves, player)`
+        attribute returning the scores of `player` in the successors of
+        `game` reached by each of `moves`, as `score(game.forecast_move(m),
+        player)` would one by one, but from one computation that needs no
+        copy of the successors (see `LinearScore.batch`, and `rollout_score`
+        whose playouts then run in NumPy batches). The children are scored
+        in chunks as the search asks for their scores, so a cutoff stops the
+        scoring, and count as searched nodes once scored. A batch has a
+        `size` attribute, the number of children it scores per call, if it
+        is too slow to run between two timer checks; the timer is then
+        checked before every call. Other batches score FRONTIER_CHUNK
+        children per call.
+        """
+        batch = getattr(self.score, "batch", None)
+        if batch is None:
+            return None
+        return self._frontier_chunks(game, legal_moves, batch)
+
+    def _frontier_chunks(self, game, legal_moves, batch):
+        """Yield the scores of `frontier_scores`, one chunk at a time. """
+        size = getattr(batch, "size", None)
+        step = size or FRONTIER_CHUNK
+        for start in range(0, len(legal_moves), step):
+            moves = legal_moves[start:start + step]
+            self.countdown -= len(moves)
+            if self.countdown <= 0 or size is not None:
+                self.poll_timer()
+            scores = batch(game, moves, self)
+            if not all(math.isinf(score) for score in scores):
+                self.depth_limited = True   # Some child was cut off by the depth limit
+            yield from scores
+
+    def tt_key(self, game):
+        """Return the cache key of a game state, shared by all of its
+        rotations and reflections, and the symmetry mapping the state onto
+        its canonical orientation.
+        """
+        key, transform = canonical_form(game)
+        return key ^ self.tt_salt, transform
+
+    def tt_lookup(self, game, depth, alpha, beta):
+        """Probe the transposition table for the current node.
+
+        Returns
+        -------
+        (float, (int, int))
+            The stored score if the stored result is at least `depth` plies
+            deep and its bound settles the value of the node for the window
+            (alpha, beta), otherwise None; and the stored best move, to be
+            searched first (None if there is none).
+        """
+        tt = self.tt
+        if tt is None:
+            return None, None
+        key, transform = self.tt_key(game)
+        entry = tt.probe(key)
+        if self.stats is not None:
+            self.stats.tt_probes += 1
+            self.stats.tt_hits += entry is not None
+        if entry is None:
+            return None, None
+        tt_depth, tt_score, tt_bound, tt_move = entry
+        tt_move = from_canonical(tt_move, transform, game.width, game.height)
+        if tt_depth >= depth and (tt_bound == tt.EXACT or
+                                  (tt_bound == tt.LOWER and tt_score >= beta) or
+                                  (tt_bound == tt.UPPER and tt_score <= alpha)):
+            if not math.isinf(tt_score):  # a heuristic score from a depth-limited search
+                self.depth_limited = True
+            return tt_score, tt_move
+        return None, tt_move
+
+    def order_moves(self, game, legal_moves, maximizing, tt_move):
+        """Sort `legal_moves` in-place into search order: the best move
+        stored in the transposition table first (if it is legal), then the
+        order of the move orderer, if any.
+        """
+        if self.ordering is not None:
+            self.ordering.order(game, legal_moves, maximizing)
+        if tt_move in legal_moves:
+            legal_moves.remove(tt_move)
+            legal_moves.insert(0, tt_move)
+
+    def tt_record(self, game, depth, score, alpha, beta, move):
+        """Store the score of a node searched with the window (alpha, beta)
+        in the transposition table.
+        """
+        tt = self.tt
+        if tt is None:
+            return
+        if score <= alpha:
+            bound = tt.UPPER
+        elif score >= beta:
+            bound = tt.LOWER
+        else:
+            bound = tt.EXACT
+        key, transform = self.tt_key(game)
+        tt.store(key, depth, score, bound,
+                      to_canonical(move, transform, game.width, game.height))
+
+    def principal_variation(self, game, best_move, depth):
+        """Return the principal variation of the last search from `game` as a
+        list of (Zobrist key, move) pairs, starting with `best_move` and
+        following the best moves stored in the transposition table.
+        """
+        pv = [(game.zobrist, best_move)]
+        if self.tt is None or best_move not in game.get_legal_moves():
+            return pv
+
+        game = game.forecast_move(best_move)
+        for _ in range(depth - 1):
+            key, transform = self.tt_key(game)
+            entry = self.tt.probe(key)
+            if entry is None:
+                break
+            move = from_canonical(entry[3], transform, game.width, game.height)
+            if move not in game.get_legal_moves():
+                break
+            pv.append((game.zobrist, move))
+            game.apply_move(move)
+        return pv
+
+    def poll_timer(self):
+        """Check the timer, raising SearchTimeout once less than
+        TIMER_THRESHOLD milliseconds are left.
+
+        The search calls this every `self.poll_every` nodes rather than at
+        every node; the interval is adapted to the node rate measured between
+        two checks so that about a quarter of TIMER_THRESHOLD passes between
+        them.
+        """
+        searched = self.poll_batch - self.countdown  # nodes since the last check
+        self.nodes += searched
+        self.poll_batch = self.countdown = 0
+        time_left = self.time_left()
+        if time_left < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        if self.last_poll is not None and self.last_poll > time_left:
+            nodes_per_ms = searched / (self.last_poll - time_left)
+            self.poll_every = max(1, int(nodes_per_ms * self.TIMER_THRESHOLD / 4))
+        self.last_poll = time_left
+        self.poll_batch = self.countdown = self.poll_every
+
+    def nodes_searched(self):
+        """Return the number of nodes searched for the current move. """
+        return self.nodes + self.poll_batch - self.countdown
+
+    def record_move(self, move, source):
+        """Report the move chosen by get_move() (from the "tablebase", the
+        "book", the "endgame" solver or the "search") to the stats collector,
+        if any, and return it.
+        """
+        if self.stats is not None:
+            nodes = self.nodes_searched() if source == "search" else 0
+            self.stats.end_move(self, move, source, nodes)
+        return move
+
+    def pvs_value(self, game, move, value_fn, depth, alpha, beta, scout, maximizing):
+        """Return the value of the child of `game` reached by `move` for the
+        window (alpha, beta), using Principal Variation Search.
+
+        If `scout` is true (the move is not the first one searched) and PVS
+        is enabled, the child is first searched with a null window just above
+        alpha (below beta at minimizing nodes) to prove that it is no better
+        than the moves already searched, and only re-searched with the full
+        window if that test fails.
+        """
+        if scout and self.pvs:
+            if maximizing:
+                score = self.child_value(game, move, value_fn, depth, alpha, math.nextafter(alpha, math.inf))
+            else:
+                score = self.child_value(game, move, value_fn, depth, math.nextafter(beta, -math.inf), beta)
+            if not alpha < score < beta:
+                return score
+        return self.child_value(game, move, value_fn, depth, alpha, beta)
+
+    def aspiration_search(self, game, depth):
+        """Search `game` to `depth` plies with an aspiration window of
+        +/- `self.aspiration` around the score of the previous iteration,
+        widening the side of the window that fails until the root score
+        falls inside it.
+        """
+        guess = self.root_score
+        if not self.aspiration or guess is None or math.isinf(guess):
+            return self.alphabeta(game, depth)
+        delta = self.aspiration
+        alpha, beta = guess - delta, guess + delta
+        while True:
+            best_move = self.alphabeta(game, depth, alpha, beta)
+            if self.root_score <= alpha and alpha > float('-inf'):   # Failed low
+                delta *= 2
+                alpha = self.root_score - delta
+            elif self.root_score >= beta and beta < float('inf'):    # Failed high
+                delta *= 2
+                beta = self.root_score + delta
+            else:
+                return best_move
 
 class MinimaxPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
@@ -280,7 +842,7 @@ class MinimaxPlayer(IsolationPlayer):
 
         score = float('-inf')
         for m in legal_moves: # Get the move with the best score
-            score, best_move = max((score, best_move),(self.min_value(game.forecast_move(m), depth - 1, best_move), m))
+            score, best_move = max((score, best_move),(self.child_value(game, m, self.min_value, depth - 1, best_move), m))
         return best_move
 
     def max_value(self, game, depth, last_best_move):# Maximizing Player
@@ -292,7 +854,7 @@ class MinimaxPlayer(IsolationPlayer):
             return self.score(game, self)            # Return the score from the perspective of the MinimaxPlayer
 
         # Otherwise, get the best score from recursing further
-        scores = [self.min_value(game.forecast_move(m), depth - 1, last_best_move) for m in legal_moves]
+        scores = [self.child_value(game, m, self.min_value, depth - 1, last_best_move) for m in legal_moves]
         best_score = max(scores) if scores else float('-inf')
         return best_score
 
@@ -305,7 +867,7 @@ class MinimaxPlayer(IsolationPlayer):
             return self.score(game, self)            # Return the score from the perspective of the MinimaxPlayer
 
         # Otherwise, get the worst score from recursing further
-        scores = [self.max_value(game.forecast_move(m), depth - 1, last_best_move) for m in legal_moves]
+        scores = [self.child_value(game, m, self.max_value, depth - 1, last_best_move) for m in legal_moves]
         best_score = min(scores) if scores else float("inf")
         return best_score
 
@@ -346,20 +908,91 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        if self.stats is not None:
+            self.stats.new_move(self, game)
+        if self.tablebase is not None:              # Play solved positions perfectly
+            move = self.tablebase.lookup(game)
+            if move is not None:
+                return self.record_move(move, "tablebase")
+        if self.book is not None:                   # Play book moves without searching
+            move = self.book.lookup(game)
+            if move is not None:
+                return self.record_move(move, "book")
+        if self.endgame is not None:                # Solve separated positions exactly
+            give_up = max(self.TIMER_THRESHOLD, time_left() / 2) # leave at least half the time to search
+            move = self.endgame.solve(game, time_left, give_up)
+            if move is not None:
+                return self.record_move(move, "endgame")
+
         self.time_left = time_left
+        if self.timer is not None:
+            self.TIMER_THRESHOLD = self.timer.margin    # Abort the search at the calibrated margin
+            self.timer.new_move(time_left)
+
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.helpers is not None:
+            deadline = time_left if isinstance(time_left, Deadline) else Deadline(time_left())
+            self.helpers.start(game, self, deadline)
+        try:
+            move = self.iterative_deepening(game)
+        finally:
+            if self.helpers is not None:
+                self.helpers.stop()
+        move = self.record_move(move, "search")
+        if self.timer is not None:
+            self.timer.move_finished()          # Calibrate on all the time used before returning
+        return move
+
+    def iterative_deepening(self, game, first_depth=0, max_depth=None):
+        """Search `game` with alpha-beta search at increasing depths, starting
+        at `first_depth`, until the timer set in `self.time_left` expires or
+        the iteration at `max_depth` (if given) completes.
 
+        Returns
+        -------
+        (int, int)
+            The best move found by the last completed iteration, the first
+            legal move if no iteration was completed; (-1, -1) if there are
+            no legal moves.
+        """
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
+        self.root_score = None
+        self.last_poll = None
+        self.nodes = 0
+        self.countdown = self.poll_batch = 1
+        if self.ordering is not None:
+            self.ordering.new_search(game)
+
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            for depth in itertools.count():            # Perform iterative deepening
-               best_move = self.alphabeta(game, depth) # Record last best move
+            for depth in itertools.count(first_depth): # Perform iterative deepening
+               self.depth_limited = False
+               best_move = self.aspiration_search(game, depth) # Record last best move
+               if self.stats is not None:
+                   self.stats.iteration_finished(depth, self.nodes_searched())
+               if not self.depth_limited or (self.root_score is not None and math.isinf(self.root_score)):
+                   break   # Every line reached the end of the game or a forced result was found, so deeper searches can't change the move
+               if depth == max_depth:
+                   break
+               if self.ordering is not None:           # Search the new PV first in the next iteration
+                   self.ordering.new_iteration(self.principal_variation(game, best_move, depth))
+               if self.timer is not None:
+                   self.timer.iteration_finished()
+                   if not self.timer.can_start_iteration():
+                       break   # The next iteration is not expected to finish in time
         except SearchTimeout as instance:
             pass   # Handle any actions required after timeout as needed
 
+        if best_move == (-1, -1):
+            legal_moves = game.get_legal_moves()   # Any legal move beats forfeiting the game
+            if legal_moves:
+                best_move = legal_moves[0]
+
         # Return the best move from the last completed search iteration
         return best_move
 
@@ -414,112 +1047,118 @@ class AlphaBetaPlayer(IsolationPlayer):
         best_move = (-1, -1)
         legal_moves = game.get_legal_moves()
         if not legal_moves or depth == 0:       # return (-1, -1) if terminal state
+            self.depth_limited = bool(legal_moves)
             return best_move
 
         n = len(game.get_blank_spaces())
         if n == game.height * game.width:      # Make the first move to be the center if player 1
             return (3, 3)
 
+        # Scores are stored from this player's point of view, and positions
+        # are cached under their canonical form (see isolation.symmetry)
+        from transposition import PLAYER_2_KEY
+        self.tt_salt = PLAYER_2_KEY if self == game._player_2 else 0
+        if self.tt is not None and game._sym_keys is None:
+            game.enable_symmetry()              # The table looks up a canonical key at every node
+        if getattr(self.score, "uses_mobility", False) and game._open is None:
+            game.enable_mobility()              # The heuristic counts moves at every leaf
+        self.order_moves(game, legal_moves, True, self.tt_lookup(game, depth, alpha, beta)[1])
+
         score = float('-inf')
+        orig_alpha = alpha
         for m in legal_moves:
 
             ss = None
             if n > game.height * game.width - 3: # Until 3 search levels, check for symmetry
-                next_game = game.forecast_move(m)
-                # Zero out the last three board state indices for storing an appropriate hash value
-                next_game._board_state[-1] = next_game._board_state[-2] = next_game._board_state[-3] = 0
-                hval = next_game.hash()
-
-                if hval in self.moveBook:
-                    ss = self.moveBook[hval]
-                else:
-                    ss = self.symmetry_score(next_game) # rotate the board to check for symmetry
+                # Symmetrical positions share the same canonical key
+                hval = (self.tt_key(game.forecast_move(m))[0], depth)
+                ss = self.moveBook.get(hval)
+                if self.stats is not None:
+                    self.stats.movebook_probes += 1
+                    self.stats.movebook_hits += ss is not None
 
             if ss is None: # if symmetry is not found, search the nodes
-                new_score = self.min_value(game.forecast_move(m), depth - 1, alpha, beta)
+                new_score = self.pvs_value(game, m, self.min_value, depth - 1, alpha, beta,
+                                           m is not legal_moves[0], True)
                 score, best_move = max((score, best_move), (new_score, m))
-                if n > game.height * game.width - 3:
-                    self.moveBook[hval] = new_score
+                if n > game.height * game.width - 3 and alpha < new_score < beta:
+                    self.moveBook[hval] = new_score  # Only exact scores can be reused
             else:         # if symmetry is found, use the score from the move_book
                 score, best_move = max((score, best_move), (ss, m))
+                if not math.isinf(ss):
+                    self.depth_limited = True
             alpha = max(alpha, score)              # Update alpha
+        self.root_score = score
+        self.tt_record(game, depth, score, orig_alpha, beta, best_move)
         return best_move
 
 
     def max_value(self, game, depth, alpha, beta):# Maximizing Player
-        if self.time_left() < self.TIMER_THRESHOLD: # If the timer check fails, return the last recorded best move
-            raise SearchTimeout()
+        self.countdown -= 1
+        if self.countdown <= 0:                     # Check the timer every poll_every nodes
+            self.poll_timer()
 
         legal_moves = game.get_legal_moves()
         if depth == 0  or not legal_moves:          # Terminal state
+            if legal_moves:                         # Cut off by the depth limit rather than the end of the game
+                self.depth_limited = True
             return self.score(game, self)           # Return the score from the perspective of the AlphaBetaPlayer
 
+        tt_score, tt_move = self.tt_lookup(game, depth, alpha, beta)
+        if tt_score is not None:                    # The stored result is enough to settle this node
+            return tt_score
+        self.order_moves(game, legal_moves, True, tt_move)
+
         # Otherwise, get the best score from recursing further
-        score = float('-inf')
-        for m in legal_moves:
-            score = max(score, self.min_value(game.forecast_move(m), depth - 1, alpha, beta))
-            if score >= beta: return score          # A score greater than beta won't be selected by the parent min-node, so search can stop here
+        orig_alpha = alpha
+        score, best_move = float('-inf'), legal_moves[0]
+        scores = self.frontier_scores(game, legal_moves) if depth == 1 else None
+        for i, m in enumerate(legal_moves):
+            if scores is not None:                  # The children are scored together
+                new_score = next(scores)
+            else:
+                new_score = self.pvs_value(game, m, self.min_value, depth - 1, alpha, beta, i, True)
+            if new_score > score:
+                score, best_move = new_score, m
+            if score >= beta:                       # A score greater than beta won't be selected by the parent min-node, so search can stop here
+                if self.ordering is not None:
+                    self.ordering.cutoff(game, m, depth, True, i)
+                break
             alpha = max(alpha, score)               # Update alpha
+        self.tt_record(game, depth, score, orig_alpha, beta, best_move)
         return score
 
     def min_value(self, game, depth, alpha, beta):
-        if self.time_left() < self.TIMER_THRESHOLD: # If the timer check fails, return the last recorded best move
-            raise SearchTimeout()
+        self.countdown -= 1
+        if self.countdown <= 0:                     # Check the timer every poll_every nodes
+            self.poll_timer()
 
         legal_moves = game.get_legal_moves()
         if depth == 0 or not legal_moves:           # Terminal state
+            if legal_moves:                         # Cut off by the depth limit rather than the end of the game
+                self.depth_limited = True
             return self.score(game, self)           # Return the score from the perspective of the AlphaBetaPlayer
 
+        tt_score, tt_move = self.tt_lookup(game, depth, alpha, beta)
+        if tt_score is not None:                    # The stored result is enough to settle this node
+            return tt_score
+        self.order_moves(game, legal_moves, False, tt_move)
+
         # Otherwise, get the best score from recursing further
-        score = float('inf')
-        for m in legal_moves:
-            score = min(score, self.max_value(game.forecast_move(m), depth - 1, alpha, beta))
-            if score <= alpha: return score         # A score lesser than alpha will not be selected by the parent max-node, so search can stop here
+        orig_beta = beta
+        score, best_move = float('inf'), legal_moves[0]
+        scores = self.frontier_scores(game, legal_moves) if depth == 1 else None
+        for i, m in enumerate(legal_moves):
+            if scores is not None:                  # The children are scored together
+                new_score = next(scores)
+            else:
+                new_score = self.pvs_value(game, m, self.max_value, depth - 1, alpha, beta, i, False)
+            if new_score < score:
+                score, best_move = new_score, m
+            if score <= alpha:                      # A score lesser than alpha will not be selected by the parent max-node, so search can stop here
+                if self.ordering is not None:
+                    self.ordering.cutoff(game, m, depth, False, i)
+                break
             beta = min(beta, score)                 # Update alpha
+        self.tt_record(game, depth, score, alpha, orig_beta, best_move)
         return score
-
-    def symmetry_score(self, game):
-        """
-        Converts Board state into 2x2 matrix, rotates the matrix vertically and
-        horizontally for checking if the value of the search tree is known.
-
-        Parameters
-        ----------
-        game : isolation.Board
-            An forecast instance of the Isolation game `Board` class representing the
-            game state with a certain move applied
-
-        Returns
-        -------
-        (int, int)
-            Score of a symmetrical board state if it already known, else None
-        """
-        h = game.height; w = game.width
-        matrix = [game._board_state[i:i+h] for i in range(0, h * w, h)]
-        for i in (0, 1):
-            if i == 0:
-                m = [m[::-1] for m in matrix]  # vertical flip
-            else:
-                m = matrix[::-1]               # horizontal flip
-
-            b = self.get_board_state(m, game)
-            game._board_state = b
-            hval = game.hash()
-
-            if hval in self.moveBook:         # if a hash value is found by rotating the board,
-                return self.moveBook[hval]    # return the recorded state
-        return None
-
-    def get_board_state(self, matrix, game):
-        """
-        Converts a 2x2 matrix into a Board state 1D-array, zeroing out the last
-        three values for getting the equivalent hash value.
-        """
-        h = game.height; w = game.width
-        b = [0] * (h * w + 3)
-        for i, u in enumerate(matrix):
-            for j, v in enumerate(u):
-                b[i * h + j] = matrix[i][j]  # Fill up the 1D array
-
-        b[-1] = b[-2] = b[-3] = 0
-        return b
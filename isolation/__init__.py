@@ -9,3 +9,9 @@ legal moves loses, and the opponent is declared the winner.
 
 # Make the Board class available at the root of the module for imports
 from .isolation import Board
+
+# Bitmask implementation of the same game with an identical public API
+from .bitboard import BitBoard
+
+# Timer passed to the players' get_move() by Board.play
+from .deadline import Deadline
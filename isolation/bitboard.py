@@ -0,0 +1,404 @@
+"""
+This file contains the `BitBoard` class, an alternative implementation of
+`isolation.Board` that stores the blocked cells of the board as a single
+integer bitmask instead of a Python list.
+
+The knight moves available from every cell are precomputed once for each
+board size, so generating the legal moves of a player only needs a lookup
+and a bitwise test for each of (at most) eight neighbours. The public API is
+the same as `Board`, so every agent written against `Board` can play on a
+`BitBoard` unchanged.
+"""
+import random
+
+from .isolation import Board, zobrist_tables
+
+# Knight move tables shared by every board of the same size, keyed by
+# (width, height)
+_KNIGHT_TABLES = {}
+
+# Neighbor indices and move weights maintaining the mobility counts, keyed
+# like _KNIGHT_TABLES
+_MOBILITY_TABLES = {}
+
+# Translation table turning a string of binary digits into 0/1 bytes
+_BIT_BYTES = str.maketrans("01", "\x00\x01")
+
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+
+def knight_tables(width, height):
+    """Return the precomputed move tables for a board of the given size.
+
+    Cells are indexed column-major (`idx = row + col * height`), which is
+    the same layout used by `Board._board_state`.
+
+    Returns
+    -------
+    (tuple, tuple, tuple)
+        `coords[idx]` is the (row, column) pair of cell idx, `masks[idx]` is
+        the bitmask of every cell a knight can reach from idx and
+        `neighbors[idx]` is a tuple of `(bit, (row, column))` pairs for the
+        same cells.
+    """
+    key = (width, height)
+    if key not in _KNIGHT_TABLES:
+        coords = tuple((idx % height, idx // height)
+                       for idx in range(width * height))
+        masks = []
+        neighbors = []
+        for r, c in coords:
+            cells = [(r + dr, c + dc) for dr, dc in DIRECTIONS
+                     if 0 <= r + dr < height and 0 <= c + dc < width]
+            bits = [1 << (rr + cc * height) for rr, cc in cells]
+            masks.append(sum(bits))
+            neighbors.append(tuple(zip(bits, cells)))
+        _KNIGHT_TABLES[key] = (coords, tuple(masks), tuple(neighbors))
+    return _KNIGHT_TABLES[key]
+
+
+def mobility_tables(width, height):
+    """Return the tables used to maintain the mobility counts of a board of
+    the given size (see `Board.enable_mobility`).
+
+    Returns
+    -------
+    (tuple, tuple)
+        `cells[idx]` is a tuple of the indices of the cells a knight reaches
+        from cell idx, and `weights[idx]` is the number of those cells, the
+        weight of a move to idx in `Board.weighted_mobility`.
+    """
+    key = (width, height)
+    if key not in _MOBILITY_TABLES:
+        neighbors = knight_tables(width, height)[2]
+        cells = tuple(tuple(bit.bit_length() - 1 for bit, _ in targets)
+                      for targets in neighbors)
+        _MOBILITY_TABLES[key] = (cells, tuple(len(targets) for targets in cells))
+    return _MOBILITY_TABLES[key]
+
+
+class _BoardStateView(list):
+    """List snapshot of a `BitBoard` in the `Board._board_state` layout.
+
+    Item assignments are written through to the board, so agents that patch
+    individual entries of `_board_state` keep working on a `BitBoard`.
+    """
+
+    def __init__(self, board, values):
+        super(_BoardStateView, self).__init__(values)
+        self._board = board
+
+    def __setitem__(self, key, value):
+        super(_BoardStateView, self).__setitem__(key, value)
+        board = self._board
+        cells = board.width * board.height
+        if not isinstance(key, int):
+            board._board_state = self
+            return
+        idx = key % len(self)
+        if idx < cells:
+            if value:
+                board._blocked |= 1 << idx
+            else:
+                board._blocked &= ~(1 << idx)
+        elif idx == cells:
+            board._turn = value
+        elif idx == cells + 1:
+            board._p2_loc = value
+        else:
+            board._p1_loc = value
+        board._rehash()
+
+
+class BitBoard(Board):
+    """Implement a model for the game Isolation assuming each player moves like
+    a knight in chess, with the board stored as an integer bitmask.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    rng : random.Random or int (optional)
+        The random number generator shuffling the legal moves, or a seed for
+        a new one. By default the moves are shuffled with the global
+        generator of the `random` module; copies of the board share the
+        generator of the original.
+
+    shuffle_moves : bool (optional)
+        If False, the legal moves are returned in a fixed order instead of
+        being shuffled.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7, rng=None, shuffle_moves=True):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._rng = random.Random(rng) if isinstance(rng, int) else rng
+        self._shuffle_moves = shuffle_moves
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        # Bit idx of _blocked is set once cell idx has been occupied; the
+        # player locations are cell indices (or NOT_MOVED) and _turn is 0 when
+        # player 1 holds the initiative and 1 for player 2
+        self._blocked = 0
+        self._p1_loc = Board.NOT_MOVED
+        self._p2_loc = Board.NOT_MOVED
+        self._turn = 0
+        self._undo_stack = []
+        self._coords, self._masks, self._neighbors = knight_tables(width, height)
+        self._zobrist_keys = zobrist_tables(width, height)
+        self._zobrist = 0
+        self._sym_keys = None
+        self._sym_tables = None
+        self._open = None
+        self._reach = None
+        self._mobility_tables = None
+
+    @property
+    def _board_state(self):
+        """The current state in the list layout used by `Board`."""
+        bits = format(self._blocked, "0{}b".format(self.width * self.height))
+        state = list(bits[::-1].translate(_BIT_BYTES).encode())
+        state += [self._turn, self._p2_loc, self._p1_loc]
+        return _BoardStateView(self, state)
+
+    @_board_state.setter
+    def _board_state(self, state):
+        cells = self.width * self.height
+        bits = "".join("1" if v else "0" for v in reversed(state[:cells]))
+        self._blocked = int(bits, 2)
+        self._turn, self._p2_loc, self._p1_loc = state[cells:cells + 3]
+        self._rehash()
+
+    def _rehash(self):
+        """Recompute the Zobrist key from scratch after the state was edited
+        through `_board_state`.
+        """
+        blocked, p1, p2, side = self._zobrist_keys
+        key = 0
+        mask = self._blocked
+        while mask:
+            bit = mask & -mask
+            key ^= blocked[bit.bit_length() - 1]
+            mask ^= bit
+        if self._p1_loc != Board.NOT_MOVED:
+            key ^= p1[self._p1_loc]
+        if self._p2_loc != Board.NOT_MOVED:
+            key ^= p2[self._p2_loc]
+        if self._turn:
+            key ^= side
+        self._zobrist = key
+        if self._sym_keys is not None:
+            self.enable_symmetry()
+        if self._open is not None:
+            self.enable_mobility()
+
+    def hash(self):
+        return self._zobrist
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = self.__class__.__new__(self.__class__)
+        new_board.__dict__.update(self.__dict__)
+        new_board._undo_stack = list(self._undo_stack)
+        if self._open is not None:
+            new_board._open = list(self._open)
+            new_board._reach = list(self._reach)
+        return new_board
+
+    def push_move(self, move):
+        """Apply an input move to the current game in-place, recording what is
+        needed to take it back with pop_move().
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        if self._active_player == self._player_2:
+            self._undo_stack.append(self._p2_loc)
+        else:
+            self._undo_stack.append(self._p1_loc)
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the last move applied with push_move(), restoring the board to
+        exactly the state it had before that move.
+        """
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        self._turn ^= 1
+        keys = self._zobrist_keys
+        if self._active_player == self._player_2:
+            player_idx, idx, loc_keys = 2, self._p2_loc, keys[2]
+            self._p2_loc = prev_idx = self._undo_stack.pop()
+        else:
+            player_idx, idx, loc_keys = 1, self._p1_loc, keys[1]
+            self._p1_loc = prev_idx = self._undo_stack.pop()
+        self._blocked ^= 1 << idx
+        self._zobrist ^= keys[0][idx] ^ loc_keys[idx] ^ keys[3]
+        if prev_idx != Board.NOT_MOVED:
+            self._zobrist ^= loc_keys[prev_idx]
+        if self._sym_keys is not None:
+            self._update_sym_keys(player_idx, idx, prev_idx)
+        if self._open is not None:
+            self._update_mobility(idx, 1)
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._blocked >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        blocked = self._blocked
+        return [self._coords[idx] for idx in range(self.width * self.height)
+                if not blocked >> idx & 1]
+
+    def get_blank_mask(self):
+        """Return the blank cells of the board as an integer bitmask (see
+        `Board.get_blank_mask`).
+        """
+        return ((1 << (self.width * self.height)) - 1) & ~self._blocked
+
+    def _location_index(self, player):
+        """Return the cell index of the specified player (or NOT_MOVED)."""
+        if player == self._player_1:
+            return self._p1_loc
+        elif player == self._player_2:
+            return self._p2_loc
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._location_index(player)
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coords[idx]
+
+    def mobility(self, player=None):
+        """Return the number of legal moves of the specified player (see
+        `Board.mobility`), counted on its knight mask when the mobility
+        counts are not maintained.
+        """
+        idx = self._location_index(self._active_player if player is None else player)
+        if self._open is not None:
+            return self._open[-1 if idx == Board.NOT_MOVED else idx]
+        if idx == Board.NOT_MOVED:
+            return bin(self.get_blank_mask()).count("1")
+        return bin(self._masks[idx] & ~self._blocked).count("1")
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        idx = self._location_index(player)
+        if idx == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+
+        blocked = self._blocked
+        valid_moves = [move for bit, move in self._neighbors[idx]
+                       if not blocked & bit]
+        if self._shuffle_moves:
+            (self._rng or random).shuffle(valid_moves)
+        return valid_moves
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        keys = self._zobrist_keys
+        if self._active_player == self._player_2:
+            player_idx, prev_idx, loc_keys = 2, self._p2_loc, keys[2]
+            self._p2_loc = idx
+        else:
+            player_idx, prev_idx, loc_keys = 1, self._p1_loc, keys[1]
+            self._p1_loc = idx
+        if prev_idx != Board.NOT_MOVED:
+            self._zobrist ^= loc_keys[prev_idx]
+        if self._sym_keys is not None:
+            self._update_sym_keys(player_idx, idx, prev_idx)
+        self._zobrist ^= keys[0][idx] ^ loc_keys[idx] ^ keys[3]
+        self._blocked |= 1 << idx
+        if self._open is not None:
+            self._update_mobility(idx, -1)
+        self._turn ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def utility(self, player):
+        """Returns the utility of the current game state from the perspective
+        of the specified player (see `Board.utility`).
+        """
+        idx = self._location_index(self._active_player)
+        if idx != Board.NOT_MOVED and not self._masks[idx] & ~self._blocked:
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
@@ -0,0 +1,27 @@
+"""
+This file contains the `Deadline` class, the timer handed to the players by
+`Board.play`.
+"""
+from time import perf_counter_ns
+
+
+class Deadline(object):
+    """The end of a player's turn, stored as an absolute reading of
+    `time.perf_counter_ns`.
+
+    Calling a `Deadline` returns the number of milliseconds left in the
+    turn, so it can be passed to `get_move()` wherever a `time_left`
+    function is expected.
+
+    Parameters
+    ----------
+    time_limit : numeric
+        The number of milliseconds from now until the deadline.
+    """
+    __slots__ = ("end_ns",)
+
+    def __init__(self, time_limit):
+        self.end_ns = perf_counter_ns() + int(time_limit * 1000000)
+
+    def __call__(self):
+        return (self.end_ns - perf_counter_ns()) / 1000000.
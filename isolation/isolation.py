@@ -8,11 +8,58 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 import random
-import timeit
 from copy import copy
 
+from .deadline import Deadline
+
 TIME_LIMIT_MILLIS = 150
 
+# Zobrist key tables shared by every board of the same size, keyed by
+# (width, height)
+_ZOBRIST_TABLES = {}
+ZOBRIST_SEED = 0x15014710
+
+
+def zobrist_tables(width, height):
+    """Return the random 64-bit keys used to hash a board of the given size.
+
+    The keys are drawn from a generator with a fixed seed, so the same
+    position has the same key in every process.
+
+    Returns
+    -------
+    (tuple, tuple, tuple, int)
+        Keys for a blocked cell, for player 1 standing on a cell and for
+        player 2 standing on a cell (all indexed like `Board._board_state`),
+        and the key toggled whenever player 2 holds the initiative.
+    """
+    key = (width, height)
+    if key not in _ZOBRIST_TABLES:
+        rng = random.Random(ZOBRIST_SEED ^ (width << 16) ^ height)
+        cells = width * height
+        blocked, p1, p2 = [tuple(rng.getrandbits(64) for _ in range(cells))
+                           for _ in range(3)]
+        _ZOBRIST_TABLES[key] = (blocked, p1, p2, rng.getrandbits(64))
+    return _ZOBRIST_TABLES[key]
+
+
+def zobrist_hash(board_state, width, height):
+    """Compute the Zobrist key of a state in the `Board._board_state` layout
+    from scratch.
+    """
+    blocked, p1, p2, side = zobrist_tables(width, height)
+    key = 0
+    for idx in range(width * height):
+        if board_state[idx]:
+            key ^= blocked[idx]
+    if board_state[-1] != Board.NOT_MOVED:
+        key ^= p1[board_state[-1]]
+    if board_state[-2] != Board.NOT_MOVED:
+        key ^= p2[board_state[-2]]
+    if board_state[-3]:
+        key ^= side
+    return key
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -33,14 +80,26 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    rng : random.Random or int (optional)
+        The random number generator shuffling the legal moves, or a seed for
+        a new one. By default the moves are shuffled with the global
+        generator of the `random` module; copies of the board share the
+        generator of the original.
+
+    shuffle_moves : bool (optional)
+        If False, the legal moves are returned in a fixed order instead of
+        being shuffled.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7, rng=None, shuffle_moves=True):
         self.width = width
         self.height = height
         self.move_count = 0
+        self._rng = random.Random(rng) if isinstance(rng, int) else rng
+        self._shuffle_moves = shuffle_moves
         self._player_1 = player_1
         self._player_2 = player_2
         self._active_player = player_1
@@ -52,8 +111,128 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Previous locations of the moving player, one entry per push_move()
+        self._undo_stack = []
+
+        # Zobrist key of the state, updated incrementally with every move
+        self._zobrist_keys = zobrist_tables(width, height)
+        self._zobrist = 0
+
+        # Zobrist keys of every rotation and reflection of the board, only
+        # maintained after enable_symmetry(); the list is replaced rather
+        # than modified on each move, so copies may share it
+        self._sym_keys = None
+        self._sym_tables = None
+
+        # Number of blank cells a knight reaches from every cell, and their
+        # total weight, only maintained after enable_mobility(); the extra
+        # last entries count every blank cell, reached by a player that has
+        # not moved yet
+        self._open = None
+        self._reach = None
+        self._mobility_tables = None
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        return zobrist_hash(self._board_state, self.width, self.height)
+
+    @property
+    def zobrist(self):
+        """A 64-bit Zobrist key of the current game state (blocked cells,
+        player locations and initiative), maintained in O(1) per move. It is
+        equal to hash() as long as the state is only changed through
+        apply_move(), push_move() and pop_move().
+        """
+        return self._zobrist
+
+    def enable_symmetry(self):
+        """Start maintaining the Zobrist keys of every symmetric copy of the
+        board (see `isolation.symmetry`), so that the canonical form of the
+        state can be found in O(1) at every node of a search.
+        """
+        from .symmetry import symmetry_tables, symmetric_keys
+        self._sym_tables = symmetry_tables(self.width, self.height)[2]
+        self._sym_keys = symmetric_keys(self._board_state, self.width, self.height)
+
+    def _update_sym_keys(self, player_idx, idx, prev_idx):
+        """Toggle player `player_idx` (1 or 2) moving from cell `prev_idx` to
+        cell `idx` in the symmetric Zobrist keys.
+        """
+        move_keys, loc_keys = self._sym_tables[player_idx]
+        if prev_idx == Board.NOT_MOVED:
+            self._sym_keys = [key ^ keys[idx]
+                              for key, keys in zip(self._sym_keys, move_keys)]
+        else:
+            self._sym_keys = [key ^ keys[idx] ^ prev_keys[prev_idx]
+                              for key, keys, prev_keys in zip(self._sym_keys, move_keys, loc_keys)]
+
+    def enable_mobility(self):
+        """Start maintaining the number of legal moves available from every
+        cell, so that mobility() and weighted_mobility() answer in O(1).
+        Every move then updates the counts of at most 8 cells; like the
+        Zobrist key, the counts stay exact as long as the state is only
+        changed through apply_move(), push_move() and pop_move().
+        """
+        from .bitboard import mobility_tables
+        cells, weights = mobility_tables(self.width, self.height)
+        blank = self.get_blank_mask()
+        self._mobility_tables = (cells, weights)
+        self._open = [sum(blank >> idx & 1 for idx in targets) for targets in cells]
+        self._reach = [sum(weights[idx] for idx in targets if blank >> idx & 1)
+                       for targets in cells]
+        self._open.append(bin(blank).count("1"))
+        self._reach.append(sum(weight for idx, weight in enumerate(weights) if blank >> idx & 1))
+
+    def _update_mobility(self, idx, delta):
+        """Add `delta` (-1 when cell idx is blocked, 1 when it is freed again)
+        to the mobility counts of the cells reaching cell idx.
+        """
+        cells, weights = self._mobility_tables
+        weight = delta * weights[idx]
+        open_moves, reach = self._open, self._reach
+        for target in cells[idx]:
+            open_moves[target] += delta
+            reach[target] += weight
+        open_moves[-1] += delta
+        reach[-1] += weight
+
+    def _location_index(self, player):
+        """Return the cell index of the specified player (or NOT_MOVED)."""
+        if player == self._player_1:
+            return self._board_state[-1]
+        elif player == self._player_2:
+            return self._board_state[-2]
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def mobility(self, player=None):
+        """Return the number of legal moves of the specified player (by
+        default the active player), i.e. `len(get_legal_moves(player))`
+        without building the list. This is O(1) after enable_mobility().
+        """
+        idx = self._location_index(self._active_player if player is None else player)
+        if self._open is not None:
+            return self._open[-1 if idx == Board.NOT_MOVED else idx]
+        if idx == Board.NOT_MOVED:
+            return bin(self.get_blank_mask()).count("1")
+        r, c = idx % self.height, idx // self.height
+        return sum(self.move_is_legal((r + dr, c + dc))
+                   for dr, dc in ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                  (1, -2), (1, 2), (2, -1), (2, 1)))
+
+    def weighted_mobility(self, player=None):
+        """Return the legal moves of the specified player (by default the
+        active player) weighted by the number of cells a knight reaches from
+        their targets on an empty board, which favors moves towards the
+        center. This is O(1) after enable_mobility().
+        """
+        idx = self._location_index(self._active_player if player is None else player)
+        if self._open is not None:
+            return self._reach[-1 if idx == Board.NOT_MOVED else idx]
+        from .bitboard import mobility_tables
+        cells, weights = mobility_tables(self.width, self.height)
+        blank = self.get_blank_mask()
+        targets = range(self.width * self.height) if idx == Board.NOT_MOVED else cells[idx]
+        return sum(weights[target] for target in targets if blank >> target & 1)
 
     @property
     def active_player(self):
@@ -92,11 +271,19 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height,
+                          rng=self._rng, shuffle_moves=self._shuffle_moves)
         new_board.move_count = self.move_count
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._undo_stack = copy(self._undo_stack)
+        new_board._zobrist = self._zobrist
+        new_board._sym_keys = self._sym_keys
+        new_board._sym_tables = self._sym_tables
+        new_board._open = copy(self._open)
+        new_board._reach = copy(self._reach)
+        new_board._mobility_tables = self._mobility_tables
         return new_board
 
     def forecast_move(self, move):
@@ -118,6 +305,41 @@ class Board(object):
         new_board.apply_move(move)
         return new_board
 
+    def push_move(self, move):
+        """Apply an input move to the current game in-place, recording what is
+        needed to take it back with pop_move().
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        last_move_idx = int(self._active_player == self._player_2) + 1
+        self._undo_stack.append(self._board_state[-last_move_idx])
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the last move applied with push_move(), restoring the board to
+        exactly the state it had before that move.
+        """
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+        self._board_state[-3] ^= 1
+        last_move_idx = int(self._active_player == self._player_2) + 1
+        idx = self._board_state[-last_move_idx]
+        prev_idx = self._undo_stack.pop()
+        keys = self._zobrist_keys
+        self._zobrist ^= keys[0][idx] ^ keys[last_move_idx][idx] ^ keys[3]
+        if prev_idx != Board.NOT_MOVED:
+            self._zobrist ^= keys[last_move_idx][prev_idx]
+        if self._sym_keys is not None:
+            self._update_sym_keys(last_move_idx, idx, prev_idx)
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-last_move_idx] = prev_idx
+        if self._open is not None:
+            self._update_mobility(idx, 1)
+
     def move_is_legal(self, move):
         """Test whether a move is legal in the current game state.
 
@@ -142,6 +364,13 @@ class Board(object):
         return [(i, j) for j in range(self.width) for i in range(self.height)
                 if self._board_state[i + j * self.height] == Board.BLANK]
 
+    def get_blank_mask(self):
+        """Return the blank cells of the board as an integer bitmask, where bit
+        `row + col * height` is set if cell (row, col) is blank.
+        """
+        return sum(1 << idx for idx, value in enumerate(self._board_state[:-3])
+                   if value == Board.BLANK)
+
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
 
@@ -201,19 +430,27 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        keys = self._zobrist_keys  # keys[1] and keys[2] hold the p1 and p2 locations
+        if self._board_state[-last_move_idx] != Board.NOT_MOVED:
+            self._zobrist ^= keys[last_move_idx][self._board_state[-last_move_idx]]
+        self._zobrist ^= keys[0][idx] ^ keys[last_move_idx][idx] ^ keys[3]
+        if self._sym_keys is not None:
+            self._update_sym_keys(last_move_idx, idx, self._board_state[-last_move_idx])
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
+        if self._open is not None:
+            self._update_mobility(idx, -1)
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self.mobility(self._active_player)
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self.mobility(self._active_player)
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -259,7 +496,8 @@ class Board(object):
                       (1, -2), (1, 2), (2, -1), (2, 1)]
         valid_moves = [(r + dr, c + dc) for dr, dc in directions
                        if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        if self._shuffle_moves:
+            (self._rng or random).shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -295,7 +533,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, on_move=None):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +543,10 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        on_move : callable (optional)
+            A function called as `on_move(board, move)` with every legal move
+            chosen by a player, just before the move is applied to the board.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -314,15 +556,12 @@ class Board(object):
         """
         move_history = []
 
-        time_millis = lambda: 1000 * timeit.default_timer()
-
         while True:
 
             legal_player_moves = self.get_legal_moves()
             game_copy = self.copy()
 
-            move_start = time_millis()
-            time_left = lambda : time_limit - (time_millis() - move_start)
+            time_left = Deadline(time_limit)
             curr_move = self._active_player.get_move(game_copy, time_left)
             move_end = time_left()
 
@@ -338,5 +577,7 @@ class Board(object):
                 return self._inactive_player, move_history, "illegal move"
 
             move_history.append(list(curr_move))
+            if on_move is not None:
+                on_move(self, curr_move)
 
             self.apply_move(curr_move)
@@ -0,0 +1,63 @@
+"""
+This file contains helpers to detect when the two players of an Isolation
+game have been separated.
+
+Cells are represented as bitmasks in the layout of `Board.get_blank_mask()`.
+Once no blank cell can be reached (through any number of knight moves over
+blank cells) by both players, neither player can ever block the other
+again, so the outcome only depends on the longest knight path each player
+can make in its own region.
+"""
+from .bitboard import knight_tables
+
+
+def flood_fill(idx, blank_mask, masks):
+    """Return the bitmask of the blank cells reachable from cell idx by a
+    sequence of knight moves over blank cells.
+
+    Parameters
+    ----------
+    idx : int
+        The index of the starting cell (which need not be blank).
+
+    blank_mask : int
+        The bitmask of the cells that may be visited.
+
+    masks : tuple
+        The knight move masks of the board (see `bitboard.knight_tables`).
+    """
+    reached = 0
+    frontier = masks[idx] & blank_mask
+    while frontier:
+        reached |= frontier
+        neighbors = 0
+        while frontier:
+            bit = frontier & -frontier
+            frontier ^= bit
+            neighbors |= masks[bit.bit_length() - 1]
+        frontier = neighbors & blank_mask & ~reached
+    return reached
+
+
+def separated_regions(game):
+    """Return the regions of the active and inactive players of `game` if the
+    players have been separated.
+
+    Returns
+    -------
+    (int, int) or None
+        The bitmasks of the blank cells reachable by the active and the
+        inactive player, or None if a player has not moved yet or some cell
+        can be reached by both players.
+    """
+    active = game.get_player_location(game.active_player)
+    inactive = game.get_player_location(game.inactive_player)
+    if active is None or inactive is None:
+        return None
+    masks = knight_tables(game.width, game.height)[1]
+    blank_mask = game.get_blank_mask()
+    active_region = flood_fill(active[0] + active[1] * game.height, blank_mask, masks)
+    inactive_region = flood_fill(inactive[0] + inactive[1] * game.height, blank_mask, masks)
+    if active_region & inactive_region:
+        return None
+    return active_region, inactive_region
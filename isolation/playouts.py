@@ -0,0 +1,152 @@
+"""
+This file contains a NumPy kernel playing random games (playouts) on many
+boards at once, for Monte Carlo evaluation of Isolation positions.
+
+A batch of K boards is held as a (K, cells + 1) boolean array of blocked
+cells and a (K, 2) array of player locations (cell indices, column-major as
+in `Board._board_state`). Every step advances all unfinished boards by one
+ply: the knight moves of the player to move are gathered from a precomputed
+(cells + 1, 8) neighbor table, and one free target is drawn uniformly per
+board. Missing neighbors point to the extra cell `cells`, which is always
+blocked, so no step needs a Python loop over the boards.
+
+This module requires NumPy, which the rest of the package does not.
+"""
+import numpy as np
+
+from .bitboard import knight_tables
+
+_NEIGHBOR_TABLES = {}
+
+
+def neighbor_table(width, height):
+    """Return the knight moves of a board of the given size as an array.
+
+    Returns
+    -------
+    numpy.ndarray
+        A (cells + 1, 8) array of cell indices, where row idx lists the cells
+        a knight reaches from cell idx, padded with the index `cells` of the
+        always-blocked extra cell (whose own row only holds that index).
+    """
+    key = (width, height)
+    if key not in _NEIGHBOR_TABLES:
+        cells = width * height
+        table = np.full((cells + 1, 8), cells, dtype=np.intp)
+        for idx, neighbors in enumerate(knight_tables(width, height)[2]):
+            table[idx, :len(neighbors)] = [bit.bit_length() - 1 for bit, _ in neighbors]
+        _NEIGHBOR_TABLES[key] = table
+    return _NEIGHBOR_TABLES[key]
+
+
+def board_arrays(game):
+    """Return the blocked cells of `game` as a boolean array of length
+    width * height, and the locations of its active and inactive players
+    as cell indices (-1 for a player that has not moved yet).
+    """
+    cells = game.width * game.height
+    blank = game.get_blank_mask().to_bytes((cells + 7) // 8, "little")
+    bits = np.unpackbits(np.frombuffer(blank, dtype=np.uint8), bitorder="little")[:cells]
+    locations = []
+    for player in (game.active_player, game.inactive_player):
+        loc = game.get_player_location(player)
+        locations.append(-1 if loc is None else loc[0] + loc[1] * game.height)
+    return bits == 0, locations
+
+
+def playouts(blocked, locations, width, height, rng=None):
+    """Play one random game to the end from each of K positions.
+
+    Parameters
+    ----------
+    blocked : array_like
+        A (K, width * height) boolean array of the blocked cells.
+
+    locations : array_like
+        A (K, 2) integer array of the locations of the player to move and of
+        its opponent (-1 for a player that has not moved yet; such a player
+        moves to a random blank cell).
+
+    width, height : int
+        The size of the boards.
+
+    rng : numpy.random.Generator or int (optional)
+        The random number generator, or a seed for a new one.
+
+    Returns
+    -------
+    numpy.ndarray
+        A boolean array of length K, True where the player to move in the
+        starting position won the playout.
+    """
+    rng = np.random.default_rng(rng)
+    table = neighbor_table(width, height)
+    cells = width * height
+    board = np.ones((len(blocked), cells + 1), dtype=bool)
+    board[:, :cells] = blocked
+    loc = np.array(locations, dtype=np.intp)
+    wins = np.zeros(len(board), dtype=bool)
+
+    active = np.arange(len(board))   # the boards whose game is not over
+    ply = 0
+    while active.size:
+        side = ply % 2               # column of the player to move in loc
+        mover = loc[active, side]
+        moves = table[mover]         # mover == -1 selects the extra cell's row
+        free = ~board[active[:, None], moves]
+        stuck = ~free.any(axis=1)
+
+        # A uniform choice among the free moves: the largest of random keys,
+        # with the blocked moves given a key below every free one
+        keys = np.where(free, rng.random(free.shape), -1.)
+        target = moves[np.arange(active.size), keys.argmax(axis=1)]
+
+        unmoved = np.flatnonzero(mover < 0)
+        if unmoved.size:             # the first move may go to any blank cell
+            keys = np.where(board[active[unmoved], :cells], -1.,
+                            rng.random((unmoved.size, cells)))
+            target[unmoved] = keys.argmax(axis=1)
+            stuck[unmoved] = keys.max(axis=1) < 0
+
+        # The player to move loses when stuck, so the starting player wins
+        # the boards that end on its opponent's turn
+        wins[active[stuck]] = side == 1
+        playing = ~stuck
+        active, target = active[playing], target[playing]
+        board[active, target] = True
+        loc[active, side] = target
+        ply += 1
+    return wins
+
+
+def win_rates(games, num_playouts=1000, rng=None):
+    """Estimate the chance of the active player of each game to win against
+    random play.
+
+    Parameters
+    ----------
+    games : list<isolation.Board>
+        Games of the same board size.
+
+    num_playouts : int (optional)
+        The number of playouts played from each game; all of them run in a
+        single batch.
+
+    rng : numpy.random.Generator or int (optional)
+        The random number generator, or a seed for a new one.
+
+    Returns
+    -------
+    numpy.ndarray
+        The fraction of the playouts of each game won by its active player.
+    """
+    if not games:
+        return np.zeros(0)
+    width, height = games[0].width, games[0].height
+    if any((game.width, game.height) != (width, height) for game in games):
+        raise ValueError("win_rates() needs games of the same board size")
+    blocked, locations = zip(*(board_arrays(game) for game in games))
+    wins = playouts(np.repeat(np.array(blocked), num_playouts, axis=0),
+                    np.repeat(np.array(locations), num_playouts, axis=0),
+                    width, height, rng)
+    return wins.reshape(len(games), num_playouts).mean(axis=1)
@@ -0,0 +1,135 @@
+"""
+This file contains helpers to recognise symmetric Isolation positions.
+
+Rotating or reflecting a board gives a position with the same game value, so
+caches keyed on the canonical form of a position can share their entries
+between all of its symmetric copies. Square boards have the eight symmetries
+of the dihedral group (four rotations and four reflections); other boards
+only have the identity, the half turn and the two mirror flips.
+
+The canonical form of a position is the smallest of the Zobrist keys of its
+symmetric copies. `Board.enable_symmetry()` makes a board maintain all of
+those keys incrementally, so `canonical_form()` costs O(1) at every node.
+"""
+from .isolation import Board, zobrist_tables
+
+# Permutation and key tables shared by every board of the same size, keyed
+# by (width, height)
+_SYMMETRY_TABLES = {}
+
+# Images of the cell (r, c) on a board with h rows and w columns; the
+# transforms after the first four only apply to square boards
+_TRANSFORMS = [
+    lambda r, c, h, w: (r, c),                  # identity
+    lambda r, c, h, w: (h - 1 - r, w - 1 - c),  # half turn
+    lambda r, c, h, w: (h - 1 - r, c),          # flip rows
+    lambda r, c, h, w: (r, w - 1 - c),          # flip columns
+    lambda r, c, h, w: (c, h - 1 - r),          # quarter turn clockwise
+    lambda r, c, h, w: (w - 1 - c, r),          # quarter turn anticlockwise
+    lambda r, c, h, w: (c, r),                  # transpose
+    lambda r, c, h, w: (w - 1 - c, h - 1 - r),  # anti-transpose
+]
+
+
+def symmetry_tables(width, height):
+    """Return the precomputed symmetry tables for a board of the given size.
+
+    Returns
+    -------
+    (tuple, tuple, tuple)
+        `perms[t][idx]` is the index of the image of cell idx under symmetry
+        t and `inverses[t]` is the inverse permutation. `keys[p]` holds the
+        Zobrist keys of the transformed boards for player p (1 or 2) as a
+        pair (move_keys, loc_keys): `move_keys[t][idx]` is toggled in the key
+        of symmetry t when player p moves to cell idx (blocking the cell,
+        placing the player and passing the initiative) and
+        `loc_keys[t][idx]` when player p leaves cell idx.
+    """
+    key = (width, height)
+    if key not in _SYMMETRY_TABLES:
+        transforms = _TRANSFORMS if width == height else _TRANSFORMS[:4]
+        blocked, p1, p2, side = zobrist_tables(width, height)
+        cells = range(width * height)
+        perms, inverses = [], []
+        move_keys, loc_keys = ([], [], []), ([], [], [])
+        for transform in transforms:
+            perm = []
+            for idx in cells:
+                r, c = transform(idx % height, idx // height, height, width)
+                perm.append(r + c * height)
+            inverse = [0] * len(perm)
+            for idx, image in enumerate(perm):
+                inverse[image] = idx
+            perms.append(tuple(perm))
+            inverses.append(tuple(inverse))
+            for player_idx, loc in ((1, p1), (2, p2)):
+                loc_keys[player_idx].append(tuple(loc[perm[idx]] for idx in cells))
+                move_keys[player_idx].append(tuple(blocked[perm[idx]] ^ loc[perm[idx]] ^ side
+                                                   for idx in cells))
+        keys = (None,) + tuple((tuple(move_keys[p]), tuple(loc_keys[p])) for p in (1, 2))
+        _SYMMETRY_TABLES[key] = (tuple(perms), tuple(inverses), keys)
+    return _SYMMETRY_TABLES[key]
+
+
+def symmetric_keys(board_state, width, height):
+    """Compute the Zobrist keys of every symmetric copy of a state in the
+    `Board._board_state` layout from scratch.
+    """
+    blocked, p1, p2, side = zobrist_tables(width, height)
+    perms = symmetry_tables(width, height)[0]
+    cells = [idx for idx in range(width * height) if board_state[idx]]
+    keys = []
+    for perm in perms:
+        key = side if board_state[-3] else 0
+        for idx in cells:
+            key ^= blocked[perm[idx]]
+        if board_state[-1] != Board.NOT_MOVED:
+            key ^= p1[perm[board_state[-1]]]
+        if board_state[-2] != Board.NOT_MOVED:
+            key ^= p2[perm[board_state[-2]]]
+        keys.append(key)
+    return keys
+
+
+def canonical_form(game):
+    """Return the canonical key of a game state and the symmetry mapping the
+    state onto its canonical orientation.
+
+    Parameters
+    ----------
+    game : isolation.Board
+        The game state. If `game.enable_symmetry()` has been called, the
+        keys it maintains are used; otherwise they are computed from scratch.
+
+    Returns
+    -------
+    (int, int)
+        The smallest Zobrist key among the symmetric copies of the state and
+        the index of the symmetry producing it. Symmetric states share the
+        same canonical key.
+    """
+    keys = game._sym_keys
+    if keys is None:
+        keys = symmetric_keys(game._board_state, game.width, game.height)
+    key = min(keys)
+    return key, keys.index(key)
+
+
+def to_canonical(move, transform, width, height):
+    """Map a (row, column) move on a board to the matching move on its
+    canonical orientation.
+    """
+    if move is None:
+        return None
+    idx = symmetry_tables(width, height)[0][transform][move[0] + move[1] * height]
+    return (idx % height, idx // height)
+
+
+def from_canonical(move, transform, width, height):
+    """Map a (row, column) move on the canonical orientation of a board back
+    to the matching move on the board itself.
+    """
+    if move is None:
+        return None
+    idx = symmetry_tables(width, height)[1][transform][move[0] + move[1] * height]
+    return (idx % height, idx // height)
@@ -0,0 +1,127 @@
+"""This file contains the `HelperPool` class, which lets an alpha-beta agent
+search a single move on several CPU cores with Lazy SMP.
+
+Lazy SMP runs the same iterative-deepening search from the same root in
+several processes at once. The processes share nothing but the agent's
+transposition table (see `transposition.SharedTranspositionTable`), so the
+helpers speed up the main search by filling the table with results that the
+main process then reuses, and their different move orders (the legal moves
+are shuffled) make them explore different parts of the tree. The helpers
+start their iterative deepening one to four plies deeper than the main
+search, in turn, so that they run ahead of it at several depths at once.
+
+The main process keeps playing by the `get_move(game, time_left)` contract:
+it returns its own best move when its deadline expires and the helpers stop
+searching as soon as it does. The agents fork their helpers when they are
+created, so no turn pays for the process startup, and stop them in close().
+"""
+import multiprocessing
+import os
+import random
+from time import perf_counter_ns
+
+# Placeholders for the players of a board sent to a helper
+_AGENT = "agent"
+_OPPONENT = "opponent"
+
+# Helpers start their searches this many depths apart at most
+STAGGER_DEPTHS = 4
+
+_PLAYER_ATTRIBUTES = ("_player_1", "_player_2", "_active_player", "_inactive_player")
+
+
+class HelperPool(object):
+    """Helper processes searching alongside an agent.
+
+    The helpers are forked from the current process when the pool is
+    created, so each one works with its own copy of `agent` and the table
+    the agent shares with them. They wait idle between searches, until the
+    process that created the pool closes it.
+
+    Parameters
+    ----------
+    agent : object
+        The agent to help. It must provide an `iterative_deepening(game,
+        first_depth)` method and keep its transposition table in a
+        `transposition.SharedTranspositionTable`.
+
+    helpers : int
+        The number of helper processes.
+
+    Raises
+    ------
+    ValueError
+        If the current process is daemonic, and so cannot have children.
+    """
+
+    def __init__(self, agent, helpers):
+        if multiprocessing.current_process().daemon:
+            raise ValueError("a daemonic process cannot fork Lazy SMP helpers; "
+                             "search with workers=1 in pool worker processes")
+        self.owner = os.getpid()
+        context = multiprocessing.get_context("fork")
+        self.search_id = context.RawValue('L', 0)  # the search the helpers should run
+        self.queues = []
+        self.processes = []
+        for index in range(1, helpers + 1):
+            queue = context.SimpleQueue()
+            process = context.Process(target=_helper_main,
+                                      args=(agent, index, queue, self.search_id),
+                                      daemon=True)
+            process.start()
+            self.queues.append(queue)
+            self.processes.append(process)
+
+    def start(self, game, agent, deadline):
+        """Start every helper searching `game` for `agent` until stop() is
+        called or the `isolation.Deadline` of the main search expires.
+
+        The helpers read the same clock as the main process: forked
+        processes share `time.perf_counter_ns`, which is monotonic.
+        """
+        self.search_id.value += 1
+        state = game.copy()
+        for attribute in _PLAYER_ATTRIBUTES:
+            player = getattr(state, attribute)
+            setattr(state, attribute, _AGENT if player is agent else _OPPONENT)
+        for queue in self.queues:
+            queue.put((self.search_id.value, state, deadline.end_ns))
+
+    def stop(self):
+        """Stop the current search of every helper."""
+        self.search_id.value += 1
+
+    def close(self):
+        """Stop the helpers and wait for their processes to exit. Copies of
+        the pool inherited by forked processes leave the helpers running.
+        """
+        if os.getpid() != self.owner:
+            return
+        self.stop()
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join()
+
+
+def _helper_main(agent, index, queue, search_id):
+    """Serve the searches requested through `queue` in a helper process."""
+    random.seed()  # don't shuffle the legal moves in the same order as the other processes
+    agent.timer = None  # the main process decides when the search ends
+    agent.stats = None  # and reports the statistics of the move
+    first_depth = 2 + (index - 1) % STAGGER_DEPTHS  # helper 1 at depth 2, helper 2 at 3, ...
+    while True:
+        task = queue.get()
+        if task is None:
+            return
+        my_id, game, end_ns = task
+        if search_id.value != my_id:  # the search is already over
+            continue
+        for attribute in _PLAYER_ATTRIBUTES:
+            if getattr(game, attribute) == _AGENT:
+                setattr(game, attribute, agent)
+        game._rng = None  # shuffle with the generator reseeded above, not a copy of the main one
+
+        agent.time_left = lambda: ((end_ns - perf_counter_ns()) / 1000000.
+                                   if search_id.value == my_id else float("-inf"))
+        agent.iterative_deepening(game, first_depth)
@@ -0,0 +1,256 @@
+"""This file contains the `MCTSPlayer` class, a Monte Carlo Tree Search agent
+playing by the same `get_move(game, time_left)` contract as the alpha-beta
+agents.
+
+Instead of a heuristic, the agent estimates the value of a move from the
+outcomes of random games (playouts) played from it, and grows a search tree
+towards the most promising moves with the UCT rule: at each node it follows
+the child maximizing
+
+    wins / visits + exploration * sqrt(ln(parent visits) / visits)
+
+The tree lives in a pool of flat arrays indexed by node number rather than
+in one object per node, and the children of a node occupy consecutive
+entries of the pool. Positions are tracked as a bitmask of blocked cells
+and the two player locations (see `isolation.bitboard`), which keeps both
+the descent and the playouts free of `Board` copies.
+
+After the agent moves, the subtree of its move is kept; on the next turn the
+agent continues from the child matching the opponent's reply, so the
+playouts of the previous turn are not wasted.
+"""
+import math
+import random
+from array import array
+
+from isolation.bitboard import knight_tables
+
+
+class MCTSPlayer(object):
+    """Game-playing agent using Monte Carlo Tree Search with UCT selection
+    and uniformly random playouts.
+
+    Parameters
+    ----------
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is aborted. Should be a
+        positive value large enough to allow the function to return before the
+        timer expires.
+
+    exploration : float (optional)
+        The exploration constant of the UCT rule.
+
+    max_nodes : int (optional)
+        The capacity of the node pool. Once it is full the tree stops growing
+        (playouts continue from its leaves), and the tree is rebuilt from
+        scratch on the next move.
+
+    reuse_tree : bool (optional)
+        Continue from the subtree of the previous move when the opponent's
+        reply is in it.
+
+    seed : int (optional)
+        Seed of the generator driving the playouts; random by default.
+    """
+
+    def __init__(self, timeout=10., exploration=math.sqrt(2), max_nodes=1 << 20,
+                 reuse_tree=True, seed=None):
+        self.TIMER_THRESHOLD = timeout
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.reuse_tree = reuse_tree
+        self.rng = random.Random(seed)
+        self.size = None
+        self.targets = None   # targets[idx] lists the (bit, cell) pairs a knight reaches from idx
+        self.reset()
+
+    def reset(self):
+        """Discard the search tree. """
+        self.parent = array('l')
+        self.move = array('l')         # cell index of the move leading to the node
+        self.first_child = array('l')  # index of the first child, -1 until expanded
+        self.num_children = array('l')
+        self.visits = array('l')
+        self.wins = array('d')         # wins of the player making the move into the node
+        self.root = None
+        self.played = None  # (state, node) of the last move returned by get_move()
+
+    def new_node(self, parent, move):
+        """Append a node to the pool and return its index. """
+        self.parent.append(parent)
+        self.move.append(move)
+        self.first_child.append(-1)
+        self.num_children.append(0)
+        self.visits.append(0)
+        self.wins.append(0.)
+        return len(self.move) - 1
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates of the most visited move at the root; (-1, -1)
+            if there are no legal moves.
+        """
+        if not game.get_legal_moves():
+            return (-1, -1)
+        self.time_left = time_left
+        if self.size != (game.width, game.height):
+            self.size = (game.width, game.height)
+            coords, masks, neighbors = knight_tables(game.width, game.height)
+            self.coords = coords
+            self.targets = tuple(tuple((bit, bit.bit_length() - 1) for bit, _ in cells)
+                                 for cells in neighbors)
+            self.reset()
+
+        state = self.game_state(game)
+        self.find_root(state)
+
+        while self.time_left() >= self.TIMER_THRESHOLD:
+            self.iterate(state)
+
+        root = self.root
+        first = self.first_child[root]
+        if first < 0:  # not even one iteration finished
+            return game.get_legal_moves()[0]
+        visits = self.visits
+        best = max(range(first, first + self.num_children[root]), key=visits.__getitem__)
+        self.played = (state, best)  # the root moves on once the opponent replies
+        return self.coords[self.move[best]]
+
+    def game_state(self, game):
+        """Return (blocked cells bitmask, [location of the active player,
+        location of the inactive player]) for `game`; locations are cell
+        indices, or -1 for a player that has not moved yet.
+        """
+        cells = game.width * game.height
+        blocked = ~game.get_blank_mask() & ((1 << cells) - 1)
+        locations = []
+        for player in (game.active_player, game.inactive_player):
+            loc = game.get_player_location(player)
+            locations.append(-1 if loc is None else loc[0] + loc[1] * game.height)
+        return blocked, locations
+
+    def find_root(self, state):
+        """Make the root of the tree the node of `state`: the child of the
+        previous move matching the opponent's reply if the tree can be
+        reused, or a new node otherwise.
+        """
+        blocked, (mine, theirs) = state
+        if self.reuse_tree and self.played is not None and len(self.move) < self.max_nodes:
+            (previous_blocked, _), node = self.played
+            # The reply must be the only difference from the position after our move
+            if (mine == self.move[node] and theirs >= 0 and
+                    blocked == previous_blocked | 1 << mine | 1 << theirs):
+                first = self.first_child[node]
+                for child in range(first, first + self.num_children[node]):
+                    if self.move[child] == theirs:
+                        self.root, self.played = child, None
+                        self.parent[child] = -1
+                        return
+        self.reset()
+        self.root = self.new_node(-1, -1)
+
+    def iterate(self, state):
+        """Run one selection, expansion, playout and backpropagation step from
+        the root, whose position is `state`.
+        """
+        blocked, locations = state[0], list(state[1])
+        turn = 0
+        node = self.root
+        first_child, num_children = self.first_child, self.num_children
+        visits, wins, move = self.visits, self.wins, self.move
+        c = self.exploration
+
+        # Selection: follow the UCT rule down to a node that is not expanded
+        while first_child[node] >= 0:
+            first = first_child[node]
+            count = num_children[node]
+            if not count:
+                break   # terminal node, the player to move has lost
+            log_visits = math.log(visits[node])
+            best, best_value = first, -1.
+            for child in range(first, first + count):
+                n = visits[child]
+                if not n:
+                    best = child
+                    break
+                value = wins[child] / n + c * math.sqrt(log_visits / n)
+                if value > best_value:
+                    best, best_value = child, value
+            node = best
+            cell = move[node]
+            blocked |= 1 << cell
+            locations[turn] = cell
+            turn ^= 1
+
+        # Expansion: add every child of the node and play out from one of them
+        if first_child[node] < 0 and len(move) < self.max_nodes:
+            cells = self.legal_cells(blocked, locations[turn])
+            self.rng.shuffle(cells)
+            first_child[node] = len(move)
+            num_children[node] = len(cells)
+            for cell in cells:
+                self.new_node(node, cell)
+            if cells:
+                node = first_child[node]
+                cell = move[node]
+                blocked |= 1 << cell
+                locations[turn] = cell
+                turn ^= 1
+
+        loser = self.playout(blocked, locations, turn)
+
+        # Backpropagation: a node's wins count for the player who moved into it
+        parent = self.parent
+        while node >= 0:
+            visits[node] += 1
+            turn ^= 1   # the player who made the move into node
+            if turn != loser:
+                wins[node] += 1.
+            if node == self.root:
+                break
+            node = parent[node]
+
+    def legal_cells(self, blocked, loc):
+        """Return the cells the player at cell `loc` (-1 if it has not moved)
+        can move to.
+        """
+        if loc < 0:
+            return [idx for idx in range(len(self.targets)) if not blocked >> idx & 1]
+        return [cell for bit, cell in self.targets[loc] if not blocked & bit]
+
+    def playout(self, blocked, locations, turn):
+        """Play random moves until a player cannot move, starting with player
+        `turn`, and return the losing player (0 for the root's player to
+        move, 1 for the opponent).
+        """
+        targets = self.targets
+        rand = self.rng.random
+        locations = list(locations)
+        while True:
+            loc = locations[turn]
+            if loc < 0:
+                cells = self.legal_cells(blocked, loc)
+            else:
+                cells = [cell for bit, cell in targets[loc] if not blocked & bit]
+            if not cells:
+                return turn
+            cell = cells[int(rand() * len(cells))]
+            blocked |= 1 << cell
+            locations[turn] = cell
+            turn ^= 1
@@ -0,0 +1,124 @@
+"""This file contains the `MoveOrderer` class, which decides the order in
+which the alpha-beta agents visit the children of a node.
+
+Alpha-beta prunes the most when the best move is searched first, so the
+moves are tried in this order:
+
+    1. the move of the principal variation (PV) found by the previous
+       iterative-deepening iteration, if the node lies on it;
+    2. the killer moves of the current ply, i.e. the latest moves that caused
+       a beta cutoff in a sibling node;
+    3. all remaining moves, sorted by a history table that accumulates the
+       cutoffs caused by each move across iterations and turns.
+
+Any object with the same methods can be given to the agents instead.
+"""
+
+
+class MoveOrderer(object):
+    """PV, killer move and history heuristic move ordering.
+
+    Parameters
+    ----------
+    num_killers : int (optional)
+        The number of killer moves remembered for each ply.
+
+    Attributes
+    ----------
+    nodes : int
+        The number of interior nodes ordered so far.
+
+    cutoffs : int
+        The number of those nodes that ended in a beta cutoff.
+
+    first_move_cutoffs : int
+        The number of cutoffs caused by the first move searched.
+    """
+
+    def __init__(self, num_killers=2):
+        self.num_killers = num_killers
+        self.killers = []          # killers[ply] is a list of moves, newest first
+        self.history = ({}, {})    # move scores for the opponent's and the agent's moves
+        self.pv = {}               # Zobrist key -> PV move of the previous iteration
+        self.root_ply = 0
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    @property
+    def first_move_cutoff_rate(self):
+        """The fraction of cutoffs that were caused by the first move searched;
+        the closer it is to 1, the better the ordering.
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.
+
+    def new_search(self, game):
+        """Prepare for a search from the root `game`, keeping what was learnt
+        in the previous searches of the same game.
+        """
+        plies_played = game.move_count - self.root_ply
+        if plies_played > 0:
+            self.killers = self.killers[plies_played:]
+        elif plies_played < 0:  # a new game has started
+            self.killers = []
+        self.root_ply = game.move_count
+        self.pv = {}
+        for history in self.history:
+            for move in history:
+                history[move] //= 2  # let older cutoffs fade away
+
+    def new_iteration(self, pv):
+        """Record the principal variation of the iteration that just finished,
+        given as a list of (Zobrist key, move) pairs.
+        """
+        self.pv = dict(pv)
+
+    def order(self, game, legal_moves, maximizing):
+        """Sort `legal_moves` in-place into the order they should be searched.
+
+        Parameters
+        ----------
+        game : isolation.Board
+            The game state of the node.
+
+        legal_moves : list<(int, int)>
+            The legal moves of the active player.
+
+        maximizing : bool
+            True if the agent itself is to move, False for its opponent.
+        """
+        self.nodes += 1
+        history = self.history[maximizing]
+        legal_moves.sort(key=lambda m: history.get(m, 0), reverse=True)
+
+        ply = game.move_count - self.root_ply
+        if ply < len(self.killers):
+            for move in reversed(self.killers[ply]):
+                if move in legal_moves:
+                    legal_moves.remove(move)
+                    legal_moves.insert(0, move)
+
+        move = self.pv.get(game.zobrist)
+        if move in legal_moves:
+            legal_moves.remove(move)
+            legal_moves.insert(0, move)
+
+    def cutoff(self, game, move, depth, maximizing, index):
+        """Record that searching `move` (the `index`-th move tried) caused a
+        beta cutoff at a node with `depth` plies left to search.
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        history = self.history[maximizing]
+        history[move] = history.get(move, 0) + depth * depth
+
+        ply = game.move_count - self.root_ply
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[self.num_killers:]
@@ -0,0 +1,205 @@
+"""Build and read opening books for the alpha-beta agents.
+
+An opening book maps every position reachable in the first few plies of a
+game to the best move found for it by a deep offline search, so the agents
+can play those moves instantly instead of spending search time on them.
+Positions are stored under their canonical key (see `isolation.symmetry`),
+so each set of symmetric positions is searched and stored only once.
+
+The book file is a 16 byte header (magic, width, height, number of entries)
+followed by the sorted canonical keys (unsigned 64-bit) and the matching
+canonical moves (unsigned 16-bit, packed as in `transposition.encode_move`).
+`OpeningBook` memory-maps the file and finds positions by binary search, so
+loading a book costs nothing and processes share its pages.
+
+Build a book from the command line, e.g.:
+
+    python opening_book.py --plies 3 --depth 5 --output opening_book.bin
+"""
+import argparse
+import bisect
+import mmap
+import multiprocessing
+import struct
+import time
+from array import array
+
+from isolation import Board
+from isolation.symmetry import canonical_form, to_canonical, from_canonical
+from move_ordering import MoveOrderer
+from sample_players import improved_score
+from transposition import encode_move, decode_move, PLAYER_2_KEY
+
+MAGIC = b"ISOBOOK1"
+HEADER = struct.Struct("<8sHHI")
+
+
+class OpeningBook(object):
+    """Read-only, memory-mapped opening book.
+
+    Parameters
+    ----------
+    path : str
+        The name of a book file written by `write_book()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("{} is not an opening book".format(path))
+        view = memoryview(self._mmap)
+        keys_end = HEADER.size + 8 * count
+        self.keys = view[HEADER.size:keys_end].cast('Q')
+        self.moves = view[keys_end:keys_end + 2 * count].cast('H')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)  # copies map the same file again
+
+    def lookup(self, game):
+        """Return the book move for the active player of `game`, or None if
+        the position is not in the book.
+        """
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        key, transform = canonical_form(game)
+        idx = bisect.bisect_left(self.keys, key)
+        if idx == len(self.keys) or self.keys[idx] != key:
+            return None
+        move = from_canonical(decode_move(self.moves[idx]), transform,
+                              game.width, game.height)
+        if move not in game.get_legal_moves():
+            return None
+        return move
+
+
+def write_book(path, entries, width=7, height=7):
+    """Write a book file from a dict mapping canonical keys to canonical
+    moves.
+    """
+    keys = sorted(entries)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, len(keys)))
+        f.write(array('Q', keys).tobytes())
+        f.write(array('H', [encode_move(entries[key]) for key in keys]).tobytes())
+
+
+def opening_positions(plies, width=7, height=7):
+    """Return the positions reachable in fewer than `plies` plies from the
+    empty board, one per canonical key, as a dict mapping the canonical key
+    of each position to a sequence of moves reaching it.
+    """
+    positions = {}
+    frontier = {canonical_form(Board("p1", "p2", width, height))[0]: ()}
+    for _ in range(plies):
+        positions.update(frontier)
+        children = {}
+        for moves in frontier.values():
+            game = _replay(Board("p1", "p2", width, height), moves)
+            for move in game.get_legal_moves():
+                key = canonical_form(game.forecast_move(move))[0]
+                if key not in positions and key not in children:
+                    children[key] = moves + (move,)
+        frontier = children
+    return positions
+
+
+def _replay(game, moves):
+    """Apply a sequence of moves to a game and return it."""
+    for move in moves:
+        game.apply_move(move)
+    return game
+
+
+def search_position(task):
+    """Search an opening position to a fixed depth.
+
+    Parameters
+    ----------
+    task : (tuple, int, int, int, callable)
+        The moves reaching the position, the search depth, the board size
+        and the heuristic used by the search.
+
+    Returns
+    -------
+    (int, (int, int))
+        The canonical key of the position and the best move found for its
+        active player on the canonical orientation, or None if the active
+        player has no legal moves.
+    """
+    from game_agent import AlphaBetaPlayer  # the agents load books with this module
+
+    moves, depth, width, height, score_fn = task
+    player = AlphaBetaPlayer(score_fn=score_fn, tt_size=1 << 16, ordering=MoveOrderer, pvs=True)
+    opponent = "opponent"
+    if len(moves) % 2:
+        game = Board(opponent, player, width, height)
+        player.tt_salt = PLAYER_2_KEY
+    else:
+        game = Board(player, opponent, width, height)
+    _replay(game, moves)
+    game.enable_symmetry()
+    player.time_left = lambda: float("inf")
+    player.tt.new_search()
+    player.ordering.new_search(game)
+
+    # Iterative deepening with a plain root loop; unlike alphabeta(), it
+    # also searches the first move of the game
+    legal_moves = game.get_legal_moves()
+    best_move = None
+    for d in range(1, depth + 1):
+        if best_move is not None:
+            legal_moves.remove(best_move)
+            legal_moves.insert(0, best_move)
+        alpha = float("-inf")
+        for m in legal_moves:
+            score = player.child_value(game, m, player.min_value, d - 1, alpha, float("inf"))
+            if score > alpha or best_move is None:
+                alpha, best_move = score, m
+        player.ordering.new_iteration(player.principal_variation(game, best_move, d))
+
+    key, transform = canonical_form(game)
+    return key, to_canonical(best_move, transform, width, height)
+
+
+def build_book(path, plies, depth, width=7, height=7, score_fn=improved_score, workers=1):
+    """Search every opening position of fewer than `plies` plies to `depth`
+    plies and write the best moves found to a book file at `path`.
+
+    The heuristic must handle positions where a player has not moved yet;
+    `improved_score` does, unlike the custom_score functions of the agents.
+    """
+    tasks = [(moves, depth, width, height, score_fn)
+             for moves in opening_positions(plies, width, height).values()]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(search_position, tasks)
+    else:
+        results = [search_position(task) for task in tasks]
+    entries = {key: move for key, move in results if move is not None}
+    write_book(path, entries, width, height)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book for the alpha-beta agents.")
+    parser.add_argument("--plies", type=int, default=3,
+                        help="number of plies from the start of the game covered by the book")
+    parser.add_argument("--depth", type=int, default=5,
+                        help="search depth used for every book position")
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="number of processes searching positions in parallel")
+    parser.add_argument("--output", default="opening_book.bin")
+    args = parser.parse_args()
+    start_time = time.time()
+    count = build_book(args.output, args.plies, args.depth, args.width, args.height,
+                       workers=args.workers)
+    print("Wrote {} positions to {}".format(count, args.output))
+    print("--- %s seconds ---" % (time.time() - start_time))
@@ -57,7 +57,9 @@ def open_move_score(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    return float(len(game.get_legal_moves(player)))
+    return float(game.mobility(player))
+
+open_move_score.uses_mobility = True   # see game_agent.IsolationPlayer (score_fn)
 
 
 def improved_score(game, player):
@@ -87,10 +89,12 @@ def improved_score(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+    own_moves = game.mobility(player)
+    opp_moves = game.mobility(game.get_opponent(player))
     return float(own_moves - opp_moves)
 
+improved_score.uses_mobility = True
+
 
 def center_score(game, player):
     """Outputs a score equal to square of the distance from the center of the
@@ -0,0 +1,220 @@
+"""This file contains the `SearchStats` class, an optional collector of
+statistics about the searches run by the alpha-beta agents.
+
+Attach a collector to an agent to get one record per `get_move` call:
+
+    stats = SearchStats("AB_Improved")
+    player = AlphaBetaPlayer(score_fn=improved_score, stats=stats)
+    ...
+    stats.write_jsonl("stats.jsonl")
+    print(stats.summary())
+
+Agents without a collector skip every hook, so the statistics cost nothing
+unless they are requested.
+"""
+import json
+import time
+
+
+class _TimedScore(object):
+    """Heuristic wrapper counting the calls to the wrapped function and the
+    time spent in them.
+    """
+
+    def __init__(self, score_fn, stats):
+        self.score_fn = score_fn
+        self.stats = stats
+        self.uses_mobility = getattr(score_fn, "uses_mobility", False)
+        if hasattr(score_fn, "batch"):
+            self.batch = self._batch
+
+    def __call__(self, game, player):
+        start = time.perf_counter()
+        try:
+            return self.score_fn(game, player)
+        finally:
+            self.stats.score_calls += 1
+            self.stats.score_time += time.perf_counter() - start
+
+    def _batch(self, game, moves, player):
+        start = time.perf_counter()
+        try:
+            return self.score_fn.batch(game, moves, player)
+        finally:
+            self.stats.score_calls += len(moves)
+            self.stats.score_time += time.perf_counter() - start
+
+
+class SearchStats(object):
+    """Collector of per-move search statistics.
+
+    Parameters
+    ----------
+    name : str (optional)
+        A name for the agent, stored in every record.
+
+    Attributes
+    ----------
+    records : list<dict>
+        One record per move, holding:
+
+        - `source`: "tablebase", "book", "endgame" or "search", the way the
+          move was chosen
+        - `move_count`: the number of plies played before the move
+        - `move`: the move returned
+        - `time_ms`: the time taken by `get_move`
+        - `nodes`: the number of nodes searched
+        - `nps`: the number of nodes searched per second
+        - `depth`: the deepest completed iteration (None if none completed)
+        - `nodes_per_depth`: the number of nodes searched by each completed
+          iteration, keyed by depth (as a string, like in the JSON output)
+        - `time_to_depth_ms`: the time from the start of the move to the end
+          of each completed iteration, keyed like `nodes_per_depth`
+        - `cutoff_rate`, `first_move_cutoff_rate`: the fraction of interior
+          nodes ending in a beta cutoff and the fraction of cutoffs caused by
+          the first move searched (None without a move orderer)
+        - `tt_hit_rate`, `movebook_hit_rate`, `matchbook_hit_rate`: the
+          fraction of lookups that found an entry (None without lookups);
+          the walks along the principal variation stored in the
+          transposition table are not counted
+        - `score_calls`, `score_time_ms`: the number of heuristic evaluations
+          and the time spent in them
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.records = []
+        self.score_calls = 0
+        self.score_time = 0.
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.movebook_probes = 0
+        self.movebook_hits = 0
+        self.matchbook_probes = 0
+        self.matchbook_hits = 0
+        self._start = None
+        self._iterations = {}
+
+    def attach(self, agent):
+        """Make `agent` report to this collector; its heuristic is wrapped to
+        be timed.
+        """
+        agent.stats = self
+        agent.score = _TimedScore(agent.score, self)
+
+    def new_move(self, agent, game):
+        """Start recording the statistics of a `get_move` call."""
+        ordering = agent.ordering
+        self._start = {
+            "time": time.perf_counter(),
+            "move_count": game.move_count,
+            "score_calls": self.score_calls,
+            "score_time": self.score_time,
+            "movebook": (self.movebook_probes, self.movebook_hits),
+            "matchbook": (self.matchbook_probes, self.matchbook_hits),
+            "ordering": (ordering.nodes, ordering.cutoffs, ordering.first_move_cutoffs)
+                        if ordering is not None else None,
+            "tt": (self.tt_probes, self.tt_hits),
+        }
+        self._iterations = {}
+
+    def iteration_finished(self, depth, nodes):
+        """Record that the iteration searching to `depth` completed after
+        `nodes` nodes had been searched for the move.
+        """
+        self._iterations[depth] = (nodes, time.perf_counter())
+
+    def end_move(self, agent, move, source, nodes=0):
+        """Finish the record of the current move.
+
+        Parameters
+        ----------
+        agent : object
+            The agent that searched the move.
+
+        move : (int, int)
+            The move returned.
+
+        source : str
+            "tablebase", "book", "endgame" or "search".
+
+        nodes : int (optional)
+            The total number of nodes searched for the move.
+        """
+        start = self._start
+        elapsed = time.perf_counter() - start["time"]
+        nodes_per_depth, time_to_depth, previous = {}, {}, 0
+        for depth in sorted(self._iterations):
+            nodes, end = self._iterations[depth]
+            nodes_per_depth[str(depth)] = nodes - previous
+            time_to_depth[str(depth)] = 1000 * (end - start["time"])
+            previous = nodes
+
+        cutoff_rate = first_move_cutoff_rate = None
+        if start["ordering"] is not None:
+            ordering = agent.ordering
+            interior = ordering.nodes - start["ordering"][0]
+            cutoffs = ordering.cutoffs - start["ordering"][1]
+            first = ordering.first_move_cutoffs - start["ordering"][2]
+            cutoff_rate = _rate(cutoffs, interior)
+            first_move_cutoff_rate = _rate(first, cutoffs)
+
+        self.records.append({
+            "agent": self.name,
+            "source": source,
+            "move_count": start["move_count"],
+            "move": list(move) if move is not None else None,
+            "time_ms": 1000 * elapsed,
+            "nodes": nodes,
+            "nps": nodes / elapsed if elapsed > 0 else 0.,
+            "depth": max(self._iterations) if self._iterations else None,
+            "nodes_per_depth": nodes_per_depth,
+            "time_to_depth_ms": time_to_depth,
+            "cutoff_rate": cutoff_rate,
+            "first_move_cutoff_rate": first_move_cutoff_rate,
+            "tt_hit_rate": _rate(self.tt_hits - start["tt"][1],
+                                 self.tt_probes - start["tt"][0]),
+            "movebook_hit_rate": _rate(self.movebook_hits - start["movebook"][1],
+                                       self.movebook_probes - start["movebook"][0]),
+            "matchbook_hit_rate": _rate(self.matchbook_hits - start["matchbook"][1],
+                                        self.matchbook_probes - start["matchbook"][0]),
+            "score_calls": self.score_calls - start["score_calls"],
+            "score_time_ms": 1000 * (self.score_time - start["score_time"]),
+        })
+
+    def write_jsonl(self, path, mode="w"):
+        """Write the records to `path`, one JSON object per line."""
+        with open(path, mode) as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        """Return the averages of the records over the searched moves.
+
+        Returns
+        -------
+        dict
+            The number of moves; the numbers of moves played from the
+            tablebase, from the book and by the endgame solver; and the mean
+            of every numeric field of the records of searched moves (fields
+            that are None in every record are None).
+        """
+        searched = [r for r in self.records if r["source"] == "search"]
+        summary = {
+            "agent": self.name,
+            "moves": len(self.records),
+            "tablebase_moves": sum(r["source"] == "tablebase" for r in self.records),
+            "book_moves": sum(r["source"] == "book" for r in self.records),
+            "endgame_moves": sum(r["source"] == "endgame" for r in self.records),
+        }
+        for field in ("time_ms", "nodes", "nps", "depth", "cutoff_rate",
+                      "first_move_cutoff_rate", "tt_hit_rate", "movebook_hit_rate",
+                      "matchbook_hit_rate", "score_calls", "score_time_ms"):
+            values = [r[field] for r in searched if r[field] is not None]
+            summary[field] = sum(values) / len(values) if values else None
+        return summary
+
+
+def _rate(hits, total):
+    """Return hits / total, or None if total is 0."""
+    return hits / total if total else None
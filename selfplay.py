@@ -0,0 +1,242 @@
+"""Generate datasets of Isolation positions by self-play.
+
+Agents play complete games against each other, and every position in which
+an agent chose a move is recorded with the side to move, the score of the
+agent's search and the final outcome of the game, e.g. to tune heuristics
+on real game data:
+
+    python selfplay.py --games 1000 --agents AB_Improved "Competition Player" \\
+        --workers 4 --output selfplay_data
+
+Games are played by a process pool and streamed to fixed-width NumPy shard
+files (`shard-00000.npy`, ... holding structured arrays of POSITION_DTYPE)
+in the output directory. At most one shard of positions is held in memory,
+however many games are generated. `manifest.json` lists the shards and the
+number of games they hold; running the same command again resumes after
+the last complete shard, and asking for more games extends the dataset.
+Each game is seeded from the master seed and its index, so a resumed run
+plays the same openings as an uninterrupted one.
+
+This script requires NumPy.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from isolation import Board
+from competition_agent import CustomPlayer
+from game_agent import AlphaBetaPlayer, custom_score, custom_score_2, custom_score_3
+from mcts_agent import MCTSPlayer
+from sample_players import improved_score
+
+MANIFEST = "manifest.json"
+TIME_LIMIT = 150        # number of milliseconds per move
+SHARD_SIZE = 1 << 16    # number of positions per shard
+RANDOM_PLIES = 2        # number of random moves opening every game
+BLOCK = 256             # number of games handed to the pool at once
+
+POSITION_DTYPE = np.dtype([
+    ("game", "<u4"),            # index of the game
+    ("move_count", "<u2"),      # number of plies played before the position
+    ("width", "u1"),
+    ("height", "u1"),
+    ("blocked", "<u8"),         # bit row + col * height is set for every occupied cell
+    ("locations", "i1", (2,)),  # cells of the player to move and of its opponent, -1 if not moved
+    ("side", "u1"),             # 0 if player 1 is to move, 1 if player 2 is
+    ("move", "i1"),             # cell the player to move chose
+    ("score", "<f4"),           # search score for the player to move, NaN without a search
+    ("outcome", "i1"),          # 1 if the player to move won the game, -1 if it lost
+])
+
+# The agents that can play, built fresh for every game
+AGENTS = {
+    "AB_Improved": lambda: AlphaBetaPlayer(score_fn=improved_score),
+    "AB_Custom": lambda: AlphaBetaPlayer(score_fn=custom_score),
+    "AB_Custom_2": lambda: AlphaBetaPlayer(score_fn=custom_score_2),
+    "AB_Custom_3": lambda: AlphaBetaPlayer(score_fn=custom_score_3),
+    "Competition Player": lambda: CustomPlayer(),
+    "MCTS": lambda: MCTSPlayer(),
+}
+
+
+def play_game(task):
+    """Play one self-play game.
+
+    Parameters
+    ----------
+    task : tuple
+        The index and seed of the game, the names of the two agents (the
+        first one moves first in even games, the second one in odd games),
+        the board size, the time limit per move and the number of random
+        opening plies.
+
+    Returns
+    -------
+    numpy.ndarray
+        The positions of the game, in order, as an array of POSITION_DTYPE.
+    """
+    index, seed, names, width, height, time_limit, random_plies = task
+    random.seed(seed)  # for agents drawing from the global generator
+    players = [AGENTS[name]() for name in names]
+    if index % 2:
+        players.reverse()
+    game = Board(players[0], players[1], width, height, rng=seed)
+    opening = random.Random(seed)
+    for _ in range(random_plies):
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            break
+        game.apply_move(opening.choice(sorted(legal_moves)))
+
+    rows = []
+
+    def record(board, move):
+        player = board.active_player
+        score = getattr(player, "root_score", None)
+        if score is not None:
+            player.root_score = None  # book and endgame moves leave it unset
+        locations = []
+        for p in (player, board.inactive_player):
+            loc = board.get_player_location(p)
+            locations.append(-1 if loc is None else loc[0] + loc[1] * height)
+        blocked = ~board.get_blank_mask() & ((1 << width * height) - 1)
+        rows.append((index, board.move_count, width, height, blocked, locations,
+                     player is not board._player_1, move[0] + move[1] * height,
+                     float("nan") if score is None else score, 0))
+
+    winner, _, _ = game.play(time_limit, on_move=record)
+    positions = np.array(rows, dtype=POSITION_DTYPE)
+    winner_side = winner is not game._player_1
+    positions["outcome"] = np.where(positions["side"] == winner_side, 1, -1)
+    return positions
+
+
+def load_manifest(output):
+    """Return the manifest of the dataset in directory `output`, or None if
+    there is none yet.
+    """
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save(path, save):
+    """Write a file through save(file object) and atomically move it to
+    `path`, so that an interrupted run never leaves a truncated file.
+    """
+    with open(path + ".tmp", "wb") as f:
+        save(f)
+    os.replace(path + ".tmp", path)
+
+
+def _write_shard(output, manifest, positions, games):
+    """Write a shard of positions holding `games` complete games and record
+    it in the manifest.
+    """
+    name = "shard-{:05d}.npy".format(len(manifest["shards"]))
+    _save(os.path.join(output, name), lambda f: np.save(f, positions))
+    manifest["shards"].append({"file": name, "positions": len(positions),
+                               "first_game": manifest["games"], "games": games})
+    manifest["games"] += games
+    manifest["positions"] += len(positions)
+    _save(os.path.join(output, MANIFEST),
+          lambda f: f.write(json.dumps(manifest, indent=1).encode()))
+
+
+def generate(output, games, agents=("AB_Improved", "AB_Improved"), workers=1, seed=0,
+             width=7, height=7, time_limit=TIME_LIMIT, random_plies=RANDOM_PLIES,
+             shard_size=SHARD_SIZE):
+    """Play self-play games until the dataset in directory `output` holds
+    `games` games, resuming from its manifest if there is one.
+
+    Raises
+    ------
+    ValueError
+        If the existing dataset was generated with different settings, or
+        the board has more than 64 cells.
+    """
+    if width * height > 64:
+        raise ValueError("positions are stored with 64-bit masks; use at most 64 cells")
+    config = {"agents": list(agents), "seed": seed, "width": width, "height": height,
+              "time_limit": time_limit, "random_plies": random_plies}
+    os.makedirs(output, exist_ok=True)
+    manifest = load_manifest(output)
+    if manifest is None:
+        manifest = {"dtype": POSITION_DTYPE.descr, "config": config,
+                    "games": 0, "positions": 0, "shards": []}
+    elif manifest["config"] != config:
+        raise ValueError("{} holds a dataset generated with {}".format(output, manifest["config"]))
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        buffer, buffered, buffered_games = [], 0, 0
+        for start in range(manifest["games"], games, BLOCK):
+            tasks = [(index, (seed << 32) + index, tuple(agents), width, height,
+                      time_limit, random_plies)
+                     for index in range(start, min(start + BLOCK, games))]
+            # Games come back in order, so every shard holds a range of games
+            results = pool.imap(play_game, tasks) if pool is not None else map(play_game, tasks)
+            for positions in results:
+                buffer.append(positions)
+                buffered += len(positions)
+                buffered_games += 1
+                if buffered >= shard_size:
+                    _write_shard(output, manifest, np.concatenate(buffer), buffered_games)
+                    print("{} games, {} positions".format(manifest["games"], manifest["positions"]),
+                          flush=True)
+                    buffer, buffered, buffered_games = [], 0, 0
+        if buffered_games:
+            _write_shard(output, manifest, np.concatenate(buffer), buffered_games)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return manifest
+
+
+def iter_shards(output):
+    """Yield the shards of the dataset in directory `output` as read-only
+    memory-mapped arrays.
+    """
+    manifest = load_manifest(output)
+    for shard in manifest["shards"] if manifest is not None else []:
+        yield np.load(os.path.join(output, shard["file"]), mmap_mode="r")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a dataset of positions by self-play.")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="total number of games of the dataset")
+    parser.add_argument("--agents", nargs=2, choices=sorted(AGENTS),
+                        default=["AB_Improved", "AB_Improved"], metavar="NAME",
+                        help="the two agents playing ({})".format(", ".join(sorted(AGENTS))))
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="number of processes playing games in parallel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT,
+                        help="milliseconds per move (default: {})".format(TIME_LIMIT))
+    parser.add_argument("--random-plies", type=int, default=RANDOM_PLIES,
+                        help="number of random moves opening every game")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE,
+                        help="number of positions per shard file")
+    parser.add_argument("--output", default="selfplay_data")
+    args = parser.parse_args()
+    start_time = time.time()
+    try:
+        manifest = generate(args.output, args.games, args.agents, args.workers, args.seed,
+                            args.width, args.height, args.time_limit, args.random_plies,
+                            args.shard_size)
+    except ValueError as error:
+        parser.error(str(error))
+    print("{} holds {} games and {} positions".format(args.output, manifest["games"],
+                                                      manifest["positions"]))
+    print("--- %s seconds ---" % (time.time() - start_time))
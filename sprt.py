@@ -0,0 +1,131 @@
+"""This file contains the statistics used by `tournament.py` to compare two
+agents: Elo estimates with confidence intervals, and the `SPRT` class, a
+sequential probability ratio test deciding between two Elo hypotheses.
+
+Isolation has no draws, so the expected score of an agent is its chance of
+winning a game, `1 / (1 + 10 ** (-elo / 400))` for an Elo difference `elo`
+with its opponent. The tournament plays the games in pairs, one with each
+side of the same opening, and the two games of a pair are not independent
+(the opening may favour one side, or one agent), so the unit of the test is
+the pair: it scores 0, 1/2 or 1, a trinomial outcome whose mean is the
+expected score. The SPRT compares the likelihood of the pair results under
+the hypothesis H0 (the difference is elo0) and H1 (it is elo1) after every
+match, each hypothesis taking the distribution of the pair scores that best
+fits the results among those with its expected score (a generalized SPRT),
+and stops as soon as the log-likelihood ratio (LLR) crosses one of the
+bounds set by the error rates alpha (accepting H1 when H0 holds) and beta
+(accepting H0 when H1 holds). Clear-cut pairings are decided in a few
+matches, and close ones get the matches they need.
+"""
+import math
+
+PAIR_SCORES = (0., 0.5, 1.)  # score of a pair of games lost, split and won
+PRIOR = 1e-3                  # pseudo-count of every pair result, so none has probability 0
+
+
+def elo_to_score(elo):
+    """Return the expected score of a player rated `elo` above its opponent. """
+    return 1. / (1. + 10. ** (-elo / 400.))
+
+
+def score_to_elo(score):
+    """Return the Elo difference matching an expected score in [0, 1]. """
+    if score <= 0.:
+        return float("-inf")
+    if score >= 1.:
+        return float("inf")
+    return 400. * math.log10(score / (1. - score))
+
+
+def elo_interval(wins, losses, z=1.96):
+    """Estimate the Elo difference of a player from its wins and losses.
+
+    Returns
+    -------
+    (float, float, float)
+        The estimate and the bounds of its confidence interval (95% for the
+        default z), from the Wilson score interval, which stays meaningful
+        for small numbers of games and one-sided results.
+    """
+    games = wins + losses
+    if not games:
+        return 0., float("-inf"), float("inf")
+    score = wins / games
+    center = (score + z * z / (2 * games)) / (1. + z * z / games)
+    margin = (z * math.sqrt(score * (1. - score) / games + z * z / (4 * games * games))
+              / (1. + z * z / games))
+    return (score_to_elo(score), score_to_elo(center - margin),
+            score_to_elo(center + margin))
+
+
+class SPRT(object):
+    """Sequential probability ratio test of H0: elo = elo0 against
+    H1: elo = elo1.
+
+    Parameters
+    ----------
+    elo0, elo1 : float (optional)
+        The Elo differences of the two hypotheses; elo0 < elo1.
+
+    alpha, beta : float (optional)
+        The probabilities of accepting H1 when H0 is true and of accepting
+        H0 when H1 is true.
+    """
+
+    def __init__(self, elo0=0., elo1=50., alpha=0.05, beta=0.05):
+        if not elo0 < elo1:
+            raise ValueError("SPRT needs elo0 < elo1")
+        self.elo0, self.elo1 = elo0, elo1
+        self.alpha, self.beta = alpha, beta
+        self.lower = math.log(beta / (1. - alpha))
+        self.upper = math.log((1. - beta) / alpha)
+        self.score0, self.score1 = elo_to_score(elo0), elo_to_score(elo1)
+
+    def llr(self, pairs):
+        """Return the log-likelihood ratio of H1 to H0 for the results.
+
+        Parameters
+        ----------
+        pairs : (int, int, int)
+            The numbers of pairs of games (one with each side of an opening)
+            the agent lost, split and won.
+        """
+        count = sum(pairs)
+        if not count:
+            return 0.
+        frequencies = [(n + PRIOR) / (count + PRIOR * len(pairs)) for n in pairs]
+        return count * (_log_likelihood(frequencies, self.score1)
+                        - _log_likelihood(frequencies, self.score0))
+
+    def status(self, pairs):
+        """Return "H1" or "H0" once the results of the `pairs` (see llr())
+        accept that hypothesis, and None while the test must go on.
+        """
+        llr = self.llr(pairs)
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+
+def _log_likelihood(frequencies, score, iterations=100):
+    """Return the mean log-likelihood of pair results with the given
+    `frequencies` (of the PAIR_SCORES, all positive) under the distribution
+    of the pair scores with mean `score` that fits them best.
+
+    That distribution is p_i = f_i / (1 + t * d_i), where d_i = a_i - score
+    for the pair scores a_i, and t, found by bisection, is the root of
+    sum(f_i * d_i / (1 + t * d_i)), which decreases with t; the p_i then
+    sum to 1 and have mean `score`.
+    """
+    deviations = [a - score for a in PAIR_SCORES]
+    low, high = -1. / max(deviations), -1. / min(deviations)  # every 1 + t * d_i > 0
+    for _ in range(iterations):
+        t = (low + high) / 2.
+        if sum(f * d / (1. + t * d) for f, d in zip(frequencies, deviations)) > 0.:
+            low = t
+        else:
+            high = t
+    t = (low + high) / 2.
+    return sum(f * math.log(f / (1. + t * d)) for f, d in zip(frequencies, deviations))
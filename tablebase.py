@@ -0,0 +1,341 @@
+"""Build and read solved-position tables (tablebases) for small boards.
+
+Small boards are solved exactly: every position reachable from the empty
+board is searched by a memoized negamax, and its value is recorded as a
+distance, the number of plies left before the player to move in a lost
+position has no legal move. The game always ends on the turn of the loser,
+so the player to move wins exactly when the distance is odd, and one byte
+holds both the result and its distance. Winners play for the shortest win
+and losers for the longest loss.
+
+Positions are stored once for all of their rotations and reflections (see
+`isolation.symmetry`), under a 64-bit key packing the blocked cells and the
+cells of the two players on the canonical orientation. The table file is a
+32 byte header (magic, width, height, number of slots, number of entries)
+followed by an open-addressing hash table: the keys (unsigned 64-bit) and
+the distances (unsigned 8-bit) of every slot. `Tablebase` memory-maps the
+file, so loading it costs nothing, processes share its pages, and a lookup
+is one hash and a few probes.
+
+Build a table from the command line, e.g.:
+
+    python tablebase.py --width 5 --height 5 --output tablebase_5x5.bin
+
+The 5x5 board has about 7.4 million distinct positions and takes a couple
+of minutes and under 1GB of memory to solve; a 6x6 board has far too many
+positions to solve this way.
+"""
+import argparse
+import itertools
+import mmap
+import multiprocessing
+import struct
+import sys
+import time
+from array import array
+
+from isolation.bitboard import knight_tables
+from isolation.symmetry import symmetry_tables
+
+MAGIC = b"ISOTBL01"
+HEADER = struct.Struct("<8sHHQQ")
+EMPTY = (1 << 64) - 1            # key of the free slots
+MULTIPLIER = 0x9E3779B97F4A7C15  # Fibonacci hashing of the keys
+LOAD_FACTOR = 0.75               # maximum fraction of the slots in use
+LOCATION_BITS = 6                # bits of each player location in a key
+MAX_CELLS = 64 - 2 * LOCATION_BITS
+
+# Symmetry tables shared by every table of the same board size, keyed by
+# (width, height)
+_KEY_TABLES = {}
+
+
+def key_tables(width, height):
+    """Return the tables used to compute the canonical keys of positions on
+    a board of the given size.
+
+    Returns
+    -------
+    tuple
+        One (chunks, cells) pair per symmetry of the board: `chunks[k][v]`
+        is the image of the bits v of the cells 8k to 8k + 7 of a blocked
+        mask, and `cells[idx]` the image of cell idx (the extra cell
+        `width * height` standing for a player that has not moved yet).
+    """
+    key = (width, height)
+    if key not in _KEY_TABLES:
+        n = width * height
+        tables = []
+        for perm in symmetry_tables(width, height)[0]:
+            chunks = tuple(tuple(sum(1 << perm[8 * k + j] for j in range(8)
+                                     if v >> j & 1 and 8 * k + j < n)
+                                 for v in range(256))
+                           for k in range((n + 7) // 8))
+            tables.append((chunks, perm + (n,)))
+        _KEY_TABLES[key] = tuple(tables)
+    return _KEY_TABLES[key]
+
+
+def position_key(blocked, active, inactive, tables, cells):
+    """Return the canonical key of a position.
+
+    Parameters
+    ----------
+    blocked : int
+        The bitmask of the blocked cells.
+
+    active, inactive : int
+        The cells of the player to move and of its opponent, or `cells` for
+        a player that has not moved yet.
+
+    tables : tuple
+        The `key_tables()` of the board size.
+
+    cells : int
+        The number of cells of the board.
+    """
+    best = EMPTY
+    for chunks, perm in tables:
+        mask, rest = 0, blocked
+        for chunk in chunks:
+            mask |= chunk[rest & 0xff]
+            rest >>= 8
+        key = (mask | perm[active] << cells
+               | perm[inactive] << (cells + LOCATION_BITS))
+        if key < best:
+            best = key
+    return best
+
+
+def game_position(game):
+    """Return the blocked cells of `game` as a bitmask and the cells of its
+    active and inactive players (`width * height` if not moved yet).
+    """
+    cells = game.width * game.height
+    locations = []
+    for player in (game.active_player, game.inactive_player):
+        loc = game.get_player_location(player)
+        locations.append(cells if loc is None else loc[0] + loc[1] * game.height)
+    return ~game.get_blank_mask() & ((1 << cells) - 1), locations[0], locations[1]
+
+
+def best_distance(distances):
+    """Return the distance of a position from the distances of its children,
+    and the index of the child an optimal player moves to (None without
+    children).
+    """
+    best, choice = 0, None
+    for i, d in enumerate(distances):
+        if d % 2 == 0:           # The opponent loses: win as fast as possible
+            if best % 2 == 0 or d + 1 < best:
+                best, choice = d + 1, i
+        elif best % 2 == 0 and d + 1 > best:  # Otherwise lose as slowly as possible
+            best, choice = d + 1, i
+    return best, choice
+
+
+class Tablebase(object):
+    """Read-only, memory-mapped table of solved positions.
+
+    Parameters
+    ----------
+    path : str
+        The name of a table file written by `write_tablebase()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.height, self.slots, self.count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("{} is not a tablebase".format(path))
+        view = memoryview(self._mmap)
+        keys_end = HEADER.size + 8 * self.slots
+        self.keys = view[HEADER.size:keys_end].cast('Q')
+        self.distances = view[keys_end:keys_end + self.slots].cast('B')
+        self.tables = key_tables(self.width, self.height)
+        self.masks = knight_tables(self.width, self.height)[1]
+
+    def __len__(self):
+        return self.count
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)  # copies map the same file again
+
+    def probe(self, key):
+        """Return the distance stored for a canonical key, or None. """
+        slot = ((key * MULTIPLIER) & EMPTY) * self.slots >> 64
+        keys = self.keys
+        while True:
+            stored = keys[slot]
+            if stored == key:
+                return self.distances[slot]
+            if stored == EMPTY:
+                return None
+            slot += 1
+            if slot == self.slots:
+                slot = 0
+
+    def distance(self, game):
+        """Return the distance of `game` (odd if its active player wins), or
+        None if the table does not hold it.
+        """
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        blocked, active, inactive = game_position(game)
+        cells = self.width * self.height
+        return self.probe(position_key(blocked, active, inactive, self.tables, cells))
+
+    def lookup(self, game):
+        """Return an optimal move for the active player of `game`, or None if
+        the table is for another board size, does not hold the position or
+        the active player has no legal moves.
+        """
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        blocked, active, inactive = game_position(game)
+        cells = self.width * self.height
+        targets = ~blocked & (self.masks[active] if active < cells else (1 << cells) - 1)
+        moves, distances = [], []
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            idx = bit.bit_length() - 1
+            d = self.probe(position_key(blocked | bit, inactive, idx, self.tables, cells))
+            if d is None:
+                return None
+            moves.append((idx % self.height, idx // self.height))
+            distances.append(d)
+        choice = best_distance(distances)[1]
+        return None if choice is None else moves[choice]
+
+
+class _Solver(object):
+    """Memoized negamax over the positions of a board, keyed canonically. """
+
+    def __init__(self, width, height, memo=None):
+        self.cells = width * height
+        self.tables = key_tables(width, height)
+        self.masks = knight_tables(width, height)[1] + ((1 << self.cells) - 1,)
+        self.memo = {} if memo is None else memo
+
+    def solve(self, blocked, active, inactive):
+        """Return the distance of a position (see `position_key()` for the
+        arguments).
+        """
+        key = position_key(blocked, active, inactive, self.tables, self.cells)
+        d = self.memo.get(key)
+        if d is None:
+            targets = self.masks[active] & ~blocked
+            distances = []
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                distances.append(self.solve(blocked | bit, inactive, bit.bit_length() - 1))
+            d = self.memo[key] = best_distance(distances)[0]
+        return d
+
+
+_worker_solver = None
+
+
+def _solve_task(task):
+    """Solve a batch of positions in a worker process, returning the keys and
+    distances of the positions solved for it that the worker had not
+    solved before.
+    """
+    global _worker_solver
+    width, height, positions = task
+    if _worker_solver is None:
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * width * height + 100))
+        _worker_solver = _Solver(width, height)
+    memo = _worker_solver.memo
+    start = len(memo)
+    for position in positions:
+        _worker_solver.solve(*position)
+    entries = list(itertools.islice(memo.items(), start, None))
+    return array('Q', [key for key, _ in entries]), array('B', [d for _, d in entries])
+
+
+def solve_positions(width=5, height=5, workers=1, batch=16):
+    """Solve every position reachable on a board of the given size.
+
+    With several workers, the positions after the two opening placements
+    are split between processes, each solving its share with its own memo,
+    and the results are merged before the first two plies are solved.
+
+    Returns
+    -------
+    dict
+        The distance of every position, keyed by canonical key.
+    """
+    cells = width * height
+    if cells > MAX_CELLS:
+        raise ValueError("tablebases are keyed on 64 bits; use at most {} cells".format(MAX_CELLS))
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * cells + 100))
+    memo = {}
+    if workers > 1:
+        tables = key_tables(width, height)
+        openings = {}
+        for first, second in itertools.permutations(range(cells), 2):
+            blocked = 1 << first | 1 << second
+            openings.setdefault(position_key(blocked, first, second, tables, cells),
+                                (blocked, first, second))
+        openings = list(openings.values())
+        tasks = [(width, height, openings[i:i + batch]) for i in range(0, len(openings), batch)]
+        with multiprocessing.Pool(workers) as pool:
+            for keys, distances in pool.imap_unordered(_solve_task, tasks):
+                memo.update(zip(keys, distances))
+    _Solver(width, height, memo).solve(0, cells, cells)
+    return memo
+
+
+def write_tablebase(path, entries, width=5, height=5):
+    """Write a table file from a dict mapping canonical keys to distances. """
+    slots = max(1, int(len(entries) / LOAD_FACTOR) + 1)
+    keys = array('Q', [EMPTY]) * slots
+    distances = array('B', [0]) * slots
+    for key, d in entries.items():
+        slot = ((key * MULTIPLIER) & EMPTY) * slots >> 64
+        while keys[slot] != EMPTY:
+            slot = slot + 1 if slot + 1 < slots else 0
+        keys[slot] = key
+        distances[slot] = d
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, slots, len(entries)))
+        f.write(keys.tobytes())
+        f.write(distances.tobytes())
+
+
+def build_tablebase(path, width=5, height=5, workers=1):
+    """Solve every position of a board of the given size and write the table
+    to a file at `path`.
+
+    Returns
+    -------
+    (int, int)
+        The number of positions written and the distance of the empty board.
+    """
+    entries = solve_positions(width, height, workers)
+    write_tablebase(path, entries, width, height)
+    cells = width * height
+    return len(entries), entries[position_key(0, cells, cells, key_tables(width, height), cells)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve every position of a small board.")
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--height", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="number of processes solving positions in parallel")
+    parser.add_argument("--output", default="tablebase.bin")
+    args = parser.parse_args()
+    start_time = time.time()
+    try:
+        count, root = build_tablebase(args.output, args.width, args.height, args.workers)
+    except ValueError as error:
+        parser.error(str(error))
+    print("Wrote {} positions to {}".format(count, args.output))
+    print("The first player {} in {} plies".format("wins" if root % 2 else "loses", root))
+    print("--- %s seconds ---" % (time.time() - start_time))
@@ -0,0 +1,96 @@
+"""This file contains the `TimeManager` class, which decides how long the
+alpha-beta agents keep deepening their search on each move.
+
+Instead of starting iterations until the timer runs out and throwing the
+unfinished one away, the manager predicts the cost of the next iteration
+from the durations of the previous ones and their effective branching
+factor (the ratio between the durations of consecutive iterations), and
+stops deepening when that iteration cannot finish in the time left.
+
+The safety margin at which a running search is aborted is calibrated from
+the observed delay between the moment the margin is crossed and the moment
+`get_move` returns (the timer check, the unwinding of the search and the
+bookkeeping of the move), so agents on a noisy machine keep more time in
+reserve. The margin only grows: it never drops below the timeout the agent
+was configured with, nor below a floor of a few milliseconds that absorbs
+the pauses (e.g. garbage collections) too rare to be observed.
+"""
+from collections import deque
+
+
+class TimeManager(object):
+    """Iteration scheduling and safety margin for an iterative-deepening
+    agent.
+
+    Parameters
+    ----------
+    margin : float
+        The initial safety margin, in milliseconds.
+
+    min_margin : float (optional)
+        The margin never drops below this many milliseconds, nor below the
+        initial `margin`.
+
+    safety : float (optional)
+        The margin is this multiple of the longest abort delay observed.
+
+    window : int (optional)
+        The number of recent abort delays the margin is calibrated from.
+
+    Attributes
+    ----------
+    margin : float
+        The current safety margin, in milliseconds; the agent aborts its
+        search when less time than this is left.
+    """
+
+    def __init__(self, margin, min_margin=5., safety=2., window=16):
+        self.min_margin = max(min_margin, margin)
+        self.margin = self.min_margin
+        self.safety = safety
+        self.delays = deque(maxlen=window)
+        self.time_left = None
+        self.durations = []
+        self.mark = None
+
+    def new_move(self, time_left):
+        """Start timing the search for a new move."""
+        self.time_left = time_left
+        self.durations = []
+        self.mark = time_left()
+
+    def iteration_finished(self):
+        """Record that an iteration of iterative deepening just finished."""
+        now = self.time_left()
+        self.durations.append(self.mark - now)
+        self.mark = now
+
+    def branching_factor(self):
+        """Return the effective branching factor of the last iterations, i.e.
+        the geometric mean of the ratios between consecutive durations.
+        """
+        recent = [d for d in self.durations[-4:] if d > 0]
+        if len(recent) < 2:
+            return None
+        return (recent[-1] / recent[0]) ** (1. / (len(recent) - 1))
+
+    def can_start_iteration(self):
+        """Return False if the next iteration is predicted not to finish
+        before the safety margin is reached.
+        """
+        factor = self.branching_factor()
+        if factor is None:
+            return True
+        return self.durations[-1] * factor < self.time_left() - self.margin
+
+    def move_finished(self):
+        """Calibrate the margin; call this last, just before the agent
+        returns its move.
+
+        If the search was aborted by the timer, the time used since the
+        margin was crossed is the delay that the margin must cover.
+        """
+        remaining = self.time_left()
+        if remaining < self.margin:
+            self.delays.append(self.margin - remaining)
+            self.margin = max(self.min_margin, self.safety * max(self.delays))
@@ -11,7 +11,10 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
+import copy
 import itertools
+import multiprocessing
 import random
 import warnings
 from competition_agent import *
@@ -23,9 +26,13 @@ from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
 from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
                         custom_score_2, custom_score_3)
+from mcts_agent import MCTSPlayer
+from search_stats import SearchStats
+from sprt import SPRT, elo_interval
 import time
 
 NUM_MATCHES = 5   # number of matches against each opponent
+MAX_MATCHES = 200 # maximum number of matches of a pairing in SPRT mode
 TIME_LIMIT = 150  # number of milliseconds before timeout
 
 DESCRIPTION = """
@@ -33,42 +40,118 @@ This script evaluates the performance of the custom_score evaluation
 function against a baseline agent using alpha-beta search and iterative
 deepening (ID) called `AB_Improved`. The three `AB_Custom` agents use
 ID and alpha-beta search with the custom_score functions defined in
-game_agent.py.
+game_agent.py. The `MCTS` agent plays the same matches with Monte Carlo
+Tree Search under the same time limit, to compare the strength per
+CPU-millisecond of the two kinds of search.
 """
 
 Agent = namedtuple("Agent", ["player", "name"])
 
+# Pristine copies of the agents in a worker process, keyed by the id() of the
+# agent they were copied from in the parent process
+_worker_players = {}
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+
+def _init_worker(players):
+    """Store the agents sent to a new worker process. """
+    _worker_players.update(players)
+
+
+def _play(game):
+    """Play a game to the end and return (True if the first player won,
+    termination reason).
+    """
+    winner, _, termination = game.play(time_limit=TIME_LIMIT)
+    return winner is game._player_1, termination
+
+
+def _play_game(task):
+    """Play one game, in a worker process or in this one.
+
+    Each game is played by fresh copies of the agents, so no search state
+    (e.g., moveBook entries) leaks between games, and with the board and the
+    global random number generator seeded for that game, so the moves are
+    shuffled the same way wherever it is played.
+    The search statistics recorded by the copies are returned with the
+    result, keyed by the id() of the agent in the parent process.
+    """
+    player_1_id, player_2_id, opening, seed = task
+    random.seed(seed)  # for agents drawing from the global generator
+    players = {player_id: copy.deepcopy(_worker_players[player_id])
+               for player_id in (player_1_id, player_2_id)}
+    for player in players.values():
+        if getattr(player, "stats", None) is not None:
+            player.stats.records = []   # return only the records of this game
+    game = Board(players[player_1_id], players[player_2_id], rng=seed)
+    for move in opening:
+        game.apply_move(move)
+    first_won, termination = _play(game)
+    records = {player_id: player.stats.records for player_id, player in players.items()
+               if getattr(player, "stats", None) is not None}
+    for player in players.values():
+        if hasattr(player, "close"):    # stop the Lazy SMP helpers of the copy
+            player.close()
+    return first_won, termination, records
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, rng, pool=None,
+               pair_counts=None):
     """Compare the test agents to the cpu agent in "fair" matches.
-0
+
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    The openings and the seeds of the games are drawn from the random number
+    generator `rng`. If a `multiprocessing.Pool` created with `_init_worker`
+    is given, the games are played in parallel by its worker processes.
+
+    If `pair_counts` is given, `pair_counts[player]` is a list counting the
+    matches (the two games of an opening) each test agent lost, split and
+    won, in this order.
     """
     timeout_count = 0
     forfeit_count = 0
+    matches = []
     for _ in range(num_matches):
 
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
-
         # initialize all games with a random move and response
+        board = Board("p1", "p2", shuffle_moves=False)
+        opening = []
         for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+            move = rng.choice(board.get_legal_moves())
+            opening.append(move)
+            board.apply_move(move)
+
+        for agent in test_agents:
+            matches.append((cpu_agent.player, agent.player, opening, rng.getrandbits(64)))
+            matches.append((agent.player, cpu_agent.player, opening, rng.getrandbits(64)))
+
+    # play all games and tally the results
+    tasks = [(id(player_1), id(player_2), opening, seed)
+             for player_1, player_2, opening, seed in matches]
+    if pool is None:
+        results = [_play_game(task) for task in tasks]
+    else:
+        results = pool.map(_play_game, tasks)
+
+    for (player_1, player_2, _, _), (first_won, termination, records) in zip(matches, results):
+        win_counts[player_1 if first_won else player_2] += 1
+        for player in (player_1, player_2):
+            if id(player) in records:
+                player.stats.records.extend(records[id(player)])
 
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
+        if termination == "timeout":
+            timeout_count += 1
+        elif termination == "forfeit":
+            forfeit_count += 1
 
-            if termination == "timeout":
-                timeout_count += 1
-            elif termination == "forfeit":
-                forfeit_count += 1
+    if pair_counts is not None:
+        # The two games of a match are consecutive, the test agent moving second then first
+        for i in range(0, len(matches), 2):
+            agent_player = matches[i][1]
+            won = (not results[i][0]) + results[i + 1][0]
+            pair_counts[agent_player][won] += 1
 
     return timeout_count, forfeit_count
 
@@ -79,8 +162,40 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def play_matches(cpu_agents, test_agents, num_matches, workers=1, seed=None, sprt=None):
+    """Play matches between the test agent and each cpu_agent individually.
+
+    With more than one worker, the games of each round are played in
+    parallel by a pool of `workers` processes. The openings and the seed of
+    every game derive from the master `seed`, so a seeded tournament plays
+    the same games with any number of workers.
+
+    If an `sprt.SPRT` test is given, each pairing of a test agent and a cpu
+    agent is played until the test decides it, up to `num_matches` matches.
+    """
+    rng = random.Random(seed)
+    players = {id(agent.player): agent.player for agent in cpu_agents + test_agents}
+    if workers > 1 and any(getattr(player, "workers", 1) > 1 for player in players.values()):
+        raise ValueError("agents searching with Lazy SMP helpers cannot play in "
+                         "worker processes; play with workers=1")
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(players,))
+    else:
+        _init_worker(players)
+    try:
+        if sprt is None:
+            _play_matches(cpu_agents, test_agents, num_matches, rng, pool)
+        else:
+            _play_sprt_matches(cpu_agents, test_agents, num_matches, rng, pool, sprt,
+                               max(1, workers // 2))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _play_matches(cpu_agents, test_agents, num_matches, rng, pool):
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
@@ -95,7 +210,7 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        counts = play_round(agent, test_agents, wins, num_matches, rng, pool)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -126,7 +241,94 @@ def play_matches(cpu_agents, test_agents, num_matches):
                "legal moves available to play.\n").format(total_forfeits))
 
 
-def main():
+def _play_sprt_matches(cpu_agents, test_agents, max_matches, rng, pool, sprt, batch):
+    """Play every pairing until `sprt` accepts one of its hypotheses or
+    `max_matches` matches have been played, `batch` matches at a time, and
+    print the Elo difference of the test agents with 95% confidence
+    intervals.
+    """
+    total_results = {agent.player: [0, 0] for agent in test_agents}  # wins, losses
+    total_timeouts = 0
+    total_forfeits = 0
+
+    print("\nSPRT: H0 Elo <= {:+g}, H1 Elo >= {:+g}, alpha = {:g}, beta = {:g}, "
+          "LLR bounds [{:.2f}, {:.2f}]".format(sprt.elo0, sprt.elo1, sprt.alpha, sprt.beta,
+                                              sprt.lower, sprt.upper))
+    print("\n{:^9}{:^13}{:^20}{:^7}{:^6}{:^6}{:^22}{:^8}{:^8}".format(
+        "Match #", "Opponent", "Agent", "Games", "Won", "Lost", "Elo (95% CI)", "LLR", "Result"))
+
+    for idx, cpu_agent in enumerate(cpu_agents):
+        results = {agent.player: [0, 0] for agent in test_agents}
+        pairs = {agent.player: [0, 0, 0] for agent in test_agents}  # matches lost, split, won
+        undecided = list(test_agents)
+        played = 0
+        while undecided and played < max_matches:
+            num_matches = min(batch, max_matches - played)
+            wins = {agent.player: 0 for agent in undecided}
+            wins[cpu_agent.player] = 0
+            counts = play_round(cpu_agent, undecided, wins, num_matches, rng, pool, pairs)
+            total_timeouts += counts[0]
+            total_forfeits += counts[1]
+            for agent in undecided:
+                results[agent.player][0] += wins[agent.player]
+                results[agent.player][1] += 2 * num_matches - wins[agent.player]
+            played += num_matches
+            undecided = [agent for agent in undecided
+                         if sprt.status(pairs[agent.player]) is None]
+
+        for agent in test_agents:
+            won, lost = results[agent.player]
+            total_results[agent.player][0] += won
+            total_results[agent.player][1] += lost
+            print("{!s:^9}{:^13}{:^20}{:^7}{:^6}{:^6}{:^22}{:^8.2f}{:^8}".format(
+                idx + 1, cpu_agent.name, agent.name, won + lost, won, lost,
+                _format_elo(won, lost), sprt.llr(pairs[agent.player]),
+                sprt.status(pairs[agent.player]) or "-"))
+
+    print("-" * 99)
+    for agent in test_agents:
+        won, lost = total_results[agent.player]
+        print("{:^9}{:^13}{:^20}{:^7}{:^6}{:^6}{:^22}".format(
+            "", "Total:", agent.name, won + lost, won, lost, _format_elo(won, lost)))
+
+    if total_timeouts:
+        print(("\nThere were {} timeouts during the tournament -- make sure " +
+               "your agent handles search timeout correctly, and consider " +
+               "increasing the timeout margin for your agent.\n").format(
+            total_timeouts))
+    if total_forfeits:
+        print(("\nYour ID search forfeited {} games while there were still " +
+               "legal moves available to play.\n").format(total_forfeits))
+
+
+def _format_elo(wins, losses):
+    """Format an Elo estimate and its 95% confidence interval. """
+    elo, low, high = elo_interval(wins, losses)
+    return "{:+.0f} [{:+.0f}, {:+.0f}]".format(elo, low, high)
+
+
+def print_stats(agents, path):
+    """Print a summary of the search statistics of the agents and write all
+    their records to `path` as JSON lines.
+    """
+    fields = [("time_ms", "Time(ms)", "{:.0f}"), ("nodes", "Nodes", "{:.0f}"),
+              ("nps", "NPS", "{:.0f}"), ("depth", "Depth", "{:.1f}"),
+              ("cutoff_rate", "Cutoff", "{:.2f}"), ("first_move_cutoff_rate", "1st Cut", "{:.2f}"),
+              ("tt_hit_rate", "TT Hit", "{:.2f}")]
+    print("\n{:^22}{:^7}".format("Agent", "Moves") +
+          ''.join('{:^10}'.format(title) for _, title, _ in fields))
+    mode = "w"
+    for agent in agents:
+        summary = agent.player.stats.summary()
+        print("{:^22}{:^7}".format(agent.name, summary["moves"]) + ''.join(
+            '{:^10}'.format("-" if summary[field] is None else fmt.format(summary[field]))
+            for field, _, fmt in fields))
+        agent.player.stats.write_jsonl(path, mode)
+        mode = "a"
+    print("\nSearch statistics written to {}".format(path))
+
+
+def main(workers=1, stats=None, seed=None, sprt=None, max_matches=MAX_MATCHES):
 
     # Define two agents to compare -- these agents will play from the same
     # starting position against the same adversaries in the tournament
@@ -135,7 +337,8 @@ def main():
         # Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
         # Agent(AlphaBetaPlayer(score_fn=custom_score_2), "AB_Custom_2"),
         # Agent(AlphaBetaPlayer(score_fn=custom_score_3), "AB_Custom_3")
-        Agent(CustomPlayer(), "Competition Player")
+        Agent(CustomPlayer(), "Competition Player"),
+        Agent(MCTSPlayer(), "MCTS")
     ]
 
     # Define a collection of agents to compete against the test agents
@@ -149,14 +352,55 @@ def main():
         Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
     ]
 
+    # Only the alpha-beta agents report search statistics
+    stats_agents = [agent for agent in test_agents + cpu_agents
+                    if hasattr(agent.player, "stats")]
+    if stats is not None:
+        for agent in stats_agents:
+            SearchStats(agent.name).attach(agent.player)
+
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if sprt is None:
+        play_matches(cpu_agents, test_agents, NUM_MATCHES, workers, seed)
+    else:
+        play_matches(cpu_agents, test_agents, max_matches, workers, seed, sprt)
+    if stats is not None:
+        print_stats(stats_agents, stats)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="number of processes playing games in parallel "
+                             "(default: 1, play every game in this process); "
+                             "keep N at most the number of CPU cores, or the "
+                             "agents will time out")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="record the search statistics of every move and "
+                             "write them to PATH as JSON lines")
+    parser.add_argument("--seed", type=int,
+                        help="master seed of the openings and of the random "
+                             "number generators of the games (default: random)")
+    parser.add_argument("--sprt", action="store_true",
+                        help="play each pairing until a sequential probability "
+                             "ratio test decides between --elo0 and --elo1 "
+                             "instead of playing {} matches".format(NUM_MATCHES))
+    parser.add_argument("--max-matches", type=int, default=MAX_MATCHES, metavar="N",
+                        help="maximum number of matches of a pairing in SPRT "
+                             "mode (default: {})".format(MAX_MATCHES))
+    parser.add_argument("--elo0", type=float, default=0.,
+                        help="Elo difference of the null hypothesis (default: 0)")
+    parser.add_argument("--elo1", type=float, default=50.,
+                        help="Elo difference of the alternative hypothesis (default: 50)")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="false positive rate of the test (default: 0.05)")
+    parser.add_argument("--beta", type=float, default=0.05,
+                        help="false negative rate of the test (default: 0.05)")
+    args = parser.parse_args()
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta) if args.sprt else None
     start_time = time.time()
-    main()
+    main(args.workers, args.stats, args.seed, sprt, args.max_matches)
     print("--- %s seconds ---" % (time.time() - start_time))
@@ -0,0 +1,230 @@
+"""This file contains the `TranspositionTable` class, a fixed-capacity cache
+of alpha-beta search results keyed by the Zobrist key of a game state (see
+`isolation.Board.zobrist`).
+
+The table is stored in flat typed arrays rather than a dictionary of
+objects, so its memory use is fixed when it is created. Every key maps to a
+bucket of two slots: a depth-preferred slot, which keeps the deepest result
+of the current search, and an always-replace slot, which keeps the most
+recent result that did not fit in the first one.
+
+`SharedTranspositionTable` keeps the same arrays in shared memory, so that
+the helper processes of a parallel search can all read and write one table.
+"""
+import multiprocessing
+import struct
+from array import array
+
+# Bound types of a stored score
+EXACT = 0  # the score is the exact minimax value of the node
+LOWER = 1  # the search failed high; the value is at least the score
+UPPER = 2  # the search failed low; the value is at most the score
+
+NO_MOVE = -1
+
+# Agents store scores from their own point of view, so the keys used by an
+# agent playing second are salted with this value to keep them apart from
+# the keys of the same positions seen by an agent playing first
+PLAYER_2_KEY = 0x6a09e667f3bcc909
+
+
+def encode_move(move):
+    """Pack a (row, column) move into a single int for storage."""
+    if move is None or move == (-1, -1):
+        return NO_MOVE
+    return (move[0] << 8) | move[1]
+
+
+def decode_move(value):
+    """Unpack a move stored with encode_move()."""
+    if value == NO_MOVE:
+        return None
+    return (value >> 8, value & 0xff)
+
+
+class TranspositionTable(object):
+    """Bounded cache of alpha-beta search results.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of entries in the table (rounded up to an even number);
+        it never grows beyond this size.
+    """
+    # The bounds of the stored scores, for agents that only hold a table
+    EXACT = EXACT
+    LOWER = LOWER
+    UPPER = UPPER
+
+    def __init__(self, size=1 << 16):
+        self.buckets = max(1, (size + 1) // 2)
+        n = 2 * self.buckets
+        self.keys = array('Q', [0]) * n
+        self.depths = array('b', [-1]) * n
+        self.bounds = array('b', [EXACT]) * n
+        self.scores = array('d', [0.]) * n
+        self.moves = array('h', [NO_MOVE]) * n
+        self.ages = array('B', [0]) * n
+        self.age = 0
+
+    def __len__(self):
+        return 2 * self.buckets
+
+    def new_search(self):
+        """Start a new search, letting the results of earlier searches be
+        replaced by shallower ones from the new search.
+        """
+        self.age = (self.age + 1) & 0xff
+
+    def clear(self):
+        """Remove every entry from the table."""
+        n = len(self)
+        self.depths[:] = array('b', [-1]) * n
+
+    def probe(self, key):
+        """Look up the result stored for a game state.
+
+        Parameters
+        ----------
+        key : int
+            The Zobrist key of the game state.
+
+        Returns
+        -------
+        (int, float, int, (int, int)) or None
+            The depth searched, the score, the bound type and the best move
+            (or None) stored for the state, or None if the state is not in
+            the table.
+        """
+        slot = 2 * (key % self.buckets)
+        if self.keys[slot] != key or self.depths[slot] < 0:
+            slot += 1
+            if self.keys[slot] != key or self.depths[slot] < 0:
+                return None
+        return (self.depths[slot], self.scores[slot], self.bounds[slot],
+                decode_move(self.moves[slot]))
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching a game state.
+
+        Parameters
+        ----------
+        key : int
+            The Zobrist key of the game state.
+
+        depth : int
+            The number of plies searched below the state.
+
+        score : float
+            The score found by the search.
+
+        bound : int
+            One of EXACT, LOWER or UPPER.
+
+        move : (int, int) or None
+            The best move found from the state, if any.
+        """
+        slot = 2 * (key % self.buckets)
+        if (self.keys[slot] != key and self.ages[slot] == self.age and
+                self.depths[slot] > depth):
+            slot += 1  # keep the deeper result and use the always-replace slot
+        self.keys[slot] = key
+        self.depths[slot] = min(depth, 127)
+        self.scores[slot] = score
+        self.bounds[slot] = bound
+        self.moves[slot] = encode_move(move)
+        self.ages[slot] = self.age
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Transposition table held in shared memory, for use by processes
+    forked from the one that creates it.
+
+    Entries are written without locks: each key is stored XORed with a
+    checksum of the rest of its entry, so an entry torn by two processes
+    writing the same slot at once no longer matches its key on probe,
+    instead of returning the score of one entry with the move of another.
+
+    Copies and pickles of the table get a private table with the same
+    entries; only forked processes share it.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of entries in the table (rounded up to an even number);
+        it never grows beyond this size.
+    """
+
+    def __init__(self, size=1 << 16):
+        self.buckets = max(1, (size + 1) // 2)
+        n = 2 * self.buckets
+        self._buffers = {}
+        for name, typecode in (('keys', 'Q'), ('depths', 'b'), ('bounds', 'b'),
+                               ('scores', 'd'), ('moves', 'h'), ('ages', 'B')):
+            buffer = multiprocessing.RawArray('B', n * array(typecode).itemsize)
+            self._buffers[name] = buffer
+            setattr(self, name, memoryview(buffer).cast('B').cast(typecode))
+        self._age = multiprocessing.RawValue('B', 0)
+        self.clear()
+
+    def __reduce__(self):
+        state = {name: bytes(buffer) for name, buffer in self._buffers.items()}
+        return _restore_shared_table, (len(self), state, self.age)
+
+    @property
+    def age(self):
+        return self._age.value
+
+    @age.setter
+    def age(self, value):
+        self._age.value = value
+
+    def _read(self, slot, key):
+        """Return the entry in a slot if it holds `key`, else None.
+
+        Each field is read once, so the checksum covers exactly the values
+        returned even if another process rewrites the slot meanwhile.
+        """
+        stored, depth, score = self.keys[slot], self.depths[slot], self.scores[slot]
+        bound, move = self.bounds[slot], self.moves[slot]
+        if depth < 0 or stored ^ _checksum(depth, score, bound, move) != key:
+            return None
+        return depth, score, bound, decode_move(move)
+
+    def probe(self, key):
+        """Look up the result stored for a game state (see
+        `TranspositionTable.probe`).
+        """
+        slot = 2 * (key % self.buckets)
+        return self._read(slot, key) or self._read(slot + 1, key)
+
+    def store(self, key, depth, score, bound, move):
+        """Record the result of searching a game state (see
+        `TranspositionTable.store`).
+        """
+        slot = 2 * (key % self.buckets)
+        if (self._read(slot, key) is None and self.ages[slot] == self.age and
+                self.depths[slot] > depth):
+            slot += 1  # keep the deeper result and use the always-replace slot
+        depth, move = min(depth, 127), encode_move(move)
+        self.depths[slot] = depth
+        self.scores[slot] = score
+        self.bounds[slot] = bound
+        self.moves[slot] = move
+        self.ages[slot] = self.age
+        self.keys[slot] = key ^ _checksum(depth, score, bound, move)  # written last, sealing the entry
+
+
+def _checksum(depth, score, bound, move):
+    """Return the checksum of the fields of a shared table entry."""
+    score_bits, = struct.unpack('<Q', struct.pack('<d', score))
+    return score_bits ^ (depth & 0xff) ^ bound << 8 ^ (move & 0xffff) << 16
+
+
+def _restore_shared_table(size, state, age):
+    """Rebuild a pickled SharedTranspositionTable. """
+    table = SharedTranspositionTable(size)
+    for name, data in state.items():
+        memoryview(table._buffers[name]).cast('B')[:] = data
+    table.age = age
+    return table
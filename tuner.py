@@ -0,0 +1,168 @@
+"""Fit the weights of a linear heuristic to the outcomes of self-play games.
+
+The hand-picked coefficients of the custom_score functions (e.g.
+`own_moves - 2 * opp_moves`) can only be compared by playing tournaments.
+This script instead fits them directly to the game results recorded by
+`selfplay.py`: it computes the features of `game_agent.LinearScore` for every
+position of the dataset in one vectorized NumPy pass, and fits them to the
+outcomes with logistic regression, i.e. Texel-style tuning, where the
+heuristic is the logit of the chance of winning. Each position is used from
+the point of view of both players, so the fitted heuristic scores the
+active and the inactive player alike.
+
+    python selfplay.py --games 2000 --output selfplay_data
+    python tuner.py --data selfplay_data --output tuned_weights.json
+
+The weights are written as JSON and plug into the agents with:
+
+    AlphaBetaPlayer(score_fn=LinearScore.load("tuned_weights.json"))
+
+This script requires NumPy.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from game_agent import LinearScore
+from isolation.playouts import neighbor_table
+from selfplay import iter_shards
+
+VALIDATION = 10   # every VALIDATION-th game is held out to measure the fit
+L2 = 1e-3         # ridge penalty on the weights, relative to the number of positions
+
+
+def position_features(positions):
+    """Compute the features of LinearScore for the player to move in every
+    position of a structured array of `selfplay.POSITION_DTYPE`.
+
+    All positions must share the same board size, and both players must
+    have moved in all of them.
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+        The (N, len(LinearScore.FEATURES)) features of the player to move,
+        and those of its opponent in the same positions.
+    """
+    width, height = int(positions["width"][0]), int(positions["height"][0])
+    cells = width * height
+    shifts = np.arange(cells, dtype=np.uint64)
+    board = np.ones((len(positions), cells + 1), dtype=bool)  # the extra cell is always blocked
+    board[:, :cells] = (positions["blocked"][:, None] >> shifts) & np.uint64(1)
+
+    rows = np.arange(len(positions))[:, None]
+    table = neighbor_table(width, height)
+    own = positions["locations"][:, 0].astype(np.intp)
+    opp = positions["locations"][:, 1].astype(np.intp)
+    own_targets, opp_targets = table[own], table[opp]
+    own_free = ~board[rows, own_targets]
+    opp_free = ~board[rows, opp_targets]
+    common = ((own_targets[:, :, None] == opp_targets[:, None, :])
+              & own_free[:, :, None] & opp_free[:, None, :]).any(axis=2).sum(axis=1)
+
+    own_r, own_c = own % height, own // height
+    opp_r, opp_c = opp % height, opp // height
+    r, c = (height - 1) / 2., (width - 1) / 2.
+    own_center = (own_r - r) ** 2 + (own_c - c) ** 2
+    opp_center = (opp_r - r) ** 2 + (opp_c - c) ** 2
+    distance = (own_r - opp_r) ** 2 + (own_c - opp_c) ** 2
+    own_moves, opp_moves = own_free.sum(axis=1), opp_free.sum(axis=1)
+
+    ones = np.ones(len(positions))
+    mover = np.column_stack([own_moves, opp_moves, common, distance,
+                             own_center, opp_center, ones])
+    waiting = np.column_stack([opp_moves, own_moves, -common, -distance,
+                               opp_center, own_center, -ones])
+    return mover.astype(float), waiting.astype(float)
+
+
+def load_features(data):
+    """Load the dataset in directory `data` and return the features, the
+    outcomes (1 for a win) and the game indices of every position, from the
+    point of view of both players.
+    """
+    features, outcomes, games = [], [], []
+    for shard in iter_shards(data):
+        shard = shard[(shard["locations"] >= 0).all(axis=1)]
+        for size in np.unique(shard[["width", "height"]]):
+            positions = shard[(shard["width"] == size[0]) & (shard["height"] == size[1])]
+            mover, waiting = position_features(positions)
+            won = (positions["outcome"] > 0).astype(float)
+            features += [mover, waiting]
+            outcomes += [won, 1. - won]
+            games += [positions["game"], positions["game"]]
+    if not features:
+        raise ValueError("{} holds no positions".format(data))
+    return np.concatenate(features), np.concatenate(outcomes), np.concatenate(games)
+
+
+def fit(features, outcomes, l2=L2, iterations=50, tolerance=1e-9):
+    """Fit logistic regression weights by Newton's method.
+
+    Returns
+    -------
+    numpy.ndarray
+        The weights w maximizing the likelihood of the outcomes under
+        P(win) = 1 / (1 + exp(-features @ w)), with a ridge penalty.
+    """
+    n, d = features.shape
+    penalty = l2 * n * np.eye(d)
+    weights = np.zeros(d)
+    for _ in range(iterations):
+        p = 1. / (1. + np.exp(-features @ weights))
+        gradient = features.T @ (p - outcomes) + penalty @ weights
+        hessian = (features * (p * (1. - p))[:, None]).T @ features + penalty
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < tolerance:
+            break
+    return weights
+
+
+def log_loss(features, outcomes, weights):
+    """Return the mean log-loss and accuracy of the weights. """
+    logits = features @ weights
+    loss = np.mean(np.logaddexp(0., logits) - outcomes * logits)
+    accuracy = np.mean((logits > 0) == (outcomes > 0.5))
+    return loss, accuracy
+
+
+def tune(data, output, l2=L2):
+    """Fit the LinearScore weights to the dataset in directory `data`, print
+    the fit on held-out games and write the weights to `output`.
+    """
+    features, outcomes, games = load_features(data)
+    held_out = games % VALIDATION == 0
+    weights = fit(features[~held_out], outcomes[~held_out], l2)
+
+    print("{} positions ({} held out)".format(len(features) // 2, held_out.sum() // 2))
+    print("\n{:<18}{:>10}".format("Feature", "Weight"))
+    for name, weight in zip(LinearScore.FEATURES, weights):
+        print("{:<18}{:>10.4f}".format(name, weight))
+    print("\n{:<12}{:>10}{:>10}".format("", "Log-loss", "Accuracy"))
+    for label, mask in (("Training", ~held_out), ("Held out", held_out)):
+        if mask.any():
+            loss, accuracy = log_loss(features[mask], outcomes[mask], weights)
+            print("{:<12}{:>10.4f}{:>10.3f}".format(label, loss, accuracy))
+    print("{:<12}{:>10.4f}".format("Coin flip", np.log(2.)))
+
+    with open(output, "w") as f:
+        json.dump({"weights": dict(zip(LinearScore.FEATURES, weights.tolist())),
+                   "data": data, "positions": int(len(features) // 2)}, f, indent=1)
+    return weights
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit heuristic weights to self-play outcomes.")
+    parser.add_argument("--data", default="selfplay_data",
+                        help="directory of the dataset written by selfplay.py")
+    parser.add_argument("--output", default="tuned_weights.json")
+    parser.add_argument("--l2", type=float, default=L2,
+                        help="ridge penalty on the weights (default: {:g})".format(L2))
+    args = parser.parse_args()
+    start_time = time.time()
+    tune(args.data, args.output, args.l2)
+    print("\nWeights written to {}".format(args.output))
+    print("--- %s seconds ---" % (time.time() - start_time))